@@ -0,0 +1,87 @@
+"""Бенчмарки страниц приложения posts.
+
+Запуск из корня репозитория:
+
+    pytest benchmarks --scale=10k
+
+Результаты сравниваются с benchmarks/baseline.json, --save-baseline
+записывает текущие результаты как новую базовую линию.
+"""
+import json
+import os
+from typing import Dict
+
+import pytest
+from posts.datasets import SCALES
+
+from .datasets import Dataset, seed
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'baseline.json')
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup('benchmarks')
+    group.addoption('--scale', default='smoke', choices=sorted(SCALES),
+                    help='Размер набора данных.')
+    group.addoption('--rounds', type=int, default=30,
+                    help='Количество замеряемых запросов на сценарий.')
+    group.addoption('--warmup', type=int, default=3,
+                    help='Количество прогревочных запросов на сценарий.')
+    group.addoption('--tolerance', type=float, default=0.25,
+                    help='Допустимый рост времени и памяти (доля).')
+    group.addoption('--fail-on-regression', action='store_true',
+                    help='Считать регрессию относительно базовой линии '
+                         'ошибкой теста.')
+    group.addoption('--save-baseline', action='store_true',
+                    help='Сохранить результаты как базовую линию.')
+
+
+@pytest.fixture(scope='session')
+def dataset(request, django_db_setup, django_db_blocker) -> Dataset:
+    with django_db_blocker.unblock():
+        return seed(SCALES[request.config.getoption('--scale')])
+
+
+@pytest.fixture(scope='session')
+def baseline(request) -> Dict:
+    """Базовая линия для выбранного размера данных."""
+    if not os.path.exists(BASELINE_PATH):
+        return {}
+    with open(BASELINE_PATH, encoding='utf-8') as file:
+        return json.load(file).get(request.config.getoption('--scale'), {})
+
+
+@pytest.fixture(scope='session')
+def results(request) -> Dict:
+    """Результаты замеров сессии: имя сценария -> метрики."""
+    collected: Dict = {}
+    request.config._benchmark_results = collected
+    return collected
+
+
+def pytest_terminal_summary(terminalreporter, config):
+    collected: Dict = getattr(config, '_benchmark_results', None)
+    if not collected:
+        return
+    scale: str = config.getoption('--scale')
+    terminalreporter.section(f'benchmarks ({scale})')
+    terminalreporter.write_line(
+        f'{"scenario":<16}{"p50 ms":>10}{"p95 ms":>10}{"p99 ms":>10}'
+        f'{"queries":>9}{"peak KiB":>10}  vs baseline')
+    for name, (result, delta) in sorted(collected.items()):
+        terminalreporter.write_line(
+            f'{name:<16}{result.p50_ms:>10}{result.p95_ms:>10}'
+            f'{result.p99_ms:>10}{result.queries:>9}{result.peak_kib:>10}'
+            f'  {delta}')
+    if config.getoption('--save-baseline'):
+        stored: Dict = {}
+        if os.path.exists(BASELINE_PATH):
+            with open(BASELINE_PATH, encoding='utf-8') as file:
+                stored = json.load(file)
+        stored[scale] = {
+            name: result.as_dict()
+            for name, (result, _) in sorted(collected.items())}
+        with open(BASELINE_PATH, 'w', encoding='utf-8') as file:
+            json.dump(stored, file, indent=2, sort_keys=True)
+            file.write('\n')
+        terminalreporter.write_line(f'baseline saved: {BASELINE_PATH}')
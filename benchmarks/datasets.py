@@ -0,0 +1,42 @@
+"""Наборы данных для бенчмарков.
+
+Данные создает генератор posts.datasets с зерном по умолчанию,
+поэтому замеры разных запусков сравнимы между собой.
+"""
+from dataclasses import dataclass
+
+from django.contrib.auth import get_user_model
+from posts import timeline
+from posts.datasets import DatasetGenerator, Generated, Scale
+from posts.models import Follow, Group, Post
+
+User = get_user_model()
+
+
+@dataclass
+class Dataset:
+    """Созданные данные, используемые в сценариях бенчмарков."""
+
+    reader: User
+    author: User
+    group: Group
+    post: Post
+
+
+def seed(scale: Scale) -> Dataset:
+    """Заполняет базу данными заданного размера."""
+    generator = DatasetGenerator(scale)
+    generated: Generated = generator.generate()
+    # Ленты строятся только для читателя бенчмарков: полная перестройка
+    # для миллиона постов заняла бы больше времени, чем сами замеры.
+    generator.finish(rebuild=False)
+    reader: User = User.objects.get(id=generated.users[-1])
+    for follow in Follow.objects.filter(user=reader):
+        timeline.backfill(follow)
+
+    author: User = User.objects.get(id=generated.users[0])
+    post: Post = (Post.objects.filter(author=author)
+                  .order_by('-comments_count').first())
+    return Dataset(reader=reader, author=author,
+                   group=Group.objects.get(id=generated.groups[0]),
+                   post=post)
@@ -0,0 +1,71 @@
+"""Замеры времени, запросов к базе и памяти одного сценария."""
+import statistics
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from typing import Callable, Dict, List
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+@dataclass
+class Result:
+    """Результат замера сценария."""
+
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    queries: int
+    peak_kib: int
+
+    def as_dict(self) -> Dict:
+        return asdict(self)
+
+
+def measure(request: Callable, rounds: int, warmup: int) -> Result:
+    """Выполняет сценарий request и собирает метрики.
+
+    Время замеряется без tracemalloc, запросы и пиковая память -
+    в отдельном прогоне.
+    """
+    for _ in range(warmup):
+        request()
+    timings: List[float] = []
+    for _ in range(rounds):
+        started: float = time.perf_counter()
+        request()
+        timings.append((time.perf_counter() - started) * 1000)
+    with CaptureQueriesContext(connection) as queries:
+        tracemalloc.start()
+        try:
+            request()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    percentiles: List[float] = statistics.quantiles(
+        timings, n=100, method='inclusive')
+    return Result(
+        p50_ms=round(statistics.median(timings), 2),
+        p95_ms=round(percentiles[94], 2),
+        p99_ms=round(percentiles[98], 2),
+        queries=len(queries.captured_queries),
+        peak_kib=peak // 1024,
+    )
+
+
+def compare(result: Result, baseline: Dict, tolerance: float) -> List[str]:
+    """Регрессии относительно базовой линии.
+
+    Количество запросов сравнивается точно, время и память -
+    с допуском tolerance (доля от базового значения).
+    """
+    regressions: List[str] = []
+    if result.queries > baseline['queries']:
+        regressions.append(
+            f'queries {baseline["queries"]} -> {result.queries}')
+    for metric in ('p95_ms', 'peak_kib'):
+        current: float = getattr(result, metric)
+        if current > baseline[metric] * (1 + tolerance):
+            regressions.append(f'{metric} {baseline[metric]} -> {current}')
+    return regressions
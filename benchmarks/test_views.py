@@ -0,0 +1,56 @@
+from typing import Callable, Dict, Tuple
+
+import pytest
+from django.core.cache import cache
+from django.test import Client
+from django.urls import reverse
+
+from .datasets import Dataset
+from .measure import compare, measure
+
+# Сценарий: метод, адрес и данные формы по набору данных.
+SCENARIOS: Dict[str, Callable[[Dataset], Tuple[str, str, Dict]]] = {
+    'index': lambda data: ('get', reverse('posts:index'), {}),
+    'index_page_50': lambda data: (
+        'get', reverse('posts:index'), {'page': 50}),
+    'group_posts': lambda data: (
+        'get', reverse('posts:group_list', args=(data.group.slug,)), {}),
+    'profile': lambda data: (
+        'get', reverse('posts:profile', args=(data.author.username,)), {}),
+    'post_detail': lambda data: (
+        'get', reverse('posts:post_detail', args=(data.post.id,)), {}),
+    'follow_index': lambda data: ('get', reverse('posts:follow_index'), {}),
+    'post_create': lambda data: (
+        'post', reverse('posts:post_create'), {'text': 'Новый пост'}),
+    'add_comment': lambda data: (
+        'post', reverse('posts:add_comment', args=(data.post.id,)),
+        {'text': 'Новый комментарий'}),
+}
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('name', SCENARIOS)
+def test_view(name, dataset, baseline, results, request):
+    """Замер страницы от имени авторизованного читателя."""
+    method, url, data = SCENARIOS[name](dataset)
+    client = Client()
+    client.force_login(dataset.reader)
+    cache.clear()
+
+    def send():
+        response = getattr(client, method)(url, data)
+        assert response.status_code in (200, 302), response.status_code
+
+    config = request.config
+    result = measure(send, rounds=config.getoption('--rounds'),
+                     warmup=config.getoption('--warmup'))
+    regressions = []
+    if name in baseline:
+        regressions = compare(
+            result, baseline[name], config.getoption('--tolerance'))
+        delta = '; '.join(regressions) or 'ok'
+    else:
+        delta = 'нет базовой линии'
+    results[name] = (result, delta)
+    if regressions and config.getoption('--fail-on-regression'):
+        pytest.fail(f'{name}: ' + '; '.join(regressions))
@@ -1,5 +1,7 @@
 import os
 
+import pytest
+
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 root_dir_content = os.listdir(BASE_DIR)
 PROJECT_DIR_NAME = 'yatube'
@@ -37,3 +39,19 @@ pytest_plugins = [
     'tests.fixtures.fixture_user',
     'tests.fixtures.fixture_data',
 ]
+
+
+class InlineExecutor:
+    """Выполняет задачу сразу в вызывающем потоке."""
+
+    def submit(self, func, *args):
+        func(*args)
+
+
+@pytest.fixture(autouse=True)
+def inline_thumbnails(monkeypatch):
+    # Подключения других потоков к SQLite в памяти делят с основным
+    # кеш и блокировки таблиц: запись хранилища sorl из пула обрывала
+    # бы запись теста ошибкой "database table is locked".
+    from posts import thumbnails
+    monkeypatch.setattr(thumbnails, '_get_executor', InlineExecutor)
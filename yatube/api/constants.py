@@ -0,0 +1,5 @@
+# Размер страницы API по умолчанию и наибольший размер по параметру limit.
+API_PAGE_SIZE = 10
+API_MAX_PAGE_SIZE = 100
+# Тело ответа привязано к поколениям кеша, поэтому хранится долго.
+API_CACHE_TIMEOUT = 60 * 60 * 6
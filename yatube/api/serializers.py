@@ -0,0 +1,116 @@
+"""Сериализаторы API.
+
+Сериализатор описывает поля ответа как пути ORM и читает их одним
+запросом .values(): модели и связанные объекты не создаются,
+а строка результата сразу превращается в словарь ответа.
+"""
+from typing import Callable, Dict, List, Optional, Tuple
+
+from django.core.files.storage import default_storage
+
+
+class FieldsError(ValueError):
+    """Запрошены неизвестные поля."""
+
+
+def _datetime(value) -> Optional[str]:
+    return value.isoformat() if value is not None else None
+
+
+def _image_url(value: Optional[str]) -> Optional[str]:
+    return default_storage.url(value) if value else None
+
+
+class Serializer:
+    """Плоский сериализатор поверх .values().
+
+    fields - поле ответа и путь ORM, из которого оно читается,
+    formatters - преобразования значений, которые нельзя отдать в JSON
+    как есть.
+    """
+
+    def __init__(self, fields: Dict[str, str],
+                 formatters: Optional[Dict[str, Callable]] = None) -> None:
+        self.fields: Dict[str, str] = fields
+        self.formatters: Dict[str, Callable] = formatters or {}
+
+    def select(self, requested: Optional[str]) -> Tuple[str, ...]:
+        """Поля ответа по параметру fields=a,b,c.
+
+        Без параметра возвращаются все поля.
+        """
+        if not requested:
+            return tuple(self.fields)
+        names: Tuple[str, ...] = tuple(dict.fromkeys(
+            name.strip() for name in requested.split(',') if name.strip()))
+        unknown: List[str] = [
+            name for name in names if name not in self.fields]
+        if unknown or not names:
+            raise FieldsError(
+                'Неизвестные поля: ' + ', '.join(unknown) if unknown
+                else 'Не указано ни одного поля.')
+        return names
+
+    def lookups(self, names: Tuple[str, ...],
+                extra: Tuple[str, ...] = ()) -> List[str]:
+        """Пути ORM для .values(), extra нужны для курсора."""
+        return list(dict.fromkeys(
+            [self.fields[name] for name in names] + list(extra)))
+
+    def serialize(self, row: Dict, names: Tuple[str, ...]) -> Dict:
+        """Словарь ответа из строки .values()."""
+        data: Dict = {}
+        for name in names:
+            value = row[self.fields[name]]
+            formatter: Optional[Callable] = self.formatters.get(name)
+            data[name] = formatter(value) if formatter else value
+        return data
+
+
+# Списки постов кешируются по поколениям сайта, групп и авторов,
+# которые комментарии не меняют, поэтому количество комментариев
+# есть только у отдельного поста (его кеш зависит от post_key).
+POST = Serializer(
+    fields={
+        'id': 'id',
+        'text': 'text',
+        'created': 'created',
+        'author': 'author__username',
+        'group': 'group__slug',
+        'image': 'image',
+    },
+    formatters={'created': _datetime, 'image': _image_url},
+)
+
+POST_DETAIL = Serializer(
+    fields={**POST.fields, 'comments_count': 'comments_count'},
+    formatters=POST.formatters,
+)
+
+GROUP = Serializer(
+    fields={
+        'id': 'id',
+        'title': 'title',
+        'slug': 'slug',
+        'description': 'description',
+        'posts_count': 'posts_count',
+    },
+)
+
+COMMENT = Serializer(
+    fields={
+        'id': 'id',
+        'post': 'post_id',
+        'author': 'author__username',
+        'text': 'text',
+        'created': 'created',
+    },
+    formatters={'created': _datetime},
+)
+
+FOLLOW = Serializer(
+    fields={
+        'id': 'id',
+        'author': 'author__username',
+    },
+)
@@ -0,0 +1,136 @@
+from datetime import timedelta
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils import timezone
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ApiTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+        cls.reader = User.objects.create_user(username='TestReader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        cls.posts = [
+            Post.objects.create(
+                author=cls.user, text=f'Пост {number}', group=cls.group)
+            for number in range(3)]
+        # Одинаковое время создания проверяет порядок по id внутри курсора.
+        created = timezone.now() - timedelta(days=1)
+        Post.objects.all().update(created=created)
+        cls.post = Post.objects.order_by('id').last()
+        Comment.objects.create(
+            post=cls.post, author=cls.reader, text='Комментарий')
+        Follow.objects.create(user=cls.reader, author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def get_json(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        return response.json()
+
+    def test_cursor_pagination_visits_every_post_once(self):
+        """Курсор по (created, id) обходит все посты без пропусков."""
+        url = reverse('api:post_list')
+        ids = []
+        while url:
+            page = self.get_json(url, **({'limit': 2} if not ids else {}))
+            ids += [post['id'] for post in page['results']]
+            url = page['next']
+        self.assertEqual(
+            ids, sorted((post.id for post in self.posts), reverse=True))
+
+    def test_sparse_fields(self):
+        """Параметр fields выбирает поля ответа."""
+        page = self.get_json(
+            reverse('api:group_posts', kwargs={'slug': self.group.slug}),
+            fields='id,author')
+        self.assertEqual(
+            page['results'][0], {'id': self.post.id, 'author': 'TestUser'})
+        response = self.client.get(
+            reverse('api:post_list'), {'fields': 'id,password'})
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+
+    def test_detail_and_comments(self):
+        """Пост и его комментарии отдаются по id."""
+        post = self.get_json(
+            reverse('api:post_detail', kwargs={'post_id': self.post.id}))
+        self.assertEqual(post['group'], self.group.slug)
+        self.assertEqual(post['comments_count'], 1)
+        comments = self.get_json(
+            reverse('api:comment_list', kwargs={'post_id': self.post.id}))
+        self.assertEqual(comments['results'][0]['author'], 'TestReader')
+        response = self.client.get(
+            reverse('api:post_detail', kwargs={'post_id': 0}))
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_comments_count_is_fresh(self):
+        """Количество комментариев отдается только актуальным."""
+        list_url = reverse('api:post_list')
+        detail_url = reverse(
+            'api:post_detail', kwargs={'post_id': self.post.id})
+        self.get_json(list_url)
+        self.get_json(detail_url)
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='Еще комментарий')
+
+        post = next(post for post in self.get_json(list_url)['results']
+                    if post['id'] == self.post.id)
+        self.assertNotIn('comments_count', post)
+        self.assertEqual(self.get_json(detail_url)['comments_count'], 2)
+        response = self.client.get(list_url, {'fields': 'comments_count'})
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+
+    def test_etag_returns_not_modified(self):
+        """Повторный запрос с If-None-Match получает 304."""
+        url = reverse('api:user_posts', kwargs={'username': 'TestUser'})
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+    def test_cached_list_is_served_without_queries(self):
+        """Список из кеша не обращается к базе, изменения видны сразу."""
+        url = reverse('api:post_list')
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            self.client.get(url)
+        Post.objects.create(author=self.user, text='Новый пост')
+        page = self.get_json(url)
+        self.assertEqual(page['results'][0]['text'], 'Новый пост')
+
+    def test_group_list_sees_new_groups(self):
+        """Новая группа сразу появляется в списке групп."""
+        url = reverse('api:group_list')
+        self.get_json(url)
+        Group.objects.create(title='Новая группа', slug='new_slug')
+        slugs = [group['slug'] for group in self.get_json(url)['results']]
+        self.assertEqual(slugs, [self.group.slug, 'new_slug'])
+
+    def test_follows_require_login(self):
+        """Подписки доступны только авторизованному пользователю."""
+        url = reverse('api:follow_list')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, HTTPStatus.UNAUTHORIZED)
+        self.client.force_login(self.reader)
+        page = self.get_json(url)
+        self.assertEqual(page['results'][0]['author'], 'TestUser')
+
+    def test_read_only(self):
+        """API не принимает изменяющие запросы."""
+        response = self.client.post(reverse('api:post_list'))
+        self.assertEqual(
+            response.status_code, HTTPStatus.METHOD_NOT_ALLOWED)
@@ -0,0 +1,272 @@
+"""Версионированный JSON API только для чтения.
+
+Списки постов и комментариев разбиты на страницы курсором по
+(created, id), списки групп и подписок - курсором по id. Параметр
+fields=a,b,c выбирает поля ответа, limit - размер страницы.
+
+Готовое тело ответа хранится в кеше под ключом, в который входят
+адрес запроса и поколения кеша (см. posts.generations), прочитанные
+до выборки данных: повторный запрос не обращается к базе за списком,
+а после изменения данных ключ меняется сам. Ответы содержат сильный
+ETag, условные запросы получают 304 Not Modified.
+"""
+import hashlib
+import json
+from functools import wraps
+from http import HTTPStatus
+from typing import Callable, Dict, List, Optional
+
+from django.core.cache import cache
+from django.db.models.query import QuerySet
+from django.http import (Http404, HttpRequest, HttpResponse, JsonResponse,
+                         QueryDict)
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import quote_etag
+from django.views.decorators.http import require_safe
+from posts import generations
+from posts.models import Comment, Follow, Group, Post, User
+from posts.utils import Cursor, decode_cursor, encode_cursor, keyset_filter
+
+from . import constants, serializers
+from .serializers import Serializer
+
+
+class ApiError(Exception):
+    """Ошибка запроса к API с HTTP-статусом ответа."""
+
+    def __init__(self, message: str,
+                 status: int = HTTPStatus.BAD_REQUEST) -> None:
+        super().__init__(message)
+        self.status: int = status
+
+
+def api_view(view: Callable) -> Callable:
+    """Разрешает только GET и HEAD и отдает ошибки в JSON."""
+    @require_safe
+    @wraps(view)
+    def wrapper(request: HttpRequest, *args, **kwargs) -> HttpResponse:
+        try:
+            return view(request, *args, **kwargs)
+        except Http404:
+            return JsonResponse(
+                {'error': 'Не найдено.'}, status=HTTPStatus.NOT_FOUND)
+        except serializers.FieldsError as error:
+            return JsonResponse(
+                {'error': str(error)}, status=HTTPStatus.BAD_REQUEST)
+        except ApiError as error:
+            return JsonResponse({'error': str(error)}, status=error.status)
+    return wrapper
+
+
+def _cache_key(request: HttpRequest, scope: Dict[str, int]) -> str:
+    raw: str = '|'.join((
+        request.path,
+        json.dumps(sorted(request.GET.lists())),
+        json.dumps(sorted(scope.items())),
+    ))
+    return 'api:' + hashlib.md5(raw.encode()).hexdigest()
+
+
+def _make_entry(data: Dict) -> Dict:
+    body: bytes = json.dumps(data, ensure_ascii=False).encode()
+    return {'body': body, 'etag': quote_etag(hashlib.md5(body).hexdigest())}
+
+
+def json_response(request: HttpRequest, entry: Dict) -> HttpResponse:
+    """Ответ с телом и ETag записи, 304 для условного запроса."""
+    response: Optional[HttpResponse] = get_conditional_response(
+        request, etag=entry['etag'])
+    if response is None:
+        response = HttpResponse(
+            entry['body'], content_type='application/json')
+    response['ETag'] = entry['etag']
+    return response
+
+
+def cached_json(request: HttpRequest, scope: Dict[str, int],
+                build: Callable[[], Dict]) -> HttpResponse:
+    """Ответ с телом build() из кеша, действительным для поколений scope.
+
+    scope читается до выборки данных: если данные изменятся во время
+    построения ответа, поколения увеличатся и запись не будет найдена.
+    """
+    key: str = _cache_key(request, scope)
+    entry: Optional[Dict] = cache.get(key)
+    if entry is None:
+        entry = _make_entry(build())
+        cache.set(key, entry, constants.API_CACHE_TIMEOUT)
+    return json_response(request, entry)
+
+
+def _limit(request: HttpRequest) -> int:
+    raw: Optional[str] = request.GET.get('limit')
+    if raw is None:
+        return constants.API_PAGE_SIZE
+    try:
+        limit: int = int(raw)
+    except ValueError:
+        raise ApiError('limit должен быть числом.')
+    if not 1 <= limit <= constants.API_MAX_PAGE_SIZE:
+        raise ApiError(
+            f'limit должен быть от 1 до {constants.API_MAX_PAGE_SIZE}.')
+    return limit
+
+
+def _next_url(request: HttpRequest, token: str) -> str:
+    params: QueryDict = request.GET.copy()
+    params['after'] = token
+    return f'{request.path}?{params.urlencode()}'
+
+
+def _page(request: HttpRequest, rows: List[Dict], limit: int,
+          serializer: Serializer, names, cursor: Callable[[Dict], str]
+          ) -> Dict:
+    next_url: Optional[str] = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_url = _next_url(request, cursor(rows[-1]))
+    return {
+        'results': [serializer.serialize(row, names) for row in rows],
+        'next': next_url,
+    }
+
+
+def keyset_page(request: HttpRequest, queryset: QuerySet,
+                serializer: Serializer) -> Dict:
+    """Страница объектов после курсора по (created, id), новые первыми.
+
+    Некорректный курсор трактуется как запрос первой страницы.
+    """
+    names = serializer.select(request.GET.get('fields'))
+    limit: int = _limit(request)
+    queryset = queryset.order_by('-created', '-id')
+    after: Optional[Cursor] = decode_cursor(request.GET.get('after'))
+    if after is not None:
+        queryset = queryset.filter(keyset_filter(after, forward=True))
+    rows: List[Dict] = list(queryset.values(
+        *serializer.lookups(names, extra=('created', 'id')))[:limit + 1])
+    return _page(request, rows, limit, serializer, names,
+                 lambda row: encode_cursor(row['created'], row['id']))
+
+
+def id_page(request: HttpRequest, queryset: QuerySet,
+            serializer: Serializer) -> Dict:
+    """Страница объектов после курсора по id, в порядке создания."""
+    names = serializer.select(request.GET.get('fields'))
+    limit: int = _limit(request)
+    queryset = queryset.order_by('id')
+    after: Optional[str] = request.GET.get('after')
+    if after and after.isdigit():
+        queryset = queryset.filter(id__gt=int(after))
+    rows: List[Dict] = list(queryset.values(
+        *serializer.lookups(names, extra=('id',)))[:limit + 1])
+    return _page(request, rows, limit, serializer, names,
+                 lambda row: str(row['id']))
+
+
+def _object_id(queryset: QuerySet, **lookup) -> int:
+    object_id: Optional[int] = queryset.filter(**lookup).values_list(
+        'id', flat=True).first()
+    if object_id is None:
+        raise Http404
+    return object_id
+
+
+@api_view
+def post_list(request: HttpRequest) -> HttpResponse:
+    """Все посты, новые первыми."""
+    scope: Dict[str, int] = generations.snapshot(
+        (generations.global_key(),))
+    return cached_json(
+        request, scope,
+        lambda: keyset_page(request, Post.objects.all(), serializers.POST))
+
+
+@api_view
+def group_posts(request: HttpRequest, slug: str) -> HttpResponse:
+    """Посты группы."""
+    group_id: int = _object_id(Group.objects.all(), slug=slug)
+    scope: Dict[str, int] = generations.snapshot(
+        (generations.group_key(group_id),))
+    return cached_json(
+        request, scope,
+        lambda: keyset_page(
+            request, Post.objects.filter(group_id=group_id),
+            serializers.POST))
+
+
+@api_view
+def user_posts(request: HttpRequest, username: str) -> HttpResponse:
+    """Посты автора."""
+    author_id: int = _object_id(User.objects.all(), username=username)
+    scope: Dict[str, int] = generations.snapshot(
+        (generations.author_key(author_id),))
+    return cached_json(
+        request, scope,
+        lambda: keyset_page(
+            request, Post.objects.filter(author_id=author_id),
+            serializers.POST))
+
+
+@api_view
+def post_detail(request: HttpRequest, post_id: int) -> HttpResponse:
+    """Один пост."""
+    post: Optional[Dict] = Post.objects.filter(pk=post_id).values(
+        'author_id', 'group_id').first()
+    if post is None:
+        raise Http404
+    scope: Dict[str, int] = generations.snapshot((
+        generations.post_key(post_id),
+        *generations.post_keys(post['author_id'], post['group_id']),
+    ))
+
+    def build() -> Dict:
+        names = serializers.POST_DETAIL.select(request.GET.get('fields'))
+        row: Optional[Dict] = Post.objects.filter(pk=post_id).values(
+            *serializers.POST_DETAIL.lookups(names)).first()
+        if row is None:
+            raise Http404
+        return serializers.POST_DETAIL.serialize(row, names)
+
+    return cached_json(request, scope, build)
+
+
+@api_view
+def comment_list(request: HttpRequest, post_id: int) -> HttpResponse:
+    """Комментарии поста, новые первыми."""
+    scope: Dict[str, int] = generations.snapshot(
+        (generations.post_key(post_id),))
+
+    def build() -> Dict:
+        if not Post.objects.filter(pk=post_id).exists():
+            raise Http404
+        return keyset_page(
+            request, Comment.objects.filter(post_id=post_id),
+            serializers.COMMENT)
+
+    return cached_json(request, scope, build)
+
+
+@api_view
+def group_list(request: HttpRequest) -> HttpResponse:
+    """Все группы в порядке создания."""
+    scope: Dict[str, int] = generations.snapshot(
+        (generations.global_key(), generations.groups_key()))
+    return cached_json(
+        request, scope,
+        lambda: id_page(request, Group.objects.all(), serializers.GROUP))
+
+
+@api_view
+def follow_list(request: HttpRequest) -> HttpResponse:
+    """Подписки текущего пользователя."""
+    if not request.user.is_authenticated:
+        raise ApiError(
+            'Требуется авторизация.', status=HTTPStatus.UNAUTHORIZED)
+    # Имена авторов в подписках меняются без поколения подписчика,
+    # поэтому короткий личный список не кешируется, а только получает ETag.
+    response: HttpResponse = json_response(request, _make_entry(id_page(
+        request, Follow.objects.filter(user_id=request.user.id),
+        serializers.FOLLOW)))
+    patch_vary_headers(response, ('Cookie',))
+    return response
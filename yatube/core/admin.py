@@ -0,0 +1,107 @@
+"""Режим админки для больших таблиц.
+
+LargeTableAdminMixin отключает точный подсчет всех объектов, считает
+отфильтрованные объекты с ограничением (или по статистике PostgreSQL)
+и листает список курсором по pk вместо OFFSET.
+"""
+from typing import List, Optional
+
+from django.contrib.admin.views.main import ORDER_VAR, ChangeList
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+CURSOR_VAR = 'after'
+
+
+class ApproximateCountPaginator(Paginator):
+    """Паджинатор с приблизительным количеством объектов.
+
+    Без фильтров на PostgreSQL количество берется из статистики
+    pg_class.reltuples. В остальных случаях строки считаются не дальше
+    count_limit, и count_capped показывает, что объектов больше.
+    """
+
+    count_limit: int = 10_000
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.count_capped: bool = False
+        self.count_approximate: bool = False
+
+    @cached_property
+    def count(self) -> int:
+        if not self.object_list.query.where:
+            estimate: int = self._estimate()
+            if estimate > self.count_limit:
+                self.count_approximate = True
+                return estimate
+        count: int = self.object_list[:self.count_limit + 1].count()
+        if count > self.count_limit:
+            self.count_capped = True
+            return self.count_limit
+        return count
+
+    def _estimate(self) -> int:
+        connection = connections[self.object_list.db]
+        if connection.vendor != 'postgresql':
+            return 0
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples FROM pg_class WHERE relname = %s',
+                [self.object_list.model._meta.db_table])
+            row = cursor.fetchone()
+        return int(row[0]) if row else 0
+
+
+class KeysetChangeList(ChangeList):
+    """Список объектов админки с курсорной паджинацией по pk.
+
+    Курсор используется при сортировке по умолчанию. При сортировке
+    по столбцу работает обычная паджинация с приблизительным количеством.
+    """
+
+    def __init__(self, request, *args, **kwargs) -> None:
+        self.is_keyset: bool = ORDER_VAR not in request.GET
+        self.cursor: Optional[str] = request.GET.get(CURSOR_VAR)
+        self.next_url: Optional[str] = None
+        self.first_url: Optional[str] = None
+        super().__init__(request, *args, **kwargs)
+
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        lookup_params.pop(CURSOR_VAR, None)
+        return lookup_params
+
+    def get_results(self, request) -> None:
+        if not self.is_keyset:
+            super().get_results(request)
+            return
+        queryset = self.queryset.order_by('-pk')
+        if self.cursor and self.cursor.isdigit():
+            queryset = queryset.filter(pk__lt=int(self.cursor))
+            self.first_url = self.get_query_string(remove=[CURSOR_VAR])
+        pks: List = list(
+            queryset.values_list('pk', flat=True)[:self.list_per_page + 1])
+        if len(pks) > self.list_per_page:
+            pks = pks[:self.list_per_page]
+            self.next_url = self.get_query_string({CURSOR_VAR: pks[-1]})
+        self.paginator = self.model_admin.get_paginator(
+            request, self.queryset, self.list_per_page)
+        self.result_count = self.paginator.count
+        self.show_full_result_count = False
+        self.full_result_count = None
+        self.show_admin_actions = True
+        self.result_list = queryset.filter(pk__in=pks)
+        self.can_show_all = False
+        self.multi_page = bool(self.next_url or self.first_url)
+
+
+class LargeTableAdminMixin:
+    """Настройки админки для таблиц с большим количеством строк."""
+
+    show_full_result_count = False
+    paginator = ApproximateCountPaginator
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
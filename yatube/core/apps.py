@@ -1,5 +1,12 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
 
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self) -> None:
+        from . import slow_queries
+
+        connection_created.connect(
+            slow_queries.install, dispatch_uid='core.slow_queries')
@@ -0,0 +1,107 @@
+"""Бэкенд кеша с замерами вызовов.
+
+Оборачивает настоящий бэкенд, заданный в OPTIONS['BACKEND'], и добавляет
+длительность вызовов, попадания и промахи в замеры текущего запроса
+(см. core.instrumentation). Остальные параметры передаются настоящему
+бэкенду без изменений:
+
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.cache.InstrumentedCache',
+            'LOCATION': 'redis://127.0.0.1:6379/1',
+            'OPTIONS': {'BACKEND': 'django_redis.cache.RedisCache'},
+        }
+    }
+"""
+from typing import Dict, Iterable, Optional
+
+from django.core.cache.backends.base import BaseCache
+from django.utils.module_loading import import_string
+
+from . import instrumentation
+
+_MISSING = object()
+
+
+class InstrumentedCache(BaseCache):
+    """Прокси к настоящему бэкенду кеша с замерами."""
+
+    def __init__(self, location: str, params: Dict) -> None:
+        params = dict(params)
+        options: Dict = dict(params.get('OPTIONS', {}))
+        backend: str = options.pop('BACKEND')
+        params['OPTIONS'] = options
+        super().__init__(params)
+        self.backend: BaseCache = import_string(backend)(location, params)
+
+    def __getattr__(self, name: str):
+        # Особые методы бэкенда (например, keys у django_redis).
+        if name == 'backend':
+            raise AttributeError(name)
+        return getattr(self.backend, name)
+
+    def make_key(self, key, version=None) -> str:
+        return self.backend.make_key(key, version=version)
+
+    def _call(self, method: str, *args, **kwargs):
+        timings = instrumentation.current()
+        if timings is None:
+            return getattr(self.backend, method)(*args, **kwargs)
+        with timings.measure('cache'):
+            return getattr(self.backend, method)(*args, **kwargs)
+
+    def _count(self, hits: int, misses: int) -> None:
+        timings = instrumentation.current()
+        if timings is not None:
+            timings.counts['cache_hits'] += hits
+            timings.counts['cache_misses'] += misses
+
+    def get(self, key, default=None, version=None):
+        value = self._call('get', key, _MISSING, version=version)
+        if value is _MISSING:
+            self._count(0, 1)
+            return default
+        self._count(1, 0)
+        return value
+
+    def get_many(self, keys: Iterable, version=None) -> Dict:
+        keys = list(keys)
+        values: Dict = self._call('get_many', keys, version=version)
+        self._count(len(values), len(keys) - len(values))
+        return values
+
+    def has_key(self, key, version=None) -> bool:
+        return self._call('has_key', key, version=version)
+
+    def add(self, key, value, *args, **kwargs) -> bool:
+        return self._call('add', key, value, *args, **kwargs)
+
+    def set(self, key, value, *args, **kwargs):
+        return self._call('set', key, value, *args, **kwargs)
+
+    def set_many(self, data: Dict, *args, **kwargs):
+        return self._call('set_many', data, *args, **kwargs)
+
+    def get_or_set(self, key, default, *args, **kwargs):
+        return self._call('get_or_set', key, default, *args, **kwargs)
+
+    def touch(self, key, *args, **kwargs) -> bool:
+        return self._call('touch', key, *args, **kwargs)
+
+    def delete(self, key, version=None) -> Optional[bool]:
+        return self._call('delete', key, version=version)
+
+    def delete_many(self, keys: Iterable, version=None) -> None:
+        return self._call('delete_many', keys, version=version)
+
+    def incr(self, key, delta: int = 1, version=None) -> int:
+        return self._call('incr', key, delta, version=version)
+
+    def decr(self, key, delta: int = 1, version=None) -> int:
+        return self._call('decr', key, delta, version=version)
+
+    def clear(self) -> None:
+        return self._call('clear')
+
+    def close(self, **kwargs) -> None:
+        return self.backend.close(**kwargs)
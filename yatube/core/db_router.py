@@ -0,0 +1,221 @@
+"""Чтение с реплик и запись в основную базу.
+
+ReplicaRoutingMiddleware открывает для запроса состояние маршрутизации.
+Безопасные запросы (GET, HEAD, OPTIONS) читают с одной из исправных
+реплик DATABASE_REPLICAS, выбранной на весь запрос, остальные запросы
+и код вне запросов (команды, фоновые потоки) работают только
+с основной базой.
+
+После первой записи запрос до конца работает с основной базой,
+а ответ получает cookie, по которой следующие REPLICA_STICKY_SECONDS
+секунд запросы пользователя тоже читают основную базу: новый пост виден
+сразу после перенаправления, даже если реплика отстает.
+
+Данные, по которым заполняются кеши с поколениями (см.
+posts.generations), не должны читаться с отстающей реплики: иначе
+устаревшая страница сохранится под новым поколением. Поэтому снимок
+поколений, увеличенных не раньше REPLICA_MAX_LAG секунд назад,
+переводит чтение запроса на основную базу (read_primary).
+
+Исправность реплики проверяется не чаще раза в REPLICA_HEALTH_INTERVAL
+секунд в каждом процессе. Если реплика недоступна во время запроса,
+она помечается неисправной, а представление выполняется повторно
+на основной базе.
+"""
+import logging
+import random
+import threading
+import time
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import DatabaseError, InterfaceError, OperationalError
+from django.db import connections
+from django.http import HttpRequest, HttpResponse
+
+logger = logging.getLogger(__name__)
+
+PRIMARY: str = 'default'
+STICKY_COOKIE: str = 'db_primary_until'
+SAFE_METHODS: Tuple[str, ...] = ('GET', 'HEAD', 'OPTIONS')
+# Ошибки подключения к реплике, после которых запрос повторяется
+# на основной базе.
+CONNECTION_ERRORS: Tuple = (OperationalError, InterfaceError)
+
+_state: ContextVar = ContextVar('db_routing', default=None)
+
+
+class RoutingState:
+    """Маршрутизация одного запроса."""
+
+    def __init__(self, use_primary: bool) -> None:
+        self.use_primary: bool = use_primary
+        self.wrote: bool = False
+        self.replica: Optional[str] = None
+        self.left_replica: bool = False
+
+
+def check_replica(alias: str) -> bool:
+    """Отвечает ли реплика и не отстает ли больше REPLICA_MAX_LAG секунд.
+
+    Отставание измеряется только для PostgreSQL.
+    """
+    connection = connections[alias]
+    try:
+        with connection.cursor() as cursor:
+            if connection.vendor != 'postgresql':
+                cursor.execute('SELECT 1')
+                return True
+            cursor.execute(
+                'SELECT COALESCE(EXTRACT(EPOCH FROM '
+                'now() - pg_last_xact_replay_timestamp()), 0)')
+            lag: float = cursor.fetchone()[0]
+    except DatabaseError:
+        logger.warning('Реплика %s недоступна', alias, exc_info=True)
+        connection.close()
+        return False
+    if lag > settings.REPLICA_MAX_LAG:
+        logger.warning('Реплика %s отстает на %.1f с', alias, lag)
+        return False
+    return True
+
+
+class ReplicaHealth:
+    """Исправность реплик по последним проверкам в процессе."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._checked: Dict[str, float] = {}
+        self._healthy: Dict[str, bool] = {}
+
+    def is_healthy(self, alias: str) -> bool:
+        now: float = time.monotonic()
+        with self._lock:
+            checked: Optional[float] = self._checked.get(alias)
+            if (checked is not None
+                    and now - checked < settings.REPLICA_HEALTH_INTERVAL):
+                return self._healthy.get(alias, True)
+            # Проверку выполняет один поток, остальные до ее конца
+            # пользуются прежним результатом.
+            self._checked[alias] = now
+        healthy: bool = check_replica(alias)
+        with self._lock:
+            self._healthy[alias] = healthy
+        return healthy
+
+    def mark_down(self, alias: str) -> None:
+        """Считает реплику неисправной до следующей проверки."""
+        with self._lock:
+            self._checked[alias] = time.monotonic()
+            self._healthy[alias] = False
+
+    def reset(self) -> None:
+        with self._lock:
+            self._checked.clear()
+            self._healthy.clear()
+
+
+health = ReplicaHealth()
+
+
+class PrimaryReplicaRouter:
+    """Роутер баз данных: запись в основную базу, чтение с реплик."""
+
+    def db_for_read(self, model, **hints) -> str:
+        state: Optional[RoutingState] = _state.get()
+        if state is None or state.use_primary:
+            return PRIMARY
+        if state.replica is None:
+            replicas: List[str] = [
+                alias for alias in settings.DATABASE_REPLICAS
+                if health.is_healthy(alias)]
+            if not replicas:
+                return PRIMARY
+            state.replica = random.choice(replicas)
+        return state.replica
+
+    def db_for_write(self, model, **hints) -> str:
+        state: Optional[RoutingState] = _state.get()
+        if state is not None:
+            state.wrote = True
+            state.use_primary = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints) -> bool:
+        # Реплики содержат те же данные, что и основная база.
+        return True
+
+    def allow_migrate(self, db: str, app_label: str, model_name=None,
+                      **hints) -> bool:
+        # Схема реплик приходит с репликацией.
+        return db not in settings.DATABASE_REPLICAS
+
+
+def read_primary() -> None:
+    """Переводит чтение текущего запроса на основную базу."""
+    state: Optional[RoutingState] = _state.get()
+    if state is None or state.use_primary:
+        return
+    state.use_primary = True
+    state.left_replica = state.replica is not None
+
+
+def switched_from_replica() -> bool:
+    """Читал ли запрос реплику до перехода на основную базу.
+
+    Прочитанные до перехода объекты могут быть устаревшими.
+    """
+    state: Optional[RoutingState] = _state.get()
+    return state is not None and state.left_replica
+
+
+class ReplicaRoutingMiddleware:
+    """Выбирает базу для чтения и закрепляет пользователя за основной.
+
+    Должен стоять до промежуточных слоев, читающих базу (сессии,
+    аутентификация).
+    """
+
+    def __init__(self, get_response: Callable) -> None:
+        self.get_response: Callable = get_response
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        state = RoutingState(
+            use_primary=(request.method not in SAFE_METHODS
+                         or self.is_sticky(request)))
+        token = _state.set(state)
+        try:
+            response: HttpResponse = self.get_response(request)
+        finally:
+            _state.reset(token)
+        if state.wrote:
+            window: int = settings.REPLICA_STICKY_SECONDS
+            response.set_cookie(
+                STICKY_COOKIE, str(int(time.time()) + window),
+                max_age=window, httponly=True, samesite='Lax')
+        return response
+
+    def is_sticky(self, request: HttpRequest) -> bool:
+        try:
+            until: float = float(request.COOKIES.get(STICKY_COOKIE, 0))
+        except ValueError:
+            return False
+        return until > time.time()
+
+    def process_exception(self, request: HttpRequest,
+                          exception: Exception) -> Optional[HttpResponse]:
+        """Повторяет представление на основной базе, если упала реплика."""
+        state: Optional[RoutingState] = _state.get()
+        if (state is None or state.replica is None or state.wrote
+                or not isinstance(exception, CONNECTION_ERRORS)):
+            return None
+        logger.warning('Реплика %s недоступна, запрос %s повторяется '
+                       'на основной базе', state.replica, request.path,
+                       exc_info=exception)
+        health.mark_down(state.replica)
+        connections[state.replica].close()
+        state.use_primary = True
+        state.replica = None
+        match = request.resolver_match
+        return match.func(request, *match.args, **match.kwargs)
@@ -0,0 +1,198 @@
+"""Замеры фаз запроса и заголовок Server-Timing.
+
+ServerTimingMiddleware открывает для запроса набор замеров, доступный
+через current(): SQL-запросы замеряются обертками execute_wrapper всех
+подключений к базе, вызовы кеша - бэкендом core.cache.InstrumentedCache,
+отрисовка шаблонов - бэкендом core.template_backends.TimedDjangoTemplates.
+ViewTimingMiddleware, последний в списке, замеряет разрешение адреса
+и выполнение представления Django.
+
+Итоги отдаются заголовком Server-Timing (всем при SERVER_TIMING_PUBLIC,
+иначе только сотрудникам), пишутся в журнал core.instrumentation
+записью с полями замеров и учитываются в метриках core.metrics.
+Без активного запроса замеры ничего не делают, поэтому команды
+и фоновые потоки не платят за инструментацию.
+"""
+import json
+import logging
+import time
+from collections import Counter, defaultdict
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterator, List, Optional
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpRequest, HttpResponse
+from django.urls import Resolver404, resolve
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+_current: ContextVar = ContextVar('request_timings', default=None)
+
+
+class RequestTimings:
+    """Замеры одного запроса.
+
+    phases - суммарная длительность фаз в секундах, counts - счетчики
+    (SQL-запросы, попадания и промахи кеша, отрисованные шаблоны).
+    """
+
+    def __init__(self) -> None:
+        self.started: float = time.perf_counter()
+        self.duration: Optional[float] = None
+        self.phases: Dict[str, float] = defaultdict(float)
+        self.counts: Counter = Counter()
+        self.url_name: Optional[str] = None
+        self._template_depth: int = 0
+
+    def add(self, phase: str, seconds: float) -> None:
+        self.phases[phase] += seconds
+
+    @contextmanager
+    def measure(self, phase: str) -> Iterator[None]:
+        started: float = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(phase, time.perf_counter() - started)
+
+    @contextmanager
+    def measure_template(self) -> Iterator[None]:
+        """Замеряет отрисовку шаблона.
+
+        Время вложенных отрисовок (render_to_string внутри тегов)
+        уже входит во внешнюю и не суммируется повторно.
+        """
+        self.counts['templates'] += 1
+        self._template_depth += 1
+        started: float = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._template_depth -= 1
+            if not self._template_depth:
+                self.add('tpl', time.perf_counter() - started)
+
+    def execute(self, execute: Callable, sql: str, params, many: bool,
+                context: Dict):
+        """Обертка execute_wrapper для SQL-запросов."""
+        self.counts['queries'] += 1
+        with self.measure('db'):
+            return execute(sql, params, many, context)
+
+    def finish(self) -> None:
+        self.duration = time.perf_counter() - self.started
+
+    def header(self) -> str:
+        """Значение заголовка Server-Timing."""
+        descriptions: Dict[str, str] = {
+            'db': f'{self.counts["queries"]} queries',
+            'cache': (f'{self.counts["cache_hits"]} hits, '
+                      f'{self.counts["cache_misses"]} misses'),
+            'tpl': f'{self.counts["templates"]} templates',
+        }
+        entries: List[str] = [f'total;dur={self.duration * 1000:.1f}']
+        for phase, seconds in self.phases.items():
+            entry: str = f'{phase};dur={seconds * 1000:.1f}'
+            if phase in descriptions:
+                entry += f';desc="{descriptions[phase]}"'
+            entries.append(entry)
+        return ', '.join(entries)
+
+    def as_dict(self) -> Dict:
+        """Замеры для структурированной записи журнала, в миллисекундах."""
+        return {
+            'url_name': self.url_name,
+            'total_ms': round(self.duration * 1000, 2),
+            'phases_ms': {
+                phase: round(seconds * 1000, 2)
+                for phase, seconds in self.phases.items()},
+            'counts': dict(self.counts),
+        }
+
+
+def current() -> Optional[RequestTimings]:
+    """Замеры текущего запроса или None вне запроса."""
+    return _current.get()
+
+
+class ServerTimingMiddleware:
+    """Собирает замеры запроса, отдает Server-Timing и пишет журнал.
+
+    Должен стоять первым в MIDDLEWARE, чтобы total включал остальные
+    промежуточные слои, в т.ч. отдачу страниц из кеша.
+    """
+
+    def __init__(self, get_response: Callable) -> None:
+        self.get_response: Callable = get_response
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        if not settings.SERVER_TIMING_ENABLED:
+            return self.get_response(request)
+        timings = RequestTimings()
+        token = _current.set(timings)
+        try:
+            with timings.measure('resolve'):
+                try:
+                    timings.url_name = resolve(request.path_info).view_name
+                except Resolver404:
+                    pass
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(timings.execute))
+                response: HttpResponse = self.get_response(request)
+            timings.finish()
+        finally:
+            _current.reset(token)
+        metrics.record_request(timings)
+        if self.is_header_visible(request):
+            response['Server-Timing'] = timings.header()
+        logger.info(
+            '%s %s %s %.1fms', request.method, request.path,
+            response.status_code, timings.duration * 1000,
+            extra={'timing': timings.as_dict(),
+                   'status_code': response.status_code})
+        return response
+
+    def is_header_visible(self, request: HttpRequest) -> bool:
+        if settings.SERVER_TIMING_PUBLIC:
+            return True
+        user = getattr(request, 'user', None)
+        return bool(user is not None and user.is_staff)
+
+
+class ViewTimingMiddleware:
+    """Замеряет разрешение адреса и выполнение представления.
+
+    Должен стоять последним в MIDDLEWARE: следующий за ним обработчик -
+    это сам Django, который находит и вызывает представление.
+    """
+
+    def __init__(self, get_response: Callable) -> None:
+        self.get_response: Callable = get_response
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        timings: Optional[RequestTimings] = current()
+        if timings is None:
+            return self.get_response(request)
+        with timings.measure('view'):
+            return self.get_response(request)
+
+
+class JsonFormatter(logging.Formatter):
+    """Форматирует записи журналов запросов в одну строку JSON."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data: Dict = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'message': record.getMessage(),
+        }
+        for name in ('status_code', 'timing', 'slow_query'):
+            if hasattr(record, name):
+                data[name] = getattr(record, name)
+        return json.dumps(data, ensure_ascii=False)
@@ -0,0 +1,76 @@
+import os
+from collections import Counter
+from typing import List
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.profiling import PROFILE_SUFFIX, ProfileStore, get_store, leaf_totals
+
+
+class Command(BaseCommand):
+    """Сводит профили запросов всех рабочих процессов.
+
+    Для каждого имени URL складывает стеки сохраненных профилей
+    и печатает функции с наибольшим собственным временем. С --output
+    сводные стеки пишутся в файлы для flamegraph.pl или speedscope.
+    """
+
+    help = 'Сводит сохраненные профили запросов по именам URL.'
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument(
+            '--url-name',
+            action='append',
+            dest='url_names',
+            help='Имя URL (например, posts:profile). Можно указать несколько.',
+        )
+        parser.add_argument(
+            '--output',
+            help='Каталог для сводных стеков <имя URL>.folded.',
+        )
+        parser.add_argument(
+            '--top',
+            type=int,
+            default=10,
+            help='Сколько функций с наибольшим собственным временем печатать.',
+        )
+
+    def handle(self, *args, **options) -> None:
+        store: ProfileStore = get_store()
+        names: List[str] = store.url_names()
+        if options['url_names']:
+            requested: List[str] = [
+                store.dirname(name) for name in options['url_names']]
+            missing: List[str] = sorted(set(requested) - set(names))
+            if missing:
+                raise CommandError(f'Нет профилей: {", ".join(missing)}.')
+            names = requested
+        if not names:
+            self.stdout.write('Профилей нет.')
+            return
+        if options['output']:
+            os.makedirs(options['output'], exist_ok=True)
+        for name in names:
+            profiles: int = 0
+            samples: Counter = Counter()
+            for _, profile in store.profiles(name):
+                profiles += 1
+                samples.update(profile)
+            self.report(name, profiles, samples, options['top'])
+            if options['output']:
+                self.write_folded(
+                    os.path.join(options['output'], name + PROFILE_SUFFIX),
+                    samples)
+
+    def report(self, name: str, profiles: int, samples: Counter,
+               top: int) -> None:
+        total: int = sum(samples.values())
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'{name}: профилей {profiles}, отсчетов {total}'))
+        for label, count in leaf_totals(samples).most_common(top):
+            self.stdout.write(f'  {count / total:6.1%}  {label}')
+
+    def write_folded(self, path: str, samples: Counter) -> None:
+        with open(path, 'w', encoding='utf-8') as file:
+            for stack, count in samples.most_common():
+                file.write(f'{stack} {count}\n')
@@ -0,0 +1,107 @@
+import json
+import sys
+from collections import Counter
+from typing import Dict, Iterable, Iterator, List, Optional, TextIO
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Offender:
+    """Сводка повторений одного отпечатка запроса."""
+
+    def __init__(self, fingerprint: str) -> None:
+        self.fingerprint: str = fingerprint
+        self.count: int = 0
+        self.total_ms: float = 0.0
+        self.max_ms: float = 0.0
+        self.sites: Counter = Counter()
+        self.example: Optional[Dict] = None
+        self.plan: Optional[List[str]] = None
+
+    def add(self, entry: Dict) -> None:
+        self.count += 1
+        self.total_ms += entry['duration_ms']
+        if entry['duration_ms'] >= self.max_ms:
+            self.max_ms = entry['duration_ms']
+            self.example = entry
+        site: str = ' | '.join(
+            str(entry.get(name)) for name in ('url_name', 'template', 'source')
+        )
+        self.sites[site] += 1
+
+
+class Command(BaseCommand):
+    """Сводит журналы медленных запросов всех рабочих процессов.
+
+    Читает JSON-записи журнала core.slow_queries (строки других журналов
+    пропускаются) и печатает отпечатки с наибольшим суммарным временем:
+    количество, среднее и наибольшее время, места вызова, параметры
+    самого медленного повторения и план запроса.
+    """
+
+    help = 'Показывает самые затратные медленные SQL-запросы из журналов.'
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument(
+            'paths',
+            nargs='*',
+            default=['-'],
+            help='Файлы журналов; "-" - стандартный ввод.',
+        )
+        parser.add_argument(
+            '--top',
+            type=int,
+            default=10,
+            help='Сколько отпечатков печатать.',
+        )
+
+    def handle(self, *args, **options) -> None:
+        offenders: Dict[str, Offender] = {}
+        for entry in self.read_entries(options['paths']):
+            offender: Offender = offenders.setdefault(
+                entry['fingerprint'], Offender(entry['fingerprint']))
+            if 'plan' in entry:
+                offender.plan = entry['plan']
+            elif 'duration_ms' in entry:
+                offender.add(entry)
+        ranked: List[Offender] = sorted(
+            (offender for offender in offenders.values() if offender.count),
+            key=lambda offender: offender.total_ms, reverse=True)
+        if not ranked:
+            self.stdout.write('Медленных запросов нет.')
+        for offender in ranked[:options['top']]:
+            self.report(offender)
+
+    def read_entries(self, paths: Iterable[str]) -> Iterator[Dict]:
+        for path in paths:
+            if path == '-':
+                yield from self.parse(sys.stdin)
+                continue
+            try:
+                with open(path, encoding='utf-8') as file:
+                    yield from self.parse(file)
+            except OSError as error:
+                raise CommandError(f'Не удалось прочитать {path}: {error}')
+
+    @staticmethod
+    def parse(lines: TextIO) -> Iterator[Dict]:
+        for line in lines:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(entry, dict) and 'slow_query' in entry:
+                yield entry['slow_query']
+
+    def report(self, offender: Offender) -> None:
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'{offender.total_ms:.0f} мс всего, {offender.count} раз, '
+            f'в среднем {offender.total_ms / offender.count:.1f} мс, '
+            f'наибольшее {offender.max_ms:.1f} мс'))
+        self.stdout.write(f'  {offender.fingerprint}')
+        for site, count in offender.sites.most_common(3):
+            self.stdout.write(f'  {count} x {site}')
+        self.stdout.write(
+            f'  параметры: {", ".join(offender.example["params"])}')
+        for line in offender.plan or ():
+            self.stdout.write(f'  план: {line}')
@@ -0,0 +1,249 @@
+"""Метрики приложения в формате Prometheus.
+
+Каждый рабочий процесс копит гистограммы и счетчики в памяти
+с метками по имени URL и не чаще раза в METRICS_FLUSH_INTERVAL секунд
+сбрасывает их в свой файл METRICS_DIR/<pid>-<запуск>.json. Представление
+metrics складывает файлы всех процессов и отдает текстовый формат
+Prometheus, поэтому сборщик видит сумму по всем рабочим процессам,
+какой бы из них ни ответил. Файлы завершившихся процессов остаются,
+чтобы счетчики не уменьшались; каталог очищается при развертывании.
+Без METRICS_DIR метрики не пишутся на диск, и представление отдает
+метрики только ответившего процесса.
+
+Замеры запросов поступают из core.instrumentation, время создания
+миниатюр - из posts.thumbnails.
+"""
+import atexit
+import json
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+
+from . import instrumentation
+
+Labels = Tuple[Tuple[str, str], ...]
+
+# Имя: тип, описание, границы корзин гистограммы.
+METRICS: Dict[str, Tuple[str, str, Tuple[float, ...]]] = {
+    'yatube_request_duration_seconds': (
+        'histogram', 'Длительность обработки запроса.',
+        (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)),
+    'yatube_request_queries': (
+        'histogram', 'Количество SQL-запросов за запрос.',
+        (1, 2, 5, 10, 20, 50, 100)),
+    'yatube_cache_requests_total': (
+        'counter', 'Чтения кеша по результату (hit, miss).', ()),
+    'yatube_thumbnail_generation_seconds': (
+        'histogram', 'Время создания миниатюры.',
+        (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)),
+}
+# Метка создания миниатюр вне запроса (пул потоков posts.thumbnails).
+BACKGROUND: str = 'background'
+UNRESOLVED: str = 'unresolved'
+
+
+class Registry:
+    """Метрики одного процесса.
+
+    Серия хранится под ключом - JSON списка пар меток. Гистограмма -
+    это количества попаданий в корзины (последняя - +Inf), сумма
+    и количество наблюдений.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._data: Dict[str, Dict] = {}
+        self._owner: Optional[str] = None
+        self._flushed: float = 0.0
+
+    def observe(self, name: str, labels: Labels, value: float) -> None:
+        bounds: Tuple[float, ...] = METRICS[name][2]
+        index: int = next(
+            (index for index, bound in enumerate(bounds) if value <= bound),
+            len(bounds))
+        with self._lock:
+            series: Dict = self._series(name).setdefault(
+                json.dumps(labels),
+                {'buckets': [0] * (len(bounds) + 1), 'sum': 0, 'count': 0})
+            series['buckets'][index] += 1
+            series['sum'] += value
+            series['count'] += 1
+
+    def inc(self, name: str, labels: Labels, amount: float = 1) -> None:
+        with self._lock:
+            series: Dict = self._series(name)
+            key: str = json.dumps(labels)
+            series[key] = series.get(key, 0) + amount
+
+    def _series(self, name: str) -> Dict:
+        pid: int = os.getpid()
+        if self._owner is None or not self._owner.startswith(f'{pid}-'):
+            # Новый процесс, в т.ч. после fork: данные родителя
+            # уже учтены в его файле.
+            self._owner = f'{pid}-{time.time_ns()}'
+            self._data = {}
+        return self._data.setdefault(name, {})
+
+    def flush(self, force: bool = False) -> None:
+        """Записывает метрики процесса в его файл."""
+        if not settings.METRICS_DIR:
+            return
+        now: float = time.monotonic()
+        with self._lock:
+            if self._owner is None or not (
+                    force
+                    or now - self._flushed >= settings.METRICS_FLUSH_INTERVAL):
+                return
+            self._flushed = now
+            data: str = json.dumps(self._data)
+            path: str = os.path.join(
+                settings.METRICS_DIR, f'{self._owner}.json')
+        os.makedirs(settings.METRICS_DIR, exist_ok=True)
+        with open(path + '.tmp', 'w', encoding='utf-8') as file:
+            file.write(data)
+        os.replace(path + '.tmp', path)
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """Копия метрик процесса."""
+        with self._lock:
+            return json.loads(json.dumps(self._data))
+
+    def reset(self) -> None:
+        with self._lock:
+            self._data = {}
+            self._owner = None
+
+
+registry = Registry()
+# Последние наблюдения процесса не теряются при штатном завершении.
+atexit.register(registry.flush, force=True)
+
+
+def record_request(timings: 'instrumentation.RequestTimings') -> None:
+    """Учитывает замеры завершенного запроса."""
+    labels: Labels = (('view', timings.url_name or UNRESOLVED),)
+    registry.observe(
+        'yatube_request_duration_seconds', labels, timings.duration)
+    registry.observe(
+        'yatube_request_queries', labels, timings.counts['queries'])
+    for result, counter in (('hit', 'cache_hits'), ('miss', 'cache_misses')):
+        if timings.counts[counter]:
+            registry.inc('yatube_cache_requests_total',
+                         labels + (('result', result),),
+                         timings.counts[counter])
+    registry.flush()
+
+
+def record_thumbnail(seconds: float) -> None:
+    """Учитывает создание миниатюры в запросе или в фоне."""
+    timings = instrumentation.current()
+    url_name: str = BACKGROUND
+    if timings is not None:
+        url_name = timings.url_name or UNRESOLVED
+    registry.observe('yatube_thumbnail_generation_seconds',
+                     (('view', url_name),), seconds)
+    if timings is None:
+        registry.flush()
+
+
+def collect() -> Dict[str, Dict]:
+    """Сумма метрик всех процессов из каталога METRICS_DIR."""
+    if not settings.METRICS_DIR:
+        return registry.snapshot()
+    registry.flush(force=True)
+    total: Dict[str, Dict] = {}
+    if not os.path.isdir(settings.METRICS_DIR):
+        return total
+    for name in sorted(os.listdir(settings.METRICS_DIR)):
+        if not name.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(settings.METRICS_DIR, name),
+                      encoding='utf-8') as file:
+                data: Dict[str, Dict] = json.load(file)
+        except (FileNotFoundError, ValueError):
+            continue
+        for metric, series in data.items():
+            if metric not in METRICS:
+                continue
+            merged: Dict = total.setdefault(metric, {})
+            for key, value in series.items():
+                merged[key] = merge(merged.get(key), value)
+    return total
+
+
+def merge(first, second):
+    """Сумма двух значений серии: числа или гистограммы."""
+    if first is None:
+        return second
+    if isinstance(first, dict):
+        return {
+            'buckets': [a + b for a, b in zip(first['buckets'],
+                                              second['buckets'])],
+            'sum': first['sum'] + second['sum'],
+            'count': first['count'] + second['count'],
+        }
+    return first + second
+
+
+def format_labels(labels: Iterable) -> str:
+    escaped: List[str] = [
+        '{}="{}"'.format(name, value.replace('\\', r'\\')
+                         .replace('"', r'\"').replace('\n', r'\n'))
+        for name, value in labels]
+    return '{' + ','.join(escaped) + '}' if escaped else ''
+
+
+def format_number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render(data: Dict[str, Dict]) -> str:
+    """Текстовый формат Prometheus 0.0.4."""
+    lines: List[str] = []
+    for name, (kind, help_text, bounds) in METRICS.items():
+        series: Dict = data.get(name, {})
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        for key in sorted(series):
+            labels: List[List[str]] = json.loads(key)
+            value = series[key]
+            if kind == 'counter':
+                lines.append(
+                    f'{name}{format_labels(labels)} {format_number(value)}')
+                continue
+            cumulative: int = 0
+            for bound, count in zip(bounds + ('+Inf',), value['buckets']):
+                cumulative += count
+                le: str = bound if bound == '+Inf' else format_number(bound)
+                lines.append(
+                    f'{name}_bucket{format_labels(labels + [["le", le]])} '
+                    f'{cumulative}')
+            lines.append(f'{name}_sum{format_labels(labels)} '
+                         f'{format_number(value["sum"])}')
+            lines.append(f'{name}_count{format_labels(labels)} '
+                         f'{value["count"]}')
+    lines.extend(render_hit_ratio(data.get('yatube_cache_requests_total', {})))
+    return '\n'.join(lines) + '\n'
+
+
+def render_hit_ratio(series: Dict[str, float]) -> List[str]:
+    """Доля попаданий в кеш по имени URL."""
+    reads: Dict[str, Dict[str, float]] = {}
+    for key, value in series.items():
+        labels: Dict[str, str] = dict(json.loads(key))
+        reads.setdefault(labels['view'], {})[labels['result']] = value
+    name: str = 'yatube_cache_hit_ratio'
+    lines: List[str] = [
+        f'# HELP {name} Доля попаданий среди чтений кеша.',
+        f'# TYPE {name} gauge',
+    ]
+    for view in sorted(reads):
+        hits: float = reads[view].get('hit', 0)
+        total: float = hits + reads[view].get('miss', 0)
+        lines.append(f'{name}{format_labels([("view", view)])} '
+                     f'{format_number(hits / total)}')
+    return lines
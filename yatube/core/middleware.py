@@ -0,0 +1,123 @@
+"""Кеш страниц для анонимных пользователей.
+
+Представление разрешает кешировать свой ответ вызовом
+cache_for_anonymous, передавая поколения кеша (см. posts.generations),
+прочитанные до выборки данных. Запись кеша действительна, пока
+не изменилось ни одно из этих поколений: проверка выполняется одним
+запросом get_many к кешу, без обращений к базе данных.
+
+Ответы содержат сильный ETag и Last-Modified - время последнего
+изменения поколений, условные запросы получают 304 Not Modified.
+Заголовки исходного ответа (в т.ч. добавленные внутренними промежуточными
+слоями, например X-Frame-Options) сохраняются и повторяются при
+попадании в кеш.
+"""
+import hashlib
+from typing import Callable, Dict, FrozenSet, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpRequest, HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+CACHED_METHODS: Tuple[str, ...] = ('GET', 'HEAD')
+# Параметры запроса, входящие в ключ. С другими параметрами
+# страница не кешируется.
+KEY_PARAMS: FrozenSet[str] = frozenset({'page'})
+# Заголовки, которые относятся к одному ответу или выставляются заново.
+SKIPPED_HEADERS: FrozenSet[str] = frozenset(
+    {'etag', 'last-modified', 'x-profile'})
+
+
+def cache_for_anonymous(request: HttpRequest, scope: Dict[str, int],
+                        last_modified: Optional[float]) -> None:
+    """Разрешает сохранить ответ представления в кеше страниц.
+
+    scope - поколения кеша, от которых зависит страница,
+    last_modified - время их последнего изменения (timestamp).
+    """
+    request.page_cache = {
+        'scope': scope,
+        'last_modified': (
+            int(last_modified) if last_modified is not None else None),
+    }
+
+
+class AnonymousPageCacheMiddleware:
+    """Отдает анонимным пользователям страницы из кеша."""
+
+    def __init__(self, get_response: Callable) -> None:
+        self.get_response: Callable = get_response
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        key: Optional[str] = self.get_cache_key(request)
+        if key is None:
+            return self.get_response(request)
+        entry: Optional[Dict] = cache.get(key)
+        if entry is not None and self.is_valid(entry):
+            return self.cached_response(request, entry)
+        response: HttpResponse = self.get_response(request)
+        entry = self.make_entry(request, response)
+        if entry is None:
+            return response
+        cache.set(key, entry, settings.PAGE_CACHE_TIMEOUT)
+        self.set_headers(response, entry)
+        return get_conditional_response(
+            request,
+            etag=entry['etag'],
+            last_modified=entry['last_modified'],
+            response=response,
+        )
+
+    def get_cache_key(self, request: HttpRequest) -> Optional[str]:
+        """Ключ страницы или None, если запрос не кешируется."""
+        if request.method not in CACHED_METHODS:
+            return None
+        if not set(request.GET) <= KEY_PARAMS:
+            return None
+        if request.user.is_authenticated:
+            return None
+        url: str = f'{request.path}?page={request.GET.get("page", "")}'
+        return 'page_cache:v2:' + hashlib.md5(url.encode()).hexdigest()
+
+    def is_valid(self, entry: Dict) -> bool:
+        """Не изменились ли поколения, от которых зависит страница."""
+        scope: Dict[str, int] = entry['scope']
+        return cache.get_many(list(scope)) == scope
+
+    def make_entry(self, request: HttpRequest,
+                   response: HttpResponse) -> Optional[Dict]:
+        """Запись кеша для ответа или None, если ответ не кешируется."""
+        page_cache: Optional[Dict] = getattr(request, 'page_cache', None)
+        if (page_cache is None or response.status_code != 200
+                or response.streaming or response.cookies):
+            return None
+        return {
+            'scope': page_cache['scope'],
+            'last_modified': page_cache['last_modified'],
+            'etag': quote_etag(hashlib.md5(response.content).hexdigest()),
+            'content': response.content,
+            'headers': [
+                (name, value) for name, value in response.items()
+                if name.lower() not in SKIPPED_HEADERS],
+        }
+
+    def cached_response(self, request: HttpRequest,
+                        entry: Dict) -> HttpResponse:
+        """Ответ из записи кеша: 304 или страница целиком."""
+        response: Optional[HttpResponse] = get_conditional_response(
+            request, etag=entry['etag'], last_modified=entry['last_modified'])
+        if response is None:
+            response = HttpResponse(entry['content'])
+            headers: List[Tuple[str, str]] = entry['headers']
+            for name, value in headers:
+                response[name] = value
+        self.set_headers(response, entry)
+        return response
+
+    def set_headers(self, response: HttpResponse, entry: Dict) -> None:
+        response['ETag'] = entry['etag']
+        if entry['last_modified'] is not None:
+            response['Last-Modified'] = http_date(entry['last_modified'])
+        patch_vary_headers(response, ('Cookie',))
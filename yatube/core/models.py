@@ -1,3 +1,5 @@
+from typing import Tuple
+
 from django.db import models
 
 
@@ -10,3 +12,26 @@ class CreatedModel(models.Model):
 
     class Meta:
         abstract = True
+
+
+class CounterFieldsMixin:
+    """Не записывает счетчики при сохранении модели целиком.
+
+    Счетчики counter_fields меняются атомарными UPDATE с F(), и save()
+    загруженного ранее объекта перезаписал бы их устаревшими значениями.
+    Поэтому save() существующей строки без update_fields сохраняет все
+    поля, кроме счетчиков; явно перечисленные update_fields
+    записываются как есть.
+    """
+
+    counter_fields: Tuple[str, ...] = ()
+
+    def save(self, *args, **kwargs) -> None:
+        if (not self._state.adding and not args
+                and kwargs.get('update_fields') is None
+                and not kwargs.get('force_insert')):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.counter_fields]
+        super().save(*args, **kwargs)
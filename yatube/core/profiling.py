@@ -0,0 +1,189 @@
+"""Выборочное статистическое профилирование запросов.
+
+ProfilingMiddleware профилирует долю запросов PROFILING_SAMPLE_RATE
+и любой запрос с заголовком X-Profile, равным PROFILING_TOKEN.
+Во время запроса фоновый поток раз в PROFILING_INTERVAL секунд снимает
+стек потока запроса (sys._current_frames) - накладные расходы
+не зависят от количества вызовов функций, в отличие от cProfile.
+
+Стеки сохраняются в свернутом формате flamegraph.pl ("a;b;c 12")
+в файлы PROFILING_DIR/<имя URL>/<время>-<pid>.folded; для каждого
+имени URL хранятся только PROFILING_KEEP последних профилей. Команда
+aggregate_profiles сводит профили всех рабочих процессов.
+"""
+import hmac
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from types import FrameType
+from typing import Callable, Iterator, List, Optional, Tuple
+
+from django.conf import settings
+from django.http import HttpRequest, HttpResponse
+
+PROFILE_HEADER: str = 'HTTP_X_PROFILE'
+PROFILE_SUFFIX: str = '.folded'
+
+
+def frame_label(frame: FrameType) -> str:
+    """Подпись кадра: функция и место ее определения."""
+    code = frame.f_code
+    path: str = code.co_filename
+    for prefix in sorted(sys.path, key=len, reverse=True):
+        if prefix and path.startswith(prefix + os.sep):
+            path = path[len(prefix) + 1:]
+            break
+    return f'{code.co_name} ({path}:{code.co_firstlineno})'.replace(';', ':')
+
+
+class StackSampler:
+    """Статистический профайлер одного потока.
+
+    Стеки собираются от кадра, вызванного из boundary, до текущего:
+    кадры веб-сервера и внешних промежуточных слоев в профиль не входят.
+    """
+
+    def __init__(self, thread_id: int, boundary: Optional[FrameType],
+                 interval: float) -> None:
+        self.thread_id: int = thread_id
+        self.boundary: Optional[FrameType] = boundary
+        self.interval: float = interval
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name='stack-sampler', daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        self._thread.join()
+        return self.samples
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame: Optional[FrameType] = sys._current_frames().get(
+                self.thread_id)
+            if frame is not None:
+                self.samples[self.fold(frame)] += 1
+
+    def fold(self, frame: Optional[FrameType]) -> str:
+        """Стек в свернутом виде: от внешнего вызова к текущему."""
+        labels: List[str] = []
+        while frame is not None and frame is not self.boundary:
+            labels.append(frame_label(frame))
+            frame = frame.f_back
+        return ';'.join(reversed(labels))
+
+
+class ProfileStore:
+    """Каталог профилей с ограниченным хранением по именам URL."""
+
+    def __init__(self, directory: str, keep: int) -> None:
+        self.directory: str = directory
+        self.keep: int = keep
+
+    @staticmethod
+    def dirname(url_name: str) -> str:
+        return url_name.replace(':', '.').replace(os.sep, '_')
+
+    def save(self, url_name: str, samples: Counter) -> str:
+        """Записывает профиль и удаляет самые старые сверх лимита."""
+        directory: str = os.path.join(self.directory, self.dirname(url_name))
+        os.makedirs(directory, exist_ok=True)
+        name: str = f'{time.time_ns()}-{os.getpid()}{PROFILE_SUFFIX}'
+        path: str = os.path.join(directory, name)
+        with open(path + '.tmp', 'w', encoding='utf-8') as file:
+            for stack, count in samples.most_common():
+                file.write(f'{stack} {count}\n')
+        os.replace(path + '.tmp', path)
+        self.prune(directory)
+        return path
+
+    def prune(self, directory: str) -> None:
+        for name in self.profile_names(directory)[:-self.keep or None]:
+            try:
+                os.remove(os.path.join(directory, name))
+            except FileNotFoundError:
+                # Уже удален другим рабочим процессом.
+                pass
+
+    @staticmethod
+    def profile_names(directory: str) -> List[str]:
+        """Имена файлов профилей от старых к новым."""
+        names: List[str] = [
+            name for name in os.listdir(directory)
+            if name.endswith(PROFILE_SUFFIX)]
+        return sorted(names, key=lambda name: int(name.split('-', 1)[0]))
+
+    def url_names(self) -> List[str]:
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(
+            name for name in os.listdir(self.directory)
+            if os.path.isdir(os.path.join(self.directory, name)))
+
+    def profiles(self, url_name: str) -> Iterator[Tuple[str, Counter]]:
+        """Сохраненные профили имени URL (каталога) с их стеками."""
+        directory: str = os.path.join(self.directory, url_name)
+        for name in self.profile_names(directory):
+            samples: Counter = Counter()
+            try:
+                with open(os.path.join(directory, name),
+                          encoding='utf-8') as file:
+                    for line in file:
+                        stack, _, count = line.rstrip('\n').rpartition(' ')
+                        samples[stack] += int(count)
+            except FileNotFoundError:
+                continue
+            yield name, samples
+
+
+def get_store() -> ProfileStore:
+    return ProfileStore(settings.PROFILING_DIR, settings.PROFILING_KEEP)
+
+
+class ProfilingMiddleware:
+    """Профилирует выбранные запросы.
+
+    Должен стоять последним в MIDDLEWARE: в профиль попадают
+    представление и отрисовка шаблонов, но не остальные слои.
+    """
+
+    def __init__(self, get_response: Callable) -> None:
+        self.get_response: Callable = get_response
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        if not self.is_sampled(request):
+            return self.get_response(request)
+        sampler = StackSampler(threading.get_ident(), sys._getframe(),
+                               settings.PROFILING_INTERVAL)
+        sampler.start()
+        try:
+            response: HttpResponse = self.get_response(request)
+        finally:
+            samples: Counter = sampler.stop()
+        match = getattr(request, 'resolver_match', None)
+        if match is not None and samples:
+            path: str = get_store().save(match.view_name, samples)
+            response['X-Profile'] = os.path.basename(path)
+        return response
+
+    def is_sampled(self, request: HttpRequest) -> bool:
+        token: str = settings.PROFILING_TOKEN
+        header: Optional[str] = request.META.get(PROFILE_HEADER)
+        if token and header:
+            return hmac.compare_digest(header, token)
+        return random.random() < settings.PROFILING_SAMPLE_RATE
+
+
+def leaf_totals(samples: Counter) -> Counter:
+    """Собственное время функций: количество стеков, где она последняя."""
+    totals: Counter = Counter()
+    for stack, count in samples.items():
+        totals[stack.rpartition(';')[2]] += count
+    return totals
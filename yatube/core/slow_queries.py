@@ -0,0 +1,185 @@
+"""Журнал медленных SQL-запросов.
+
+Обертка execute_wrapper ставится на каждое подключение к базе при его
+открытии (сигнал connection_created), поэтому медленные запросы
+находятся и в представлениях, и в командах, и в фоновых потоках.
+Запрос дольше SLOW_QUERY_THRESHOLD секунд пишется в журнал
+core.slow_queries с отпечатком (SQL без литералов, см. core.utils),
+местом вызова - именем URL, шаблоном и строкой кода приложения -
+и параметрами. В записи есть номер повторения отпечатка в процессе.
+
+План запроса (EXPLAIN, для SQLite - EXPLAIN QUERY PLAN) снимается для
+первого появления отпечатка в процессе: в фоновом потоке и отдельным
+подключением, чтобы не задерживать запрос. Исключение - SQLite в памяти:
+другое подключение делит с запросом кеш и блокировки таблиц, и чтение
+плана обрывало бы запись в основном потоке ошибкой "database table is
+locked", поэтому план снимается сразу тем же подключением (EXPLAIN QUERY
+PLAN не выполняет запрос). План пишется отдельной записью. Команда
+slow_queries сводит журналы всех рабочих процессов по отпечаткам.
+"""
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from types import FrameType
+from typing import Callable, Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.base.base import BaseDatabaseWrapper
+from django.template.base import Template
+
+from . import instrumentation
+from .utils import fingerprint
+
+logger = logging.getLogger(__name__)
+
+EXPLAIN_PREFIXES: Dict[str, str] = {
+    'sqlite': 'EXPLAIN QUERY PLAN ',
+    'postgresql': 'EXPLAIN ',
+    'mysql': 'EXPLAIN ',
+}
+PARAM_LENGTH: int = 200
+# Модули замеров не бывают местом вызова запроса.
+_SKIPPED_FILES: Tuple[str, ...] = tuple(
+    os.path.join(os.path.dirname(__file__), name)
+    for name in ('cache.py', 'instrumentation.py', 'slow_queries.py',
+                 'template_backends.py'))
+
+_occurrences: Counter = Counter()
+_state_lock = threading.Lock()
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def call_site(frame: Optional[FrameType]) -> Dict[str, Optional[str]]:
+    """Шаблон и строка кода приложения, выполнившие запрос.
+
+    Идет по стеку от текущего кадра: первый кадр из BASE_DIR - строка
+    кода приложения, первый кадр отрисовки Template - шаблон.
+    """
+    source: Optional[str] = None
+    template: Optional[str] = None
+    while frame is not None and (source is None or template is None):
+        filename: str = frame.f_code.co_filename
+        if (source is None and filename.startswith(settings.BASE_DIR)
+                and filename not in _SKIPPED_FILES):
+            source = (f'{os.path.relpath(filename, settings.BASE_DIR)}:'
+                      f'{frame.f_lineno} in {frame.f_code.co_name}')
+        if template is None and frame.f_code.co_name == 'render':
+            owner = frame.f_locals.get('self')
+            if isinstance(owner, Template):
+                template = owner.name
+        frame = frame.f_back
+    return {'source': source, 'template': template}
+
+
+def format_params(params, many: bool) -> List[str]:
+    if many:
+        params = next(iter(params), None)
+    if isinstance(params, dict):
+        params = [f'{name}={value!r}' for name, value in params.items()]
+    return [repr(param)[:PARAM_LENGTH] if not isinstance(param, str)
+            else param[:PARAM_LENGTH] for param in params or ()]
+
+
+def slow_query_wrapper(execute: Callable, sql: str, params, many: bool,
+                       context: Dict):
+    """Обертка execute_wrapper, записывающая медленные запросы."""
+    threshold: Optional[float] = settings.SLOW_QUERY_THRESHOLD
+    if threshold is None:
+        return execute(sql, params, many, context)
+    started: float = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration: float = time.perf_counter() - started
+        if duration >= threshold:
+            record(context['connection'], sql, params, many, duration)
+
+
+def record(connection: BaseDatabaseWrapper, sql: str, params, many: bool,
+           duration: float) -> None:
+    """Пишет медленный запрос в журнал и ставит в очередь его план."""
+    shape: str = fingerprint(sql)
+    with _state_lock:
+        _occurrences[shape] += 1
+        count: int = _occurrences[shape]
+    timings = instrumentation.current()
+    entry: Dict = {
+        'fingerprint': shape,
+        'sql': sql,
+        'params': format_params(params, many),
+        'duration_ms': round(duration * 1000, 2),
+        'alias': connection.alias,
+        'url_name': timings.url_name if timings is not None else None,
+        'count': count,
+        **call_site(sys._getframe()),
+    }
+    logger.warning('%.1fms %s', duration * 1000, shape,
+                   extra={'slow_query': entry})
+    if (count == 1 and not many and settings.SLOW_QUERY_EXPLAIN
+            and sql.lstrip()[:6].upper() == 'SELECT'
+            and connection.vendor in EXPLAIN_PREFIXES):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            log_plan(connection, shape, sql, params)
+        else:
+            _get_executor().submit(
+                log_background_plan, connection.alias, shape, sql, params)
+
+
+def explain(connection: BaseDatabaseWrapper, sql: str, params) -> List[str]:
+    """План запроса; курсор драйвера не проходит через обертки."""
+    connection.ensure_connection()
+    cursor = connection.create_cursor()
+    try:
+        cursor.execute(EXPLAIN_PREFIXES[connection.vendor] + sql, params)
+        return [str(row[-1]) for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+
+
+def log_plan(connection: BaseDatabaseWrapper, shape: str, sql: str,
+             params) -> None:
+    try:
+        plan: List[str] = explain(connection, sql, params)
+    except Exception:
+        logger.exception('Не удалось получить план запроса %s', shape)
+        return
+    logger.warning('plan %s', shape, extra={'slow_query': {
+        'fingerprint': shape, 'alias': connection.alias, 'plan': plan}})
+
+
+def log_background_plan(alias: str, shape: str, sql: str, params) -> None:
+    """Задача пула: план в отдельном подключении потока."""
+    try:
+        log_plan(connections[alias], shape, sql, params)
+    finally:
+        connections[alias].close()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _state_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix='explain')
+        return _executor
+
+
+def install(connection: BaseDatabaseWrapper, **kwargs) -> None:
+    """Обработчик connection_created: ставит обертку на подключение.
+
+    Обертка встает первой: подключение может открыться внутри
+    connection.execute_wrapper(), который при выходе снимает последнюю.
+    """
+    if slow_query_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, slow_query_wrapper)
+
+
+def reset() -> None:
+    """Забывает отпечатки: следующий медленный запрос снова получит план."""
+    with _state_lock:
+        _occurrences.clear()
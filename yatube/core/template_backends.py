@@ -0,0 +1,30 @@
+"""Бэкенд шаблонов Django с замером отрисовки.
+
+Время отрисовки добавляется в замеры текущего запроса
+(см. core.instrumentation) как фаза tpl.
+"""
+from django.template.backends.django import DjangoTemplates, Template
+
+from . import instrumentation
+
+
+class TimedTemplate(Template):
+    """Шаблон, отрисовка которого замеряется."""
+
+    def render(self, context=None, request=None) -> str:
+        timings = instrumentation.current()
+        if timings is None:
+            return super().render(context, request)
+        with timings.measure_template():
+            return super().render(context, request)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """DjangoTemplates, возвращающий замеряемые шаблоны."""
+
+    def from_string(self, template_code: str) -> TimedTemplate:
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name: str) -> TimedTemplate:
+        template: Template = super().get_template(template_name)
+        return TimedTemplate(template.template, self)
@@ -1,7 +1,29 @@
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+from collections import Counter
 from http import HTTPStatus
+from io import StringIO
+from unittest import mock
 
+from core import db_router, metrics, slow_queries
+from core.profiling import get_store
+from django.contrib.auth import get_user_model
 from django.core.cache import cache
-from django.test import Client, TestCase
+from django.core.management import call_command
+from django.db import connection, connections
+from django.shortcuts import render
+from django.template import Context, Template
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from posts import generations
+from posts.models import Comment, Post, UserCounters
+
+User = get_user_model()
 
 
 class ErrorPagesTemplatesTest(TestCase):
@@ -15,3 +37,513 @@ class ErrorPagesTemplatesTest(TestCase):
         response_not_found = self.guest_client.get('/made_up_url/')
         self.assertEqual(response_not_found.status_code, HTTPStatus.NOT_FOUND)
         self.assertTemplateUsed(response_not_found, 'core/404.html')
+
+
+class AnonymousPageCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+        cls.post = Post.objects.create(author=cls.user, text='Тестовый пост')
+        cls.post_url = reverse(
+            'posts:post_detail', kwargs={'post_id': cls.post.id})
+
+    def setUp(self):
+        self.guest_client = Client()
+        cache.clear()
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_cached_page_served_without_queries(self):
+        """Повторный запрос страницы не обращается к базе."""
+        for address in (reverse('posts:index'), self.post_url):
+            with self.subTest(address=address):
+                first = self.guest_client.get(address)
+                with self.assertNumQueries(0):
+                    second = self.guest_client.get(address)
+                self.assertEqual(second.content, first.content)
+                self.assertEqual(second['ETag'], first['ETag'])
+                self.assertIn('Last-Modified', second)
+
+    def test_conditional_request_not_modified(self):
+        """Условный запрос с актуальным ETag получает 304."""
+        etag = self.guest_client.get(self.post_url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.guest_client.get(
+                self.post_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+    def test_cache_dropped_on_changes(self):
+        """Изменение данных сбрасывает кеш страниц."""
+        index = reverse('posts:index')
+        etag = self.guest_client.get(index)['ETag']
+        self.guest_client.get(self.post_url)
+        Post.objects.create(author=self.user, text='Новый пост')
+        Comment.objects.create(
+            post=self.post, author=self.user, text='Новый комментарий')
+
+        response = self.guest_client.get(index, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, 'Новый пост')
+        self.assertContains(
+            self.guest_client.get(self.post_url), 'Новый комментарий')
+
+    def test_cached_page_keeps_headers(self):
+        """Страница из кеша отдается с заголовками исходного ответа."""
+        first = self.guest_client.get(self.post_url)
+        with self.assertNumQueries(0):
+            second = self.guest_client.get(self.post_url)
+
+        self.assertEqual(second['X-Frame-Options'], 'SAMEORIGIN')
+        skipped = {'Server-Timing'}
+        self.assertEqual(
+            {name: value for name, value in second.items()
+             if name not in skipped},
+            {name: value for name, value in first.items()
+             if name not in skipped})
+
+    def test_last_modified_follows_changes(self):
+        """Изменение поста меняет Last-Modified его страницы."""
+        last_modified = self.guest_client.get(self.post_url)['Last-Modified']
+        later = int((time.time() + 60) * 1_000_000)
+        with mock.patch.object(generations, '_initial', return_value=later):
+            self.post.text = 'Измененный пост'
+            self.post.save()
+
+        response = self.guest_client.get(
+            self.post_url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertContains(response, 'Измененный пост')
+        self.assertNotEqual(response['Last-Modified'], last_modified)
+
+    def test_authorized_pages_not_cached(self):
+        """Страницы авторизованных пользователей не кешируются."""
+        client = Client()
+        client.force_login(self.user)
+        client.get(self.post_url)
+        response = client.get(self.post_url)
+        self.assertNotIn('ETag', response)
+        self.assertIsNotNone(response.context)
+
+
+class ServerTimingTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+        cls.staff = User.objects.create_user(
+            username='TestStaff', is_staff=True)
+        cls.post = Post.objects.create(author=cls.user, text='Тестовый пост')
+
+    def setUp(self):
+        cache.clear()
+        self.staff_client = Client()
+        self.staff_client.force_login(self.staff)
+
+    @staticmethod
+    def parse(header):
+        """Записи Server-Timing: имя -> параметры."""
+        entries = {}
+        for name, params in re.findall(r'(\w+)((?:;\w+=(?:"[^"]*"|[^,;]*))*)',
+                                       header):
+            entries[name] = dict(re.findall(r';(\w+)=("[^"]*"|[^,;]*)',
+                                            params))
+        return entries
+
+    def test_header_reports_phases_and_counts(self):
+        """Server-Timing содержит фазы запроса и количество запросов."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.staff_client.get(reverse('posts:index'))
+        entries = self.parse(response['Server-Timing'])
+
+        for phase in ('total', 'resolve', 'view', 'db', 'tpl', 'cache'):
+            with self.subTest(phase=phase):
+                self.assertGreaterEqual(float(entries[phase]['dur']), 0)
+        self.assertEqual(
+            entries['db']['desc'],
+            f'"{len(queries.captured_queries)} queries"')
+        self.assertRegex(
+            entries['cache']['desc'], r'"\d+ hits, [1-9]\d* misses"')
+
+    def test_request_is_logged_with_timings(self):
+        """Запрос пишется в журнал структурированной записью."""
+        with self.assertLogs('core.instrumentation', 'INFO') as logs:
+            self.staff_client.get(
+                reverse('posts:post_detail', kwargs={'post_id': 1}))
+        record = logs.records[0]
+        self.assertEqual(record.timing['url_name'], 'posts:post_detail')
+        self.assertGreater(record.timing['counts']['queries'], 0)
+        self.assertEqual(record.status_code, HTTPStatus.OK)
+
+    @override_settings(SERVER_TIMING_PUBLIC=False)
+    def test_header_hidden_from_regular_users(self):
+        """Без SERVER_TIMING_PUBLIC заголовок видят только сотрудники."""
+        response = Client().get(reverse('posts:index'))
+        self.assertNotIn('Server-Timing', response)
+        response = self.staff_client.get(reverse('posts:index'))
+        self.assertIn('Server-Timing', response)
+
+
+@override_settings(PROFILING_TOKEN='secret', PROFILING_INTERVAL=0.0002,
+                   PROFILING_SAMPLE_RATE=0, PROFILING_KEEP=2)
+class ProfilingTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+        Post.objects.bulk_create(
+            Post(author=cls.user, text=f'Пост {number}')
+            for number in range(10))
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        settings_override = override_settings(PROFILING_DIR=self.directory)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.client.force_login(self.user)
+
+    def test_request_with_token_is_profiled(self):
+        """Запрос с верным X-Profile профилируется по имени URL."""
+        def slow_render(*args, **kwargs):
+            # Представление не успевает закончиться до первого отсчета.
+            time.sleep(0.01)
+            return render(*args, **kwargs)
+
+        with mock.patch('posts.views.render', slow_render):
+            response = self.client.get(
+                reverse('posts:index'), HTTP_X_PROFILE='secret')
+        [(name, samples)] = get_store().profiles('posts.index')
+
+        self.assertEqual(response['X-Profile'], name)
+        self.assertTrue(any(
+            'index (posts/views.py' in stack for stack in samples))
+        self.assertFalse(any(
+            'ServerTimingMiddleware' in stack for stack in samples))
+
+    def test_request_with_wrong_token_is_not_profiled(self):
+        """Запрос с неверным X-Profile не профилируется."""
+        response = self.client.get(
+            reverse('posts:index'), HTTP_X_PROFILE='wrong')
+        self.assertNotIn('X-Profile', response)
+        self.assertEqual(get_store().url_names(), [])
+
+    def test_retention_and_aggregation(self):
+        """Хранятся последние профили, команда сводит их стеки."""
+        store = get_store()
+        for count in (1, 2, 3):
+            store.save('posts:profile', Counter({'view;render': count}))
+        output = os.path.join(self.directory, 'out')
+        stdout = StringIO()
+        call_command('aggregate_profiles', '--url-name=posts:profile',
+                     f'--output={output}', stdout=stdout)
+
+        self.assertIn('профилей 2, отсчетов 5', stdout.getvalue())
+        with open(os.path.join(output, 'posts.profile.folded')) as file:
+            self.assertEqual(file.read(), 'view;render 5\n')
+
+
+@override_settings(METRICS_FLUSH_INTERVAL=0)
+class MetricsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+        Post.objects.create(author=cls.user, text='Тестовый пост')
+
+    def setUp(self):
+        cache.clear()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        settings_override = override_settings(METRICS_DIR=self.directory)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        metrics.registry.reset()
+        self.addCleanup(metrics.registry.reset)
+
+    def scrape(self):
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        return response.content.decode()
+
+    def test_requests_are_recorded_per_url_name(self):
+        """Запросы учитываются в гистограммах по имени URL."""
+        for _ in range(2):
+            self.client.get(reverse('posts:index'))
+        metrics.record_thumbnail(0.2)
+        body = self.scrape()
+
+        for line in (
+            'yatube_request_duration_seconds_count{view="posts:index"} 2',
+            'yatube_request_duration_seconds_bucket'
+            '{view="posts:index",le="+Inf"} 2',
+            'yatube_request_queries_count{view="posts:index"} 2',
+            'yatube_cache_requests_total{view="posts:index",result="miss"}',
+            'yatube_cache_hit_ratio{view="posts:index"}',
+            'yatube_thumbnail_generation_seconds_bucket'
+            '{view="background",le="0.25"} 1',
+        ):
+            with self.subTest(line=line):
+                self.assertIn(line, body)
+
+    def test_metrics_of_all_workers_are_summed(self):
+        """Метрики складываются из файлов всех рабочих процессов."""
+        self.client.get(reverse('posts:index'))
+        other = {'yatube_request_duration_seconds': {
+            json.dumps([['view', 'posts:index']]): {
+                'buckets': [3] + [0] * 11, 'sum': 0.003, 'count': 3}}}
+        with open(os.path.join(self.directory, '1-1.json'), 'w') as file:
+            json.dump(other, file)
+
+        self.assertIn(
+            'yatube_request_duration_seconds_count{view="posts:index"} 4',
+            self.scrape())
+
+    def test_metrics_stay_in_process_without_directory(self):
+        """Без METRICS_DIR метрики не пишутся на диск."""
+        with self.settings(METRICS_DIR=None):
+            self.client.get(reverse('posts:index'))
+            body = self.scrape()
+
+        self.assertIn(
+            'yatube_request_duration_seconds_count{view="posts:index"} 1',
+            body)
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_metrics_hidden_from_other_addresses(self):
+        """Метрики недоступны с адресов вне METRICS_ALLOWED_IPS."""
+        response = self.client.get(
+            reverse('metrics'), REMOTE_ADDR='203.0.113.1')
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+
+class SlowQueryLogTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+        cls.post = Post.objects.create(author=cls.user, text='Тестовый пост')
+
+    def setUp(self):
+        cache.clear()
+        slow_queries.reset()
+        self.client.force_login(self.user)
+
+    def capture(self, action, explain=False):
+        """Записи журнала медленных запросов при нулевом пороге."""
+        with self.settings(SLOW_QUERY_THRESHOLD=0,
+                           SLOW_QUERY_EXPLAIN=explain):
+            with self.assertLogs('core.slow_queries', 'WARNING') as logs:
+                action()
+                if explain:
+                    self.wait_for_plan(logs)
+        return [record.slow_query for record in logs.records]
+
+    @staticmethod
+    def wait_for_plan(logs):
+        for _ in range(100):
+            if any('plan' in record.slow_query for record in logs.records):
+                return
+            time.sleep(0.05)
+
+    def test_slow_query_logged_with_call_site(self):
+        """Медленный запрос пишется с отпечатком, местом вызова
+        и параметрами."""
+        entries = self.capture(lambda: self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id})))
+        [entry] = [entry for entry in entries
+                   if 'FROM "posts_post"' in entry['fingerprint']
+                   and entry['source'].startswith('posts/views.py')]
+
+        self.assertEqual(entry['url_name'], 'posts:post_detail')
+        self.assertIn('"posts_post"."id" = ?', entry['fingerprint'])
+        self.assertIn(str(self.post.id), entry['params'])
+
+    def test_template_of_lazy_query_is_logged(self):
+        """Для запроса, выполненного при отрисовке, указан шаблон."""
+        template = Template(
+            '{% for post in posts %}{{ post.text }}{% endfor %}',
+            name='posts/test.html')
+        [entry] = self.capture(lambda: template.render(
+            Context({'posts': Post.objects.all()})))
+        self.assertEqual(entry['template'], 'posts/test.html')
+        self.assertTrue(entry['source'].startswith('core/tests.py'))
+
+    def test_repeated_offenders_are_counted(self):
+        """Повторения отпечатка нумеруются, литералы не различаются."""
+        def action():
+            for post_id in (1, 2):
+                Post.objects.filter(id=post_id).first()
+
+        first, second = self.capture(action)
+        self.assertEqual(first['fingerprint'], second['fingerprint'])
+        self.assertEqual((first['count'], second['count']), (1, 2))
+
+    def test_log_disabled_without_threshold(self):
+        """Порог None отключает журнал."""
+        with self.settings(SLOW_QUERY_THRESHOLD=None), \
+                mock.patch.object(slow_queries, 'record') as record:
+            Post.objects.filter(text='Тестовый пост').first()
+        record.assert_not_called()
+
+    def test_plan_is_captured(self):
+        """План первого появления отпечатка пишется отдельной записью."""
+        entries = self.capture(
+            lambda: Post.objects.filter(text='Тестовый пост').first(),
+            explain=True)
+        [plan] = [entry['plan'] for entry in entries if 'plan' in entry]
+        self.assertTrue(any('posts_post' in line for line in plan))
+
+    def test_plan_of_file_database_is_captured_in_background(self):
+        """План базы на диске снимается в фоновом потоке."""
+        executor = mock.Mock()
+        with mock.patch.object(connection, 'is_in_memory_db',
+                               return_value=False), \
+                mock.patch.object(slow_queries, '_get_executor',
+                                  return_value=executor), \
+                self.settings(SLOW_QUERY_THRESHOLD=0), \
+                self.assertLogs('core.slow_queries', 'WARNING'):
+            Post.objects.filter(text='Тестовый пост').first()
+        executor.submit.assert_called_once()
+        self.assertIs(executor.submit.call_args[0][0],
+                      slow_queries.log_background_plan)
+
+    def test_command_aggregates_logs(self):
+        """Команда сводит журналы по отпечаткам."""
+        entry = {'fingerprint': 'SELECT ?', 'duration_ms': 150.0,
+                 'params': ['1'], 'url_name': 'posts:index',
+                 'template': 'posts/index.html', 'source': 'posts/views.py:1'}
+        lines = [
+            'не JSON',
+            json.dumps({'slow_query': entry}),
+            json.dumps({'slow_query': {**entry, 'duration_ms': 50.0}}),
+            json.dumps({'slow_query': {'fingerprint': 'SELECT ?',
+                                       'plan': ['SCAN posts_post']}}),
+        ]
+        path = os.path.join(tempfile.mkdtemp(), 'worker.log')
+        self.addCleanup(shutil.rmtree, os.path.dirname(path))
+        with open(path, 'w') as file:
+            file.write('\n'.join(lines))
+        stdout = StringIO()
+        call_command('slow_queries', path, stdout=stdout)
+
+        output = stdout.getvalue()
+        self.assertIn('200 мс всего, 2 раз', output)
+        self.assertIn('2 x posts:index | posts/index.html', output)
+        self.assertIn('план: SCAN posts_post', output)
+
+
+class ReplicaRoutingTest(TestCase):
+    """Реплика - отдельный файл SQLite, отстающий от основной базы."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.directory = tempfile.mkdtemp()
+        connections.databases['replica'] = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.path.join(cls.directory, 'replica.sqlite3'),
+        }
+        call_command('migrate', database='replica', verbosity=0)
+        cls.user = User.objects.create_user(username='TestUser')
+        cls.post = Post.objects.create(author=cls.user, text='Общий пост')
+        # На реплику еще не пришел новый пост основной базы.
+        User.objects.using('replica').bulk_create(
+            [User(id=cls.user.id, username=cls.user.username)])
+        UserCounters.objects.using('replica').bulk_create(
+            [UserCounters(user_id=cls.user.id, posts_count=1)])
+        Post.objects.using('replica').bulk_create([Post(
+            id=cls.post.id, author_id=cls.user.id, text=cls.post.text)])
+        Post.objects.create(author=cls.user, text='Новый пост')
+
+    @classmethod
+    def tearDownClass(cls):
+        connections['replica'].close()
+        del connections.databases['replica']
+        delattr(connections._connections, 'replica')
+        shutil.rmtree(cls.directory, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        db_router.health.reset()
+        self.addCleanup(db_router.health.reset)
+        settings_override = override_settings(DATABASE_REPLICAS=['replica'])
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def get_profile(self):
+        return self.client.get(
+            reverse('posts:profile', kwargs={'username': 'TestUser'}))
+
+    def age_generations(self):
+        """Поколения изменились давно: реплика успела бы их догнать."""
+        long_ago = int((time.time() - 60) * 1_000_000)
+        with mock.patch.object(
+                generations, '_initial', return_value=long_ago):
+            generations.snapshot((
+                generations.author_key(self.user.id),
+                generations.post_key(self.post.id)))
+
+    def break_replica(self):
+        """Делает файл реплики недоступным."""
+        replica = connections['replica']
+        name = replica.settings_dict['NAME']
+        replica.close()
+        replica.settings_dict['NAME'] = os.path.join(name, 'missing')
+        self.addCleanup(replica.settings_dict.__setitem__, 'NAME', name)
+        self.addCleanup(replica.close)
+
+    def test_reads_go_to_replica(self):
+        """GET читает с реплики, которая еще не видит новый пост."""
+        self.age_generations()
+        response = self.get_profile()
+        self.assertContains(response, 'Общий пост')
+        self.assertNotContains(response, 'Новый пост')
+
+    def test_writer_sticks_to_primary(self):
+        """После записи пользователь читает основную базу."""
+        self.client.force_login(self.user)
+        response = self.client.post(
+            reverse('posts:post_create'), {'text': 'Только что'},
+            follow=True)
+        self.assertIn(db_router.STICKY_COOKIE, response.client.cookies)
+        self.assertContains(response, 'Только что')
+        self.assertContains(response, 'Новый пост')
+
+    def test_unhealthy_replica_is_skipped(self):
+        """Недоступная при проверке реплика не используется."""
+        self.age_generations()
+        self.break_replica()
+        self.assertContains(self.get_profile(), 'Новый пост')
+
+    def test_replica_failure_retries_on_primary(self):
+        """Отказ реплики во время запроса повторяет его на основной базе."""
+        self.age_generations()
+        self.get_profile()
+        self.break_replica()
+        cache.clear()
+        self.age_generations()
+        with self.assertLogs('core.db_router', 'WARNING'):
+            response = self.get_profile()
+        self.assertContains(response, 'Новый пост')
+
+    def test_recent_change_reads_primary(self):
+        """Недавно измененная область читается с основной базы и
+        кешируется свежей."""
+        self.age_generations()
+        generations.bump((generations.author_key(self.user.id),))
+
+        self.assertContains(self.get_profile(), 'Новый пост')
+        self.assertContains(self.get_profile(), 'Новый пост')
+
+    def test_object_read_from_replica_is_reread(self):
+        """Пост, прочитанный с реплики до перехода на основную базу,
+        читается заново."""
+        self.age_generations()
+        Post.objects.filter(pk=self.post.pk).update(text='Исправленный пост')
+        generations.bump((generations.post_key(self.post.id),))
+
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}))
+        self.assertContains(response, 'Исправленный пост')
@@ -0,0 +1,48 @@
+import re
+from contextlib import contextmanager
+from itertools import islice
+from typing import Iterable, Iterator, List
+
+from django.core.management.color import no_style
+from django.db import connection
+
+
+def batched(items: Iterable, size: int) -> Iterator[List]:
+    """Разбивает последовательность на списки длиной не больше size."""
+    iterator: Iterator = iter(items)
+    batch: List = list(islice(iterator, size))
+    while batch:
+        yield batch
+        batch = list(islice(iterator, size))
+
+
+def fingerprint(sql: str) -> str:
+    """SQL-запрос без литералов: одинаковые запросы с разными
+    параметрами имеют один отпечаток."""
+    sql = sql.replace('%s', '?')
+    sql = re.sub(r"'(?:[^']|'')*'", '?', sql)
+    sql = re.sub(r'\b\d+(?:\.\d+)?\b', '?', sql)
+    return re.sub(r'\(\s*\?(?:\s*,\s*\?)*\s*\)', '(...)', sql)
+
+
+@contextmanager
+def explicit_created(*models) -> Iterator[None]:
+    """Позволяет задать created при bulk_create вместо auto_now_add."""
+    fields = [model._meta.get_field('created') for model in models]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def reset_sequences(*models) -> None:
+    """Продолжает последовательности id после строк с явными id.
+
+    Для SQLite ничего не делает: там следующий id берется из таблицы.
+    """
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(no_style(), models):
+            cursor.execute(sql)
@@ -1,5 +1,9 @@
+from django.conf import settings
+from django.http import Http404, HttpResponse
 from django.shortcuts import render
 
+from . import metrics as app_metrics
+
 
 def page_not_found(request, exception):
     """Кастомная страница 404 ошибки."""
@@ -19,3 +23,16 @@ def server_error(request):
 def csrf_failure(request, reason=''):
     """Кастомная страница 403 csrf ошибки."""
     return render(request, 'core/403csrf.html')
+
+
+def metrics(request):
+    """Метрики всех рабочих процессов в формате Prometheus.
+
+    Доступны только с адресов METRICS_ALLOWED_IPS.
+    """
+    if request.META.get('REMOTE_ADDR') not in settings.METRICS_ALLOWED_IPS:
+        raise Http404
+    return HttpResponse(
+        app_metrics.render(app_metrics.collect()),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
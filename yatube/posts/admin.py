@@ -1,30 +1,50 @@
+from typing import List, Tuple
+
+from core.admin import LargeTableAdminMixin
 from django.contrib import admin
+from django.db.models.query import QuerySet
+from django.http import HttpRequest
 
+from . import constants, search
 from .models import Comment, Group, Post
 
 
 @admin.register(Post)
-class PostAdmin(admin.ModelAdmin):
+class PostAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     """Настройка отображения постов в админке."""
 
     list_display = ('pk', 'text', 'created', 'author', 'group',)
+    list_select_related = ('author', 'group',)
+    autocomplete_fields = ('author', 'group',)
     search_fields = ('text',)
     list_filter = ('created',)
     empty_value_display = '-пусто-'
-    list_editable = ('group',)
+
+    def get_search_results(self, request: HttpRequest, queryset: QuerySet,
+                           search_term: str) -> Tuple[QuerySet, bool]:
+        """Ищет посты по полнотекстовому индексу вместо LIKE '%...%'."""
+        if not search_term.strip():
+            return queryset, False
+        found: List[search.Cursor] = search.search_ids(
+            search_term, limit=constants.SEARCH_ADMIN_LIMIT)
+        return queryset.filter(
+            pk__in=[post_id for _, post_id in found]), False
 
 
 @admin.register(Group)
-class GroupAdmin(admin.ModelAdmin):
+class GroupAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     """Настройка отображения групп в админке."""
 
     list_display = ('title', 'slug',)
+    search_fields = ('title', 'slug',)
     empty_value_display = '-пусто-'
 
 
 @admin.register(Comment)
-class GroupAdmin(admin.ModelAdmin):
+class CommentAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     """Настройка отображения комментариев в админке."""
 
-    list_display = ('text', 'author', 'created',)
+    list_display = ('text', 'author', 'post', 'created',)
+    list_select_related = ('author', 'post',)
+    autocomplete_fields = ('author', 'post',)
     empty_value_display = '-пусто-'
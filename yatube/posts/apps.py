@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class PostsConfig(AppConfig):
     name: str = 'posts'
+
+    def ready(self) -> None:
+        """Подключает обработчики сигналов."""
+        from . import signals  # noqa: F401
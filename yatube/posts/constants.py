@@ -1,2 +1,36 @@
 """Константы для приложения posts."""
 POSTS_PER_PAGE = 10
+COMMENTS_PER_PAGE = 20
+POSTS_COUNT_CACHE_TIMEOUT = None
+POSTS_COUNT_BATCH_SIZE = 1000
+TIMELINE_FANOUT_MAX_FOLLOWERS = 5000
+TIMELINE_BATCH_SIZE = 1000
+GENERATION_CACHE_TIMEOUT = None
+POST_CARD_CACHE_TIMEOUT = 60 * 60 * 24
+# Размеры миниатюр из шаблонов, создаваемые сразу после загрузки.
+THUMBNAIL_GEOMETRIES = ('960x339',)
+THUMBNAIL_WORKERS = 2
+THUMBNAIL_QUEUE_SIZE = 100
+THUMBNAIL_LOCK_TIMEOUT = 60
+THUMBNAIL_LOCK_POLL = 0.05
+THUMBNAIL_LRU_SIZE = 1024
+# Ограничения загружаемых изображений.
+IMAGE_MAX_SIDE = 1920
+IMAGE_MAX_PIXELS = 64_000_000
+IMAGE_MAX_DECODE_PIXELS = 16_000_000
+IMAGE_JPEG_QUALITY = 85
+SEARCH_ADMIN_LIMIT = 1000
+# Размер пакета bulk_create при импорте и количество записей
+# в одной транзакции (после каждой сохраняется контрольная точка).
+IMPORT_BATCH_SIZE = 1000
+IMPORT_COMMIT_EVERY = 20_000
+# Размер порции строк, читаемой серверным курсором при экспорте.
+EXPORT_CHUNK_SIZE = 2000
+# Генератор синтетических данных: зерно по умолчанию, размер пакета,
+# количество разных текстов (генерация текста Faker дороже вставки),
+# размер образцов изображений и доля постов с изображением.
+DATASET_SEED = 2022
+DATASET_BATCH_SIZE = 5000
+DATASET_TEXTS_COUNT = 1000
+DATASET_IMAGE_SIZE = (960, 640)
+DATASET_IMAGE_SHARE = 0.2
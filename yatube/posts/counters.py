@@ -0,0 +1,178 @@
+"""Счетчики постов, комментариев и подписок.
+
+Количество постов автора и группы, комментариев поста и подписок
+пользователя хранится в столбцах моделей (Group.posts_count,
+Post.comments_count, UserCounters) и обновляется атомарно F-выражениями
+из сигналов (см. signals.py), поэтому шаблоны и паджинатор не выполняют
+COUNT(*) на каждый запрос. Общее количество постов хранится в кеше.
+Расхождения исправляют команды repair_counters и reconcile_post_counts.
+"""
+from typing import Iterable, Iterator, Optional
+
+from core.utils import batched
+from django.contrib.auth.models import AbstractBaseUser
+from django.core.cache import cache
+from django.core.exceptions import ObjectDoesNotExist
+from django.core.paginator import Page, Paginator
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.db.models.query import QuerySet
+
+from . import constants
+from .models import Comment, Follow, Group, Post, User, UserCounters
+
+
+def all_posts_key() -> str:
+    """Ключ количества всех постов."""
+    return 'posts_count:all'
+
+
+def get_all_posts_count() -> int:
+    """Количество всех постов из кеша, при промахе считает и сохраняет."""
+    count: Optional[int] = cache.get(all_posts_key())
+    if count is None:
+        count = Post.objects.count()
+        cache.add(all_posts_key(), count, constants.POSTS_COUNT_CACHE_TIMEOUT)
+    return count
+
+
+def change_all_posts_count(delta: int) -> None:
+    """Изменяет общее количество постов в кеше.
+
+    Если ключа нет в кеше, он будет посчитан заново при обращении.
+    """
+    try:
+        cache.incr(all_posts_key(), delta)
+    except ValueError:
+        pass
+
+
+def reconcile_counts() -> int:
+    """Пересчитывает общее количество постов в кеше и возвращает его."""
+    count: int = Post.objects.count()
+    cache.set(all_posts_key(), count, constants.POSTS_COUNT_CACHE_TIMEOUT)
+    return count
+
+
+def change_counter(queryset: QuerySet, field: str, delta: int) -> int:
+    """Атомарно изменяет счетчик field у строк queryset на delta.
+
+    Счетчик не уходит ниже нуля. Возвращает количество обновленных строк.
+    """
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    return queryset.update(**{field: F(field) + delta})
+
+
+def change_user_counter(user_id: int, field: str, delta: int) -> int:
+    """Изменяет счетчик пользователя."""
+    return change_counter(
+        UserCounters.objects.filter(user_id=user_id), field, delta)
+
+
+def change_group_counter(group_id: Optional[int], delta: int) -> int:
+    """Изменяет количество постов группы."""
+    if group_id is None:
+        return 0
+    return change_counter(
+        Group.objects.filter(pk=group_id), 'posts_count', delta)
+
+
+def recount_user(user_id: int) -> UserCounters:
+    """Пересчитывает счетчики одного пользователя."""
+    user_counters, _ = UserCounters.objects.update_or_create(
+        user_id=user_id,
+        defaults={
+            'posts_count': Post.objects.filter(author_id=user_id).count(),
+            'followers_count': Follow.objects.filter(
+                author_id=user_id).count(),
+            'following_count': Follow.objects.filter(
+                user_id=user_id).count(),
+        },
+    )
+    return user_counters
+
+
+def get_user_counters(user: AbstractBaseUser) -> UserCounters:
+    """Счетчики пользователя.
+
+    Если строки счетчиков нет (пользователь создан в обход сигналов),
+    она создается пересчетом.
+    """
+    try:
+        return user.counters
+    except ObjectDoesNotExist:
+        return recount_user(user.id)
+
+
+def _count_of(queryset: QuerySet, field: str) -> Coalesce:
+    """Подзапрос количества строк queryset, связанных по field с OuterRef."""
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{field: OuterRef('pk')}).order_by()
+            .values(field).annotate(total=Count('pk')).values('total'),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+def _in_batches(queryset: QuerySet, field: str,
+                ids: Optional[Iterable[int]]) -> Iterator[QuerySet]:
+    """queryset целиком или порциями строк, у которых field среди ids."""
+    if ids is None:
+        yield queryset
+        return
+    for batch in batched(sorted(ids), constants.POSTS_COUNT_BATCH_SIZE):
+        yield queryset.filter(**{f'{field}__in': batch})
+
+
+@transaction.atomic
+def repair_counters(user_ids: Optional[Iterable[int]] = None,
+                    group_ids: Optional[Iterable[int]] = None,
+                    post_ids: Optional[Iterable[int]] = None) -> None:
+    """Пересчитывает денормализованные счетчики пакетными запросами.
+
+    Если заданы id, пересчитываются только счетчики этих пользователей,
+    групп и постов, иначе - все.
+    """
+    for users in _in_batches(User.objects.all(), 'id', user_ids):
+        users_without_counters: QuerySet = users.filter(
+            counters__isnull=True).values_list('id', flat=True)
+        for batch in batched(users_without_counters.iterator(),
+                             constants.POSTS_COUNT_BATCH_SIZE):
+            UserCounters.objects.bulk_create(
+                [UserCounters(user_id=user_id) for user_id in batch],
+                ignore_conflicts=True,
+            )
+    for user_counters in _in_batches(
+            UserCounters.objects.all(), 'user_id', user_ids):
+        user_counters.update(
+            posts_count=_count_of(Post.objects.all(), 'author'),
+            followers_count=_count_of(Follow.objects.all(), 'author'),
+            following_count=_count_of(Follow.objects.all(), 'user'),
+        )
+    for groups in _in_batches(Group.objects.all(), 'id', group_ids):
+        groups.update(posts_count=_count_of(Post.objects.all(), 'group'))
+    for posts in _in_batches(Post.objects.all(), 'id', post_ids):
+        posts.update(comments_count=_count_of(Comment.objects.all(), 'post'))
+
+
+class CountedPaginator(Paginator):
+    """Паджинатор с заранее известным количеством объектов.
+
+    Срез страницы не обрезается по count, поэтому отставший счетчик
+    не прячет посты текущей страницы.
+    """
+
+    def __init__(self, object_list: QuerySet, per_page: int,
+                 count: int, **kwargs) -> None:
+        super().__init__(object_list, per_page, **kwargs)
+        self.count: int = count
+
+    def page(self, number) -> Page:
+        number = self.validate_number(number)
+        bottom: int = (number - 1) * self.per_page
+        return self._get_page(
+            self.object_list[bottom:bottom + self.per_page], number, self)
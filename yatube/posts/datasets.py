@@ -0,0 +1,235 @@
+"""Синтетические наборы данных для нагрузочного тестирования.
+
+Данные воспроизводимы: random и Faker используют одно зерно, поэтому
+на пустой базе одинаковые параметры дают одинаковые строки.
+Популярность авторов подчиняется закону Ципфа: немногие авторы пишут
+большую часть постов и собирают большую часть подписчиков, а число
+подписок пользователя распределено по Парето.
+
+Первичные ключи назначаются заранее, начиная с наибольшего id
+в таблице, поэтому комментарии и подписки ссылаются на посты и
+пользователей без повторного чтения вставленных строк, а каждая
+таблица заполняется только пакетными bulk_create.
+"""
+import io
+import random
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from itertools import accumulate
+from typing import Callable, Iterator, List, Optional
+
+from core.utils import batched, explicit_created, reset_sequences
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db.models import Max, Model
+from django.utils import timezone
+from faker import Faker
+from PIL import Image, ImageDraw
+
+from . import constants, counters, generations, search, timeline
+from .models import Comment, Follow, Group, Post, User
+
+
+@dataclass(frozen=True)
+class Scale:
+    """Размер набора данных."""
+
+    posts: int
+    users: int
+    groups: int
+    follows_per_user: int
+    comments_per_post: float
+
+
+SCALES = {
+    'smoke': Scale(posts=1_000, users=100, groups=5,
+                   follows_per_user=10, comments_per_post=0.5),
+    '10k': Scale(posts=10_000, users=1_000, groups=20,
+                 follows_per_user=20, comments_per_post=0.5),
+    '100k': Scale(posts=100_000, users=10_000, groups=100,
+                  follows_per_user=30, comments_per_post=0.5),
+    '1m': Scale(posts=1_000_000, users=50_000, groups=500,
+                follows_per_user=50, comments_per_post=0.5),
+}
+
+
+@dataclass(frozen=True)
+class Generated:
+    """Диапазоны id созданных строк."""
+
+    users: range
+    groups: range
+    posts: range
+
+
+def zipf_weights(count: int, exponent: float = 1.1) -> List[float]:
+    """Веса популярности по закону Ципфа."""
+    return [1 / (rank ** exponent) for rank in range(1, count + 1)]
+
+
+def _next_id(model: Model) -> int:
+    return (model.objects.aggregate(last=Max('id'))['last'] or 0) + 1
+
+
+class DatasetGenerator:
+    """Генератор набора данных заданного размера."""
+
+    def __init__(self, scale: Scale,
+                 seed: int = constants.DATASET_SEED,
+                 images: int = 0,
+                 password: Optional[str] = None,
+                 batch_size: int = constants.DATASET_BATCH_SIZE,
+                 progress: Optional[Callable[[str, int, float], None]] = None
+                 ) -> None:
+        self.scale: Scale = scale
+        self.images: int = images
+        self.batch_size: int = batch_size
+        self.progress: Optional[Callable[[str, int, float], None]] = progress
+        self.random: random.Random = random.Random(seed)
+        self.fake: Faker = Faker('ru_RU')
+        self.fake.seed_instance(seed)
+        # Хеш пароля вычисляется один раз: это самая дорогая часть
+        # создания пользователя.
+        self.password: str = (
+            make_password(password) if password else '!')
+        self.now: datetime = timezone.now()
+
+    def generate(self) -> Generated:
+        """Создает пользователей, группы, посты, комментарии и подписки."""
+        users: range = self._users()
+        groups: range = self._groups()
+        author_weights: List[float] = list(
+            accumulate(zipf_weights(len(users))))
+        texts: List[str] = [self.fake.text(max_nb_chars=400)
+                            for _ in range(constants.DATASET_TEXTS_COUNT)]
+        images: List[str] = self._images()
+        posts: range = range(_next_id(Post), _next_id(Post) + self.scale.posts)
+        with explicit_created(Post, Comment):
+            self._insert(Post, self._posts(
+                posts, users, groups, author_weights, texts, images))
+            self._insert(Comment, self._comments(posts, users, texts))
+        self._insert(Follow, self._follows(users, author_weights))
+        reset_sequences(User, Group, Post, Comment, Follow)
+        return Generated(users=users, groups=groups, posts=posts)
+
+    def finish(self, rebuild: bool = True) -> None:
+        """Пересчитывает счетчики и сбрасывает кеш страниц.
+
+        При rebuild=True перестраиваются также поисковый индекс
+        и ленты подписок.
+        """
+        counters.repair_counters()
+        counters.reconcile_counts()
+        if rebuild:
+            search.rebuild()
+            timeline.rebuild()
+        generations.bump((generations.global_key(), generations.groups_key()))
+
+    def _insert(self, model: Model, objects: Iterator[Model]) -> None:
+        started: float = time.monotonic()
+        inserted: int = 0
+        for batch in batched(objects, self.batch_size):
+            model.objects.bulk_create(batch)
+            inserted += len(batch)
+        if self.progress is not None:
+            self.progress(model._meta.verbose_name_plural, inserted,
+                          time.monotonic() - started)
+
+    def _users(self) -> range:
+        ids: range = range(_next_id(User), _next_id(User) + self.scale.users)
+        self._insert(User, (
+            User(id=pk, username=f'user{pk}', password=self.password,
+                 first_name=self.fake.first_name(),
+                 last_name=self.fake.last_name())
+            for pk in ids))
+        return ids
+
+    def _groups(self) -> range:
+        ids: range = range(
+            _next_id(Group), _next_id(Group) + self.scale.groups)
+        self._insert(Group, (
+            Group(id=pk, slug=f'group-{pk}',
+                  title=self.fake.catch_phrase()[:200],
+                  description=self.fake.paragraph())
+            for pk in ids))
+        return ids
+
+    def _images(self) -> List[str]:
+        """Сохраняет образцы изображений и возвращает их имена."""
+        names: List[str] = []
+        for number in range(self.images):
+            image: Image.Image = Image.new(
+                'RGB', constants.DATASET_IMAGE_SIZE, self._color())
+            draw: ImageDraw.ImageDraw = ImageDraw.Draw(image)
+            width, height = constants.DATASET_IMAGE_SIZE
+            for _ in range(8):
+                x, y = self.random.randrange(width), self.random.randrange(
+                    height)
+                draw.rectangle(
+                    (x, y, x + width // 4, y + height // 4),
+                    fill=self._color())
+            content: io.BytesIO = io.BytesIO()
+            image.save(content, format='JPEG',
+                       quality=constants.IMAGE_JPEG_QUALITY)
+            names.append(default_storage.save(
+                f'posts/sample-{number}.jpg', ContentFile(content.getvalue())))
+        return names
+
+    def _color(self):
+        return tuple(self.random.randrange(256) for _ in range(3))
+
+    def _post_created(self, posts: range, pk: int) -> datetime:
+        # Посты идут с шагом в минуту и заканчиваются текущим временем.
+        return self.now - timedelta(minutes=posts.stop - pk)
+
+    def _posts(self, posts: range, users: range, groups: range,
+               author_weights: List[float], texts: List[str],
+               images: List[str]) -> Iterator[Post]:
+        rnd: random.Random = self.random
+        for pk in posts:
+            yield Post(
+                id=pk,
+                author_id=rnd.choices(users, cum_weights=author_weights)[0],
+                group_id=(rnd.choice(groups)
+                          if groups and rnd.random() < 0.7 else None),
+                text=texts[(pk - posts.start) % len(texts)],
+                image=(rnd.choice(images)
+                       if images and rnd.random()
+                       < constants.DATASET_IMAGE_SHARE else ''),
+                created=self._post_created(posts, pk),
+            )
+
+    def _comments(self, posts: range, users: range,
+                  texts: List[str]) -> Iterator[Comment]:
+        rnd: random.Random = self.random
+        count: int = int(len(posts) * self.scale.comments_per_post)
+        first_id: int = _next_id(Comment)
+        for number in range(count if posts else 0):
+            post_id: int = rnd.choice(posts)
+            created: datetime = self._post_created(posts, post_id) + timedelta(
+                seconds=rnd.randrange(1, 24 * 60 * 60))
+            yield Comment(
+                id=first_id + number,
+                post_id=post_id,
+                author_id=rnd.choice(users),
+                text=texts[number % len(texts)][:200],
+                created=min(created, self.now),
+            )
+
+    def _follows(self, users: range,
+                 author_weights: List[float]) -> Iterator[Follow]:
+        rnd: random.Random = self.random
+        pk: int = _next_id(Follow)
+        for user_id in users:
+            # Среднее значение распределения Парето с alpha=1.5 равно 3.
+            count: int = min(
+                len(users) - 1,
+                int(rnd.paretovariate(1.5) * self.scale.follows_per_user / 3))
+            authors = set(rnd.choices(
+                users, cum_weights=author_weights, k=count))
+            authors.discard(user_id)
+            for author_id in sorted(authors):
+                yield Follow(id=pk, user_id=user_id, author_id=author_id)
+                pk += 1
@@ -0,0 +1,104 @@
+"""Потоковый экспорт групп, постов, комментариев и подписок.
+
+Таблицы читаются по возрастанию id серверным курсором
+(iterator(chunk_size=...)) плоскими строками .values(), и каждая строка
+сразу записывается в выходной поток, поэтому расход памяти не зависит
+от размера таблиц. Формат записей совпадает с форматом импорта
+(см. importer.py): выгрузку можно загрузить командой import_content.
+
+Выгрузка в один поток идет в порядке зависимостей: группы, посты,
+комментарии, подписки. В zip-архиве каждая таблица пишется
+в отдельный файл.
+"""
+import csv
+import json
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Iterator, Optional, TextIO, Tuple
+
+from django.db.models import Model
+from django.db.models.query import QuerySet
+
+from . import constants
+from .importer import Record
+from .models import Comment, Follow, Group, Post
+
+# Колонки CSV: объединение полей всех типов записей.
+CSV_COLUMNS: Tuple[str, ...] = (
+    'type', 'id', 'title', 'slug', 'description', 'post', 'user',
+    'author', 'group', 'text', 'created', 'image',
+)
+
+
+@dataclass(frozen=True)
+class Table:
+    """Выгружаемая таблица: тип записей и поля с путями ORM."""
+
+    type: str
+    name: str
+    model: Model
+    fields: Dict[str, str]
+
+    @property
+    def has_created(self) -> bool:
+        """Таблица поддерживает выгрузку изменений с момента времени."""
+        return 'created' in self.fields
+
+
+TABLES: Tuple[Table, ...] = (
+    Table('group', 'groups', Group, {
+        'id': 'id', 'title': 'title', 'slug': 'slug',
+        'description': 'description',
+    }),
+    Table('post', 'posts', Post, {
+        'id': 'id', 'author': 'author__username', 'group': 'group__slug',
+        'text': 'text', 'created': 'created',
+    }),
+    Table('comment', 'comments', Comment, {
+        'id': 'id', 'post': 'post_id', 'author': 'author__username',
+        'text': 'text', 'created': 'created',
+    }),
+    Table('follow', 'follows', Follow, {
+        'id': 'id', 'user': 'user__username', 'author': 'author__username',
+    }),
+)
+
+
+def table_records(table: Table, since: Optional[datetime] = None,
+                  after_id: Optional[int] = None,
+                  with_images: bool = False,
+                  chunk_size: int = constants.EXPORT_CHUNK_SIZE
+                  ) -> Iterator[Record]:
+    """Записи таблицы по возрастанию id.
+
+    since ограничивает записи временем создания (для таблиц с created),
+    after_id - id, с которого продолжается предыдущая выгрузка.
+    with_images добавляет к постам имя файла изображения в хранилище.
+    """
+    fields: Dict[str, str] = dict(table.fields)
+    if with_images and table.model is Post:
+        fields['image'] = 'image'
+    queryset: QuerySet = table.model.objects.order_by('id')
+    if since is not None and table.has_created:
+        queryset = queryset.filter(created__gte=since)
+    if after_id is not None:
+        queryset = queryset.filter(id__gt=after_id)
+    rows: Iterable[Dict] = queryset.values(*fields.values()).iterator(
+        chunk_size=chunk_size)
+    for row in rows:
+        record: Record = {'type': table.type}
+        for name, lookup in fields.items():
+            value = row[lookup]
+            record[name] = (
+                value.isoformat() if isinstance(value, datetime) else value)
+        yield record
+
+
+def record_writer(stream: TextIO, fmt: str) -> Callable[[Record], None]:
+    """Функция записи одной записи в поток в формате jsonl или csv."""
+    if fmt == 'csv':
+        writer = csv.DictWriter(stream, fieldnames=CSV_COLUMNS)
+        writer.writeheader()
+        return writer.writerow
+    return lambda record: stream.write(
+        json.dumps(record, ensure_ascii=False) + '\n')
@@ -1,8 +1,11 @@
 from typing import Tuple
 
 from django import forms
-from django.db import models
+from django.core.files.uploadedfile import UploadedFile
+from django.db import models, transaction
 
+from . import thumbnails
+from .images import ingest_image
 from .models import Post, Comment
 
 
@@ -15,6 +18,21 @@ class PostForm(forms.ModelForm):
         model: models.Model = Post
         fields: Tuple[str, ...] = ('text', 'group', 'image',)
 
+    def clean_image(self):
+        """Уменьшает и перекодирует загруженное изображение."""
+        image = self.cleaned_data.get('image')
+        if isinstance(image, UploadedFile):
+            return ingest_image(image)
+        return image
+
+    def save(self, commit: bool = True) -> Post:
+        """Сохраняет пост и ставит в очередь создание миниатюр
+        загруженного изображения после фиксации транзакции."""
+        post: Post = super().save(commit)
+        if commit and 'image' in self.changed_data and post.image:
+            transaction.on_commit(lambda: thumbnails.schedule(post.image))
+        return post
+
 
 class CommentForm(forms.ModelForm):
     """Форма создания комментария к посту."""
@@ -0,0 +1,124 @@
+"""Поколения кеша фрагментов страниц.
+
+Ключ закешированного фрагмента включает номер поколения его области:
+всего сайта, группы или автора. При изменении постов, групп и
+пользователей сигналы (см. signals.py) увеличивают поколения
+затронутых областей, и старые фрагменты перестают использоваться,
+поэтому фрагменты можно хранить часами без устаревших данных.
+По тем же поколениям проверяется кеш страниц для анонимных
+пользователей (см. core.middleware).
+
+Рядом с поколением хранится время его последнего увеличения:
+из него получается Last-Modified закешированных страниц. Снимок
+областей, измененных за последние REPLICA_MAX_LAG секунд, переводит
+чтение запроса на основную базу: реплика может еще не видеть
+изменения (см. core.db_router).
+"""
+import time
+from typing import Dict, Iterable, List, Optional
+
+from core import db_router
+from django.conf import settings
+from django.core.cache import cache
+
+from . import constants
+
+
+def global_key() -> str:
+    """Ключ поколения всего сайта."""
+    return 'generation:global'
+
+
+def groups_key() -> str:
+    """Ключ поколения списка групп."""
+    return 'generation:groups'
+
+
+def group_key(group_id: int) -> str:
+    """Ключ поколения группы."""
+    return f'generation:group:{group_id}'
+
+
+def author_key(author_id: int) -> str:
+    """Ключ поколения автора."""
+    return f'generation:author:{author_id}'
+
+
+def post_key(post_id: int) -> str:
+    """Ключ поколения страницы поста."""
+    return f'generation:post:{post_id}'
+
+
+def _initial() -> int:
+    # Начальное значение растет со временем, чтобы после вытеснения
+    # ключа из кеша новое поколение не совпало со старыми фрагментами.
+    return time.time_ns() // 1000
+
+
+def bumped_key(key: str) -> str:
+    """Ключ времени последнего увеличения поколения, в микросекундах."""
+    return f'{key}:bumped'
+
+
+def _get_or_add(key: str) -> int:
+    value: Optional[int] = cache.get(key)
+    if value is None:
+        initial: int = _initial()
+        cache.add(key, initial, constants.GENERATION_CACHE_TIMEOUT)
+        value = cache.get(key, initial)
+    return value
+
+
+def get_generation(key: str) -> int:
+    """Текущее поколение области."""
+    return _get_or_add(key)
+
+
+def snapshot(keys: Iterable[str]) -> Dict[str, int]:
+    """Текущие поколения нескольких областей одним запросом к кешу.
+
+    Кроме поколений содержит время их последнего увеличения под
+    ключами bumped_key. Неизвестное время (ключ вытеснен из кеша)
+    считается текущим. Недавнее изменение переводит чтение запроса
+    на основную базу.
+    """
+    keys = list(keys)
+    all_keys: List[str] = keys + [bumped_key(key) for key in keys]
+    generations: Dict[str, int] = cache.get_many(all_keys)
+    for key in all_keys:
+        if key not in generations:
+            generations[key] = _get_or_add(key)
+    if time.time() - bumped_at(generations) < settings.REPLICA_MAX_LAG:
+        db_router.read_primary()
+    return generations
+
+
+def bumped_at(scope: Dict[str, int]) -> Optional[float]:
+    """Время последнего изменения областей снимка, в секундах."""
+    stamps: List[int] = [
+        value for key, value in scope.items() if key.endswith(':bumped')]
+    return max(stamps) / 1_000_000 if stamps else None
+
+
+def bump(keys: Iterable[str]) -> None:
+    """Увеличивает поколения областей.
+
+    Время изменения записывается раньше поколения: читатель, увидевший
+    новое поколение, увидит и новое время.
+    """
+    keys = list(keys)
+    cache.set_many({bumped_key(key): _initial() for key in keys},
+                   constants.GENERATION_CACHE_TIMEOUT)
+    for key in keys:
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, _initial(), constants.GENERATION_CACHE_TIMEOUT)
+
+
+def post_keys(author_id: int, group_id: Optional[int]) -> Iterable[str]:
+    """Ключи областей, в которых показывается пост."""
+    yield global_key()
+    yield author_key(author_id)
+    if group_id is not None:
+        yield group_key(group_id)
@@ -0,0 +1,93 @@
+"""Обработка загружаемых изображений постов.
+
+Размеры изображения проверяются по заголовку до декодирования.
+JPEG декодируется сразу в уменьшенном масштабе (Image.draft), большие
+изображения других форматов уменьшаются с reducing_gap, поэтому
+пиковая память на загрузку ограничена. Ориентация из EXIF
+применяется к пикселям, метаданные не сохраняются, изображение
+кодируется заново с заданным качеством.
+"""
+import os
+from io import BytesIO
+from typing import Dict, Tuple
+
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile, UploadedFile
+from PIL import Image, ImageOps
+
+from . import constants
+
+# Форматы, которые сохраняются без смены формата и расширения.
+KEPT_FORMATS: Dict[str, str] = {
+    'JPEG': 'image/jpeg',
+    'PNG': 'image/png',
+    'GIF': 'image/gif',
+    'WEBP': 'image/webp',
+}
+EXTENSIONS: Dict[str, str] = {'JPEG': '.jpg', 'PNG': '.png'}
+
+
+def _has_alpha(image: Image.Image) -> bool:
+    return image.mode in ('RGBA', 'LA', 'PA') or (
+        image.mode == 'P' and 'transparency' in image.info)
+
+
+def _output_format(image: Image.Image) -> str:
+    if image.format in KEPT_FORMATS:
+        return image.format
+    return 'PNG' if _has_alpha(image) else 'JPEG'
+
+
+def _check_size(image: Image.Image) -> None:
+    width, height = image.size
+    limit: int = (
+        constants.IMAGE_MAX_PIXELS if image.format == 'JPEG'
+        else constants.IMAGE_MAX_DECODE_PIXELS)
+    if width * height > limit:
+        raise ValidationError(
+            'Изображение слишком большое: %(width)s×%(height)s.',
+            code='image_too_large',
+            params={'width': width, 'height': height},
+        )
+
+
+def _save_options(image_format: str) -> Dict:
+    if image_format == 'JPEG':
+        return {'quality': constants.IMAGE_JPEG_QUALITY, 'optimize': True,
+                'progressive': True}
+    if image_format == 'WEBP':
+        return {'quality': constants.IMAGE_JPEG_QUALITY}
+    return {'optimize': True}
+
+
+def ingest_image(upload: UploadedFile) -> UploadedFile:
+    """Проверяет, уменьшает и перекодирует загруженное изображение.
+
+    Анимированные изображения только проверяются и сохраняются
+    как есть.
+    """
+    upload.seek(0)
+    image: Image.Image = Image.open(upload)
+    _check_size(image)
+    if getattr(image, 'is_animated', False):
+        upload.seek(0)
+        return upload
+    source_format: str = image.format
+    image_format: str = _output_format(image)
+    max_size: Tuple[int, int] = (
+        constants.IMAGE_MAX_SIDE, constants.IMAGE_MAX_SIDE)
+    if source_format == 'JPEG':
+        image.draft('RGB', max_size)
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail(max_size, Image.LANCZOS, reducing_gap=3.0)
+    if image_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+
+    output = BytesIO()
+    image.save(output, image_format, **_save_options(image_format))
+    name: str = upload.name
+    if image_format in EXTENSIONS and image_format != source_format:
+        name = os.path.splitext(name)[0] + EXTENSIONS[image_format]
+    return SimpleUploadedFile(
+        name, output.getvalue(),
+        content_type=KEPT_FORMATS.get(image_format))
@@ -0,0 +1,395 @@
+"""Потоковый импорт групп, постов, комментариев и подписок.
+
+Записи читаются из JSONL или CSV по одной и обрабатываются порциями:
+авторы, группы и посты комментариев каждой порции находятся
+пакетными запросами, строки вставляются bulk_create без сигналов,
+а вся порция выполняется в одной транзакции. После каждой транзакции
+в журнал контрольной точки дописывается позиция во входных данных,
+поэтому прерванный импорт продолжается с последней сохраненной порции.
+
+Счетчики, поисковый индекс, ленты подписок и поколения кеша
+обновляются один раз в конце и только для затронутых импортом
+постов, авторов и групп (см. Importer.finish).
+
+Поля записей:
+    group: title, slug, description;
+    post: id (необязательно; пост с занятым id пропускается), author,
+        group, text, created, image;
+    comment: post, author, text, created;
+    follow: user, author.
+Тип записи задается полем type.
+"""
+import csv
+import json
+import os
+import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import (Callable, Dict, Iterable, Iterator, List, Optional, Set,
+                    TextIO, Tuple)
+
+from core.utils import batched, explicit_created, reset_sequences
+from django.db import transaction
+from django.db.models import Max
+from django.db.models.query import QuerySet
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import constants, counters, generations, search, timeline
+from .models import Comment, Follow, Group, Post, User
+
+Record = Dict[str, Optional[str]]
+FORMATS: Tuple[str, ...] = ('jsonl', 'csv')
+
+
+def read_records(stream: TextIO, fmt: str) -> Iterator[Record]:
+    """Записи входного потока. Пустые значения CSV читаются как None.
+
+    Некорректная строка JSONL возвращается пустой записью и будет
+    пропущена импортом, не сдвигая позиции следующих записей.
+    """
+    if fmt == 'csv':
+        for row in csv.DictReader(stream):
+            yield {key: value or None for key, value in row.items()}
+        return
+    for line in stream:
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = {}
+        yield record if isinstance(record, dict) else {}
+
+
+@dataclass
+class ImportStats:
+    """Итоги импорта."""
+
+    position: int = 0
+    imported: Counter = field(default_factory=Counter)
+    skipped: Counter = field(default_factory=Counter)
+    started: float = field(default_factory=time.monotonic)
+    processed: int = 0
+
+    @property
+    def rows_per_second(self) -> float:
+        """Скорость обработки записей в текущем запуске."""
+        elapsed: float = time.monotonic() - self.started
+        return self.processed / elapsed if elapsed > 0 else 0.0
+
+
+class Checkpoint:
+    """Журнал контрольной точки импорта.
+
+    Каждая закоммиченная порция дописывает строку с позицией и
+    областями кеша, которые она затронула. Запись порции выполняется
+    целиком одним write, оборванная последняя строка игнорируется.
+    """
+
+    def __init__(self, path: Optional[str]) -> None:
+        self.path: Optional[str] = path
+        self.position: int = 0
+        self.touched: Dict[str, Set[int]] = defaultdict(set)
+
+    def load(self) -> int:
+        """Читает журнал, возвращает позицию для продолжения."""
+        if not self.path or not os.path.exists(self.path):
+            return 0
+        with open(self.path, encoding='utf-8') as log:
+            for line in log:
+                try:
+                    entry: Dict = json.loads(line)
+                except ValueError:
+                    break
+                self.position = entry['position']
+                for scope, ids in entry['touched'].items():
+                    self.touched[scope].update(ids)
+        return self.position
+
+    def save(self, position: int, touched: Dict[str, Set[int]]) -> None:
+        """Дописывает в журнал закоммиченную порцию."""
+        self.position = position
+        for scope, ids in touched.items():
+            self.touched[scope].update(ids)
+        if not self.path:
+            return
+        line: str = json.dumps({
+            'position': position,
+            'touched': {scope: sorted(ids) for scope, ids in touched.items()},
+        }) + '\n'
+        with open(self.path, 'a', encoding='utf-8') as log:
+            log.write(line)
+            log.flush()
+            os.fsync(log.fileno())
+
+    def remove(self) -> None:
+        """Удаляет журнал после успешного импорта."""
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class Lookup:
+    """Соответствие значения поля и id с кешем на весь импорт.
+
+    Недостающие значения порции читаются пакетными запросами IN.
+    """
+
+    def __init__(self, queryset: QuerySet, field_name: str,
+                 batch_size: int) -> None:
+        self.queryset: QuerySet = queryset
+        self.field_name: str = field_name
+        self.batch_size: int = batch_size
+        self.ids: Dict = {}
+
+    def resolve(self, values: Iterable) -> Dict:
+        """Загружает id для значений, которых еще нет в кеше."""
+        missing: Set = {
+            value for value in values
+            if value is not None and value not in self.ids}
+        for batch in batched(missing, self.batch_size):
+            self.ids.update(self.queryset.filter(
+                **{f'{self.field_name}__in': batch},
+            ).values_list(self.field_name, 'id'))
+        return self.ids
+
+
+def _created(value: Optional[str], default: datetime) -> Optional[datetime]:
+    if not value:
+        return default
+    try:
+        created: Optional[datetime] = parse_datetime(value)
+    except ValueError:
+        return None
+    if created is not None and timezone.is_naive(created):
+        created = timezone.make_aware(created)
+    return created
+
+
+def _post_id(value) -> Optional[int]:
+    try:
+        return int(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+class Importer:
+    """Импорт записей порциями по commit_every в отдельных транзакциях."""
+
+    def __init__(self, checkpoint: Checkpoint,
+                 batch_size: int = constants.IMPORT_BATCH_SIZE,
+                 commit_every: int = constants.IMPORT_COMMIT_EVERY,
+                 progress: Optional[Callable[[ImportStats], None]] = None
+                 ) -> None:
+        self.checkpoint: Checkpoint = checkpoint
+        self.batch_size: int = batch_size
+        self.commit_every: int = commit_every
+        self.progress: Optional[Callable[[ImportStats], None]] = progress
+        self.users: Lookup = Lookup(User.objects.all(), 'username',
+                                    batch_size)
+        self.groups: Lookup = Lookup(Group.objects.all(), 'slug', batch_size)
+        self.stats: ImportStats = ImportStats()
+
+    def run(self, records: Iterable[Record]) -> ImportStats:
+        """Импортирует записи, пропуская уже закоммиченные."""
+        position: int = self.checkpoint.load()
+        self.stats.position = position
+        iterator: Iterator[Record] = iter(records)
+        for _ in range(position):
+            if next(iterator, None) is None:
+                return self.stats
+        for chunk in batched(iterator, self.commit_every):
+            touched: Dict[str, Set[int]] = self.import_chunk(chunk)
+            self.stats.position += len(chunk)
+            self.stats.processed += len(chunk)
+            self.checkpoint.save(self.stats.position, touched)
+            if self.progress is not None:
+                self.progress(self.stats)
+        return self.stats
+
+    def import_chunk(self, chunk: List[Record]) -> Dict[str, Set[int]]:
+        """Импортирует порцию в одной транзакции.
+
+        Возвращает id авторов, групп и постов, страницы которых
+        нужно сбросить в кеше.
+        """
+        by_type: Dict[str, List[Record]] = defaultdict(list)
+        for record in chunk:
+            by_type[record.get('type')].append(record)
+        for record_type in set(by_type) - {
+                'group', 'post', 'comment', 'follow'}:
+            self.stats.skipped['неизвестный тип'] += len(
+                by_type.pop(record_type))
+        self.users.resolve(
+            record.get(name) for records in by_type.values()
+            for record in records for name in ('author', 'user'))
+        touched: Dict[str, Set[int]] = defaultdict(set)
+        now: datetime = timezone.now()
+        with transaction.atomic(), explicit_created(Post, Comment):
+            self._insert(
+                Group, self._groups(by_type['group']), ignore_conflicts=True)
+            self.groups.resolve(
+                record.get('group') for record in by_type['post'])
+            touched['imported'].update(
+                self._insert_posts(self._posts(by_type['post'], now, touched)))
+            self._insert(
+                Comment, self._comments(by_type['comment'], now, touched))
+            self._insert(
+                Follow, self._follows(by_type['follow'], touched),
+                ignore_conflicts=True)
+        return touched
+
+    def _insert(self, model, objects: List, **kwargs) -> None:
+        for batch in batched(objects, self.batch_size):
+            model.objects.bulk_create(batch, **kwargs)
+        self.stats.imported[model._meta.model_name] += len(objects)
+
+    def _insert_posts(self, posts: List[Post]) -> List[int]:
+        """Вставляет посты и возвращает их id.
+
+        Посты с явными id вставляются первыми, затем последовательность
+        id продолжается после них: иначе на PostgreSQL пост без id мог
+        бы получить уже занятый id. id остальных постов - все id больше
+        прежнего наибольшего; попавшие в них посты, созданные
+        параллельно, обработаются в finish повторно без вреда.
+        """
+        explicit: List[Post] = [post for post in posts if post.id is not None]
+        implicit: List[Post] = [post for post in posts if post.id is None]
+        self._insert(Post, explicit)
+        if explicit:
+            reset_sequences(Post)
+        post_ids: List[int] = [post.id for post in explicit]
+        if implicit:
+            last_id: int = Post.objects.aggregate(
+                last_id=Max('id'))['last_id'] or 0
+            self._insert(Post, implicit)
+            post_ids.extend(Post.objects.filter(
+                id__gt=last_id).values_list('id', flat=True))
+        return post_ids
+
+    def _skip(self, reason: str) -> None:
+        self.stats.skipped[reason] += 1
+
+    def _groups(self, records: List[Record]) -> List[Group]:
+        groups: List[Group] = []
+        for record in records:
+            if not record.get('slug') or not record.get('title'):
+                self._skip('нет названия группы')
+            else:
+                groups.append(Group(
+                    title=record['title'], slug=record['slug'],
+                    description=record.get('description') or ''))
+        return groups
+
+    def _posts(self, records: List[Record], now: datetime,
+               touched: Dict[str, Set[int]]) -> List[Post]:
+        taken: Set[int] = set()
+        for batch in batched(
+                {_post_id(record.get('id')) for record in records} - {None},
+                self.batch_size):
+            taken.update(Post.objects.filter(
+                id__in=batch).values_list('id', flat=True))
+        posts: List[Post] = []
+        for record in records:
+            post_id: Optional[int] = _post_id(record.get('id'))
+            author_id: Optional[int] = self.users.ids.get(record.get('author'))
+            group_id: Optional[int] = self.groups.ids.get(record.get('group'))
+            created: Optional[datetime] = _created(record.get('created'), now)
+            if post_id in taken:
+                self._skip('пост уже существует')
+            elif author_id is None:
+                self._skip('неизвестный автор')
+            elif record.get('group') and group_id is None:
+                self._skip('неизвестная группа')
+            elif not record.get('text'):
+                self._skip('нет текста')
+            elif created is None:
+                self._skip('некорректная дата')
+            else:
+                posts.append(Post(
+                    id=post_id, author_id=author_id,
+                    group_id=group_id, text=record['text'],
+                    created=created, image=record.get('image') or ''))
+                if post_id is not None:
+                    taken.add(post_id)
+                touched['authors'].add(author_id)
+                if group_id is not None:
+                    touched['groups'].add(group_id)
+        return posts
+
+    def _comments(self, records: List[Record], now: datetime,
+                  touched: Dict[str, Set[int]]) -> List[Comment]:
+        post_ids: Set[int] = set()
+        for batch in batched(
+                {_post_id(record.get('post')) for record in records},
+                self.batch_size):
+            post_ids.update(Post.objects.filter(
+                id__in=batch).values_list('id', flat=True))
+        comments: List[Comment] = []
+        for record in records:
+            post_id: Optional[int] = _post_id(record.get('post'))
+            author_id: Optional[int] = self.users.ids.get(record.get('author'))
+            created: Optional[datetime] = _created(record.get('created'), now)
+            if post_id not in post_ids:
+                self._skip('неизвестный пост')
+            elif author_id is None:
+                self._skip('неизвестный автор')
+            elif not record.get('text'):
+                self._skip('нет текста')
+            elif created is None:
+                self._skip('некорректная дата')
+            else:
+                comments.append(Comment(
+                    post_id=post_id, author_id=author_id,
+                    text=record['text'], created=created))
+                touched['posts'].add(post_id)
+        return comments
+
+    def _follows(self, records: List[Record],
+                 touched: Dict[str, Set[int]]) -> List[Follow]:
+        follows: List[Follow] = []
+        for record in records:
+            user_id: Optional[int] = self.users.ids.get(record.get('user'))
+            author_id: Optional[int] = self.users.ids.get(record.get('author'))
+            if user_id is None or author_id is None:
+                self._skip('неизвестный пользователь')
+            elif user_id == author_id:
+                self._skip('подписка на себя')
+            else:
+                follows.append(Follow(user_id=user_id, author_id=author_id))
+                touched['authors'].update((user_id, author_id))
+                touched['followers'].add(user_id)
+        return follows
+
+    def finish(self, rebuild: bool = True) -> None:
+        """Обновляет производные данные затронутых импортом строк.
+
+        Пересчитываются счетчики затронутых авторов, групп и постов,
+        новые посты добавляются в поисковый индекс и ленты подписчиков,
+        ленты новых подписчиков перестраиваются. Остальные данные
+        не трогаются, поэтому поиск и ленты работают во время импорта.
+        Поколения кеша затронутых областей увеличиваются всегда.
+        При rebuild=False счетчики, поисковый индекс и ленты нужно
+        перестроить позже командами repair_counters, reindex_posts
+        и rebuild_timelines.
+        """
+        touched: Dict[str, Set[int]] = self.checkpoint.touched
+        if rebuild:
+            counters.repair_counters(
+                user_ids=touched['authors'], group_ids=touched['groups'],
+                post_ids=touched['posts'])
+            counters.reconcile_counts()
+            for batch in batched(
+                    sorted(touched['imported']), self.batch_size):
+                search.index_posts(Post.objects.filter(
+                    id__in=batch).values_list('id', 'text'))
+            timeline.fan_out_posts(touched['imported'])
+            for user_id in sorted(touched['followers']):
+                timeline.rebuild_user(user_id)
+        generations.bump(
+            [generations.global_key(), generations.groups_key()]
+            + [generations.author_key(pk) for pk in touched['authors']]
+            + [generations.group_key(pk) for pk in touched['groups']]
+            + [generations.post_key(pk) for pk in touched['posts']])
+        self.checkpoint.remove()
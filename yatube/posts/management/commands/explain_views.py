@@ -0,0 +1,137 @@
+import re
+from typing import Callable, Dict, List, Optional, Pattern, Tuple
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+
+from posts.models import Follow, Group, Post, User
+
+# Признаки плохих планов: последовательное чтение таблицы и сортировка
+# без индекса для SQLite (EXPLAIN QUERY PLAN) и PostgreSQL (EXPLAIN).
+PLAN_PROBLEMS: Dict[str, Tuple[Tuple[Pattern, str], ...]] = {
+    'sqlite': (
+        (re.compile(r'^SCAN (?!.*\b(USING|CONSTANT)\b)'),
+         'последовательное чтение'),
+        (re.compile(r'USE TEMP B-TREE FOR ORDER BY'),
+         'сортировка без индекса'),
+    ),
+    'postgresql': (
+        (re.compile(r'Seq Scan'), 'последовательное чтение'),
+        (re.compile(r'^\s*(->\s*)?Sort\b'), 'сортировка без индекса'),
+    ),
+}
+# Кеш отключается, чтобы в отчет попали все запросы страницы.
+NO_CACHE: Dict = {
+    'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+}
+
+
+class Command(BaseCommand):
+    """Выполняет EXPLAIN для запросов страниц приложения posts.
+
+    Страницы открываются с примерами данных из базы, все выполненные
+    SELECT-запросы перехватываются и разбираются планировщиком.
+    Последовательные чтения и сортировки без индекса попадают в отчет.
+    """
+
+    help = 'Показывает планы запросов страниц и находит проблемные.'
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument(
+            '--view',
+            action='append',
+            dest='views',
+            help='Имя URL (например, posts:index). Можно указать несколько.',
+        )
+        parser.add_argument(
+            '--plans',
+            action='store_true',
+            help='Печатать планы всех запросов, а не только проблемных.',
+        )
+
+    def handle(self, *args, **options) -> None:
+        if connection.vendor not in PLAN_PROBLEMS:
+            raise CommandError(
+                f'EXPLAIN не поддерживается для {connection.vendor}.')
+        urls: Dict[str, Tuple[str, Optional[User]]] = self.get_sample_urls()
+        names: List[str] = options['views'] or list(urls)
+        issues: int = 0
+        for name in names:
+            if name not in urls:
+                self.stdout.write(
+                    self.style.WARNING(f'{name}: нет данных для примера'))
+                continue
+            url, user = urls[name]
+            issues += self.explain_view(name, url, user, options['plans'])
+        style: Callable = self.style.ERROR if issues else self.style.SUCCESS
+        self.stdout.write(style(f'Проблемных запросов: {issues}'))
+
+    def get_sample_urls(self) -> Dict[str, Tuple[str, Optional[User]]]:
+        """Адреса страниц с примерами данных из базы."""
+        urls: Dict[str, Tuple[str, Optional[User]]] = {
+            'posts:index': (reverse('posts:index'), None),
+        }
+        group: Optional[Group] = Group.objects.first()
+        if group is not None:
+            urls['posts:group_list'] = (
+                reverse('posts:group_list', kwargs={'slug': group.slug}),
+                None)
+        post: Optional[Post] = Post.objects.select_related('author').first()
+        if post is not None:
+            urls['posts:profile'] = (
+                reverse('posts:profile',
+                        kwargs={'username': post.author.username}),
+                None)
+            urls['posts:post_detail'] = (
+                reverse('posts:post_detail', kwargs={'post_id': post.id}),
+                None)
+        follow: Optional[Follow] = Follow.objects.select_related(
+            'user').first()
+        if follow is not None:
+            urls['posts:follow_index'] = (
+                reverse('posts:follow_index'), follow.user)
+        return urls
+
+    def explain_view(self, name: str, url: str, user: Optional[User],
+                     print_plans: bool) -> int:
+        """Разбирает запросы страницы, возвращает число проблемных."""
+        request = RequestFactory().get(url)
+        request.user = user or AnonymousUser()
+        match = resolve(url)
+        with override_settings(CACHES=NO_CACHE):
+            with CaptureQueriesContext(connection) as queries:
+                match.func(request, *match.args, **match.kwargs)
+        self.stdout.write(self.style.MIGRATE_HEADING(f'{name} ({url})'))
+        issues: int = 0
+        for query in queries.captured_queries:
+            sql: str = query['sql']
+            if not sql.lstrip().upper().startswith('SELECT'):
+                continue
+            plan: List[str] = self.explain(sql)
+            problems: List[str] = [
+                description
+                for pattern, description in PLAN_PROBLEMS[connection.vendor]
+                if any(pattern.search(line) for line in plan)
+            ]
+            if problems:
+                issues += 1
+                self.stdout.write(self.style.WARNING(
+                    '  ' + ', '.join(problems) + ': ' + sql))
+            if problems or print_plans:
+                for line in plan:
+                    self.stdout.write(f'    {line}')
+        return issues
+
+    def explain(self, sql: str) -> List[str]:
+        """План запроса в виде строк."""
+        prefix: str = (
+            'EXPLAIN QUERY PLAN ' if connection.vendor == 'sqlite'
+            else 'EXPLAIN ')
+        with connection.cursor() as cursor:
+            cursor.execute(prefix + sql)
+            rows: List[Tuple] = cursor.fetchall()
+        return [str(row[-1]) for row in rows]
@@ -0,0 +1,169 @@
+import gzip
+import io
+import os
+import zipfile
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, TextIO
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from posts import constants
+from posts.exporter import TABLES, Table, record_writer, table_records
+from posts.importer import FORMATS, Record
+
+TYPES: Dict[str, Table] = {table.type: table for table in TABLES}
+
+
+class Command(BaseCommand):
+    """Выгружает группы, посты, комментарии и подписки.
+
+    Строки читаются серверным курсором и пишутся в поток по одной.
+    Выгрузка в файл сначала пишется во временный файл и переименовывается
+    только после успешного завершения.
+    """
+
+    help = 'Потоковая выгрузка контента в JSONL, CSV, .gz или .zip.'
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument(
+            'path',
+            help='Файл выгрузки (.jsonl, .csv, .gz, .zip) или "-" для stdout.',
+        )
+        parser.add_argument(
+            '--format',
+            choices=FORMATS,
+            help='Формат записей. По умолчанию - по расширению.',
+        )
+        parser.add_argument(
+            '--table',
+            action='append',
+            dest='tables',
+            choices=list(TYPES),
+            help='Выгружаемый тип записей. Можно указать несколько.',
+        )
+        parser.add_argument(
+            '--since',
+            help='Только посты и комментарии, созданные с этого момента '
+                 '(ISO 8601).',
+        )
+        parser.add_argument(
+            '--after-id',
+            action='append',
+            default=[],
+            metavar='TYPE=ID',
+            help='Только записи типа TYPE с id больше ID, '
+                 'например post=1000.',
+        )
+        parser.add_argument(
+            '--with-images',
+            action='store_true',
+            help='Добавить к постам имена файлов изображений.',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=constants.EXPORT_CHUNK_SIZE,
+            help='Количество строк, читаемых курсором за раз.',
+        )
+
+    def handle(self, *args, **options) -> None:
+        path: str = options['path']
+        name: str = path.lower()
+        for suffix in ('.gz', '.zip'):
+            name = name[:-len(suffix)] if name.endswith(suffix) else name
+        fmt: str = options['format'] or (
+            'csv' if name.endswith('.csv') else 'jsonl')
+        tables: List[Table] = [
+            table for table in TABLES
+            if not options['tables'] or table.type in options['tables']]
+        since: Optional[datetime] = self.parse_since(options['since'])
+        after_ids: Dict[str, int] = self.parse_after_ids(options['after_id'])
+
+        def records(table: Table) -> Iterable[Record]:
+            return self.counted(table, table_records(
+                table, since=since, after_id=after_ids.get(table.type),
+                with_images=options['with_images'],
+                chunk_size=options['chunk_size']))
+
+        self.last_ids: Dict[str, Optional[int]] = {}
+        self.counts: Dict[str, int] = {}
+        if path == '-':
+            self.write_stream(self.stdout, fmt, tables, records)
+        else:
+            tmp_path: str = f'{path}.tmp'
+            try:
+                if path.lower().endswith('.zip'):
+                    self.write_archive(tmp_path, fmt, tables, records)
+                else:
+                    opener: Callable = (
+                        gzip.open if path.lower().endswith('.gz') else open)
+                    with opener(tmp_path, 'wt', encoding='utf-8',
+                                newline='') as stream:
+                        self.write_stream(stream, fmt, tables, records)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+            os.replace(tmp_path, path)
+        # При выгрузке в stdout отчет пишется в stderr, чтобы не смешаться
+        # с данными.
+        report = self.stderr if path == '-' else self.stdout
+        for table in tables:
+            report.write(
+                f'{table.name}: {self.counts.get(table.type, 0)}, '
+                f'последний id: {self.last_ids.get(table.type) or "-"}')
+
+    def parse_since(self, value: Optional[str]) -> Optional[datetime]:
+        if not value:
+            return None
+        since: Optional[datetime] = parse_datetime(value)
+        if since is None:
+            raise CommandError(f'Некорректная дата: {value}')
+        if timezone.is_naive(since):
+            since = timezone.make_aware(since)
+        return since
+
+    def parse_after_ids(self, values: List[str]) -> Dict[str, int]:
+        after_ids: Dict[str, int] = {}
+        for value in values:
+            record_type, _, raw_id = value.partition('=')
+            if record_type not in TYPES or not raw_id.isdigit():
+                raise CommandError(
+                    f'Ожидается TYPE=ID, где TYPE - один из '
+                    f'{", ".join(TYPES)}: {value}')
+            after_ids[record_type] = int(raw_id)
+        return after_ids
+
+    def counted(self, table: Table,
+                records: Iterable[Record]) -> Iterable[Record]:
+        """Считает записи и запоминает последний id для продолжения."""
+        for record in records:
+            self.counts[table.type] = self.counts.get(table.type, 0) + 1
+            self.last_ids[table.type] = record['id']
+            yield record
+
+    def write_stream(self, stream: TextIO, fmt: str, tables: List[Table],
+                     records: Callable[[Table], Iterable[Record]]) -> None:
+        """Все таблицы в один поток."""
+        write: Callable[[Record], None] = record_writer(stream, fmt)
+        for table in tables:
+            for record in records(table):
+                write(record)
+
+    def write_archive(self, path: str, fmt: str, tables: List[Table],
+                      records: Callable[[Table], Iterable[Record]]) -> None:
+        """Каждая таблица в отдельный файл zip-архива."""
+        with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as archive:
+            for table in tables:
+                with archive.open(f'{table.name}.{fmt}', 'w',
+                                  force_zip64=True) as member:
+                    stream = io.TextIOWrapper(
+                        member, encoding='utf-8', newline='')
+                    write: Callable[[Record], None] = record_writer(
+                        stream, fmt)
+                    for record in records(table):
+                        write(record)
+                    stream.flush()
+                    stream.detach()
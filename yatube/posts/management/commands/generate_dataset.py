@@ -0,0 +1,90 @@
+from dataclasses import replace
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import constants
+from posts.datasets import SCALES, DatasetGenerator, Generated, Scale
+
+
+class Command(BaseCommand):
+    """Заполняет базу синтетическими данными для нагрузочных тестов.
+
+    Размер задается готовым набором --scale, отдельные величины
+    переопределяются параметрами. Одинаковое зерно на пустой базе
+    дает одинаковые данные.
+    """
+
+    help = 'Генерирует пользователей, группы, посты, комментарии и подписки.'
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument(
+            '--scale',
+            default='smoke',
+            choices=sorted(SCALES),
+            help='Готовый размер набора данных.',
+        )
+        parser.add_argument('--users', type=int)
+        parser.add_argument('--groups', type=int)
+        parser.add_argument('--posts', type=int)
+        parser.add_argument('--follows-per-user', type=int)
+        parser.add_argument('--comments-per-post', type=float)
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=constants.DATASET_SEED,
+            help='Зерно генераторов случайных чисел.',
+        )
+        parser.add_argument(
+            '--images',
+            type=int,
+            default=0,
+            help='Количество образцов изображений для постов.',
+        )
+        parser.add_argument(
+            '--password',
+            help='Пароль всех пользователей. По умолчанию вход невозможен.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=constants.DATASET_BATCH_SIZE,
+            help='Количество строк в одном bulk_create.',
+        )
+        parser.add_argument(
+            '--no-rebuild',
+            action='store_true',
+            help='Не перестраивать поисковый индекс и ленты подписок.',
+        )
+
+    def handle(self, *args, **options) -> None:
+        scale: Scale = replace(SCALES[options['scale']], **{
+            name: options[name]
+            for name in ('users', 'groups', 'posts', 'follows_per_user',
+                         'comments_per_post')
+            if options[name] is not None
+        })
+        if min(scale.users, scale.groups, scale.posts,
+               scale.follows_per_user, scale.comments_per_post,
+               options['images']) < 0 or options['batch_size'] < 1:
+            raise CommandError('Размеры должны быть неотрицательными.')
+        if scale.posts and not scale.users:
+            raise CommandError('Для постов нужен хотя бы один пользователь.')
+        generator = DatasetGenerator(
+            scale,
+            seed=options['seed'],
+            images=options['images'],
+            password=options['password'],
+            batch_size=options['batch_size'],
+            progress=self.report,
+        )
+        generated: Generated = generator.generate()
+        generator.finish(rebuild=not options['no_rebuild'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: пользователи {generated.users.start}-'
+            f'{generated.users.stop - 1}, посты {generated.posts.start}-'
+            f'{generated.posts.stop - 1}'))
+
+    def report(self, name: str, count: int, seconds: float) -> None:
+        """Печатает количество и скорость вставки строк таблицы."""
+        rate: float = count / seconds if seconds > 0 else 0.0
+        self.stdout.write(f'{name}: {count} ({rate:.0f} строк/с)')
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from posts import timeline
+
+
+class Command(BaseCommand):
+    """Перестраивает материализованные ленты подписок с нуля."""
+
+    help = 'Перестраивает материализованные ленты подписок.'
+
+    def handle(self, *args, **options) -> None:
+        rebuilt: int = timeline.rebuild()
+        self.stdout.write(
+            self.style.SUCCESS(f'Обработано подписок: {rebuilt}'))
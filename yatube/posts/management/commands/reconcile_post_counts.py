@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from posts.counters import reconcile_counts
+
+
+class Command(BaseCommand):
+    """Пересчитывает общее количество постов, хранящееся в кеше.
+
+    Предназначена для периодического запуска (например, из cron),
+    чтобы исправлять расхождения счетчика с базой данных.
+    """
+
+    help = 'Пересчитывает кешированное общее количество постов.'
+
+    def handle(self, *args, **options) -> None:
+        count: int = reconcile_counts()
+        self.stdout.write(self.style.SUCCESS(f'Всего постов: {count}'))
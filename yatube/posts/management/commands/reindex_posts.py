@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from posts import search
+
+
+class Command(BaseCommand):
+    """Перестраивает поисковый индекс постов с нуля."""
+
+    help = 'Перестраивает полнотекстовый индекс постов.'
+
+    def handle(self, *args, **options) -> None:
+        indexed: int = search.rebuild()
+        self.stdout.write(
+            self.style.SUCCESS(f'Проиндексировано постов: {indexed}'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from posts.counters import reconcile_counts, repair_counters
+
+
+class Command(BaseCommand):
+    """Пересчитывает денормализованные счетчики постов и подписок."""
+
+    help = 'Пересчитывает счетчики постов, комментариев и подписок.'
+
+    def handle(self, *args, **options) -> None:
+        repair_counters()
+        reconcile_counts()
+        self.stdout.write(self.style.SUCCESS('Счетчики пересчитаны'))
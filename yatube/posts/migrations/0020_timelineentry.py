@@ -0,0 +1,72 @@
+# Generated by Django 2.2.16 on 2026-10-18 04:40
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+from posts import constants
+
+
+def fill_timelines(apps, schema_editor):
+    """Заполняет ленты подписок для уже существующих подписок.
+
+    Посты авторов с числом подписчиков больше порога не раскладываются:
+    их подписки переводятся на дочитывание при просмотре ленты.
+    """
+    Follow = apps.get_model('posts', 'Follow')
+    Post = apps.get_model('posts', 'Post')
+    TimelineEntry = apps.get_model('posts', 'TimelineEntry')
+    pull_authors = (
+        Follow.objects.order_by().values('author_id')
+        .annotate(followers=models.Count('id'))
+        .filter(followers__gt=constants.TIMELINE_FANOUT_MAX_FOLLOWERS)
+        .values('author_id'))
+    Follow.objects.filter(author_id__in=pull_authors).update(fan_out=False)
+    for follow in Follow.objects.filter(fan_out=True).iterator():
+        posts = Post.objects.filter(
+            author_id=follow.author_id).values_list('id', 'created')
+        TimelineEntry.objects.bulk_create(
+            [TimelineEntry(user_id=follow.user_id, post_id=post_id,
+                           created=created)
+             for post_id, created in posts.iterator()],
+            batch_size=1000,
+            ignore_conflicts=True,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0019_merge_20221220_1024'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='follow',
+            name='fan_out',
+            field=models.BooleanField(default=True, help_text='Посты автора раскладываются в ленту подписчика при публикации. Для авторов с большим числом подписчиков лента дочитывает их посты при просмотре.', verbose_name='Рассылка в ленту'),
+        ),
+        migrations.CreateModel(
+            name='TimelineEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(verbose_name='Дата создания поста')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline_entries', to='posts.Post', verbose_name='Пост')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Запись ленты',
+                'verbose_name_plural': 'Записи лент',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='timelineentry',
+            index=models.Index(fields=['user', '-created', '-post'], name='posts_timeline_feed_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='timelineentry',
+            unique_together={('user', 'post')},
+        ),
+        migrations.RunPython(fill_timelines, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 2.2.16 on 2026-10-18 04:42
+
+from django.db import migrations, models
+
+
+def remove_duplicate_follows(apps, schema_editor):
+    """Удаляет повторные подписки перед созданием уникального ограничения."""
+    Follow = apps.get_model('posts', 'Follow')
+    duplicates = (
+        Follow.objects.order_by().values('user_id', 'author_id')
+        .annotate(first_id=models.Min('id'), total=models.Count('id'))
+        .filter(total__gt=1)
+    )
+    for duplicate in duplicates.iterator():
+        Follow.objects.filter(
+            user_id=duplicate['user_id'],
+            author_id=duplicate['author_id'],
+        ).exclude(id=duplicate['first_id']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0020_timelineentry'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'created'], name='posts_comment_post_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-created', '-id'], name='posts_post_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['author', '-created', '-id'], name='posts_post_author_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['group', '-created', '-id'], name='posts_post_group_created_idx'),
+        ),
+        migrations.RunPython(
+            remove_duplicate_follows, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.UniqueConstraint(fields=('user', 'author'), name='posts_follow_unique_user_author'),
+        ),
+    ]
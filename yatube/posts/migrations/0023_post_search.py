@@ -0,0 +1,51 @@
+from django.db import migrations
+
+from posts.stemmer import tokenize
+
+
+def create_search_index(apps, schema_editor):
+    """Создает поисковый индекс постов и заполняет его."""
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(
+            'CREATE VIRTUAL TABLE posts_post_fts USING fts5('
+            "content, tokenize = 'unicode61 remove_diacritics 2')")
+        Post = apps.get_model('posts', 'Post')
+        posts = Post.objects.order_by().values_list('id', 'text')
+        with schema_editor.connection.cursor() as cursor:
+            cursor.executemany(
+                'INSERT INTO posts_post_fts (rowid, content) VALUES (%s, %s)',
+                ((post_id, ' '.join(tokenize(text)))
+                 for post_id, text in posts.iterator()))
+    elif vendor == 'postgresql':
+        schema_editor.execute(
+            'CREATE TABLE posts_post_search ('
+            'post_id integer PRIMARY KEY '
+            'REFERENCES posts_post (id) ON DELETE CASCADE '
+            'DEFERRABLE INITIALLY DEFERRED, '
+            'document tsvector NOT NULL)')
+        schema_editor.execute(
+            'CREATE INDEX posts_post_search_document_idx '
+            'ON posts_post_search USING GIN (document)')
+        schema_editor.execute(
+            'INSERT INTO posts_post_search (post_id, document) '
+            "SELECT id, to_tsvector('russian', text) FROM posts_post")
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE posts_post_fts')
+    elif vendor == 'postgresql':
+        schema_editor.execute('DROP TABLE posts_post_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0022_counter_columns'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -1,6 +1,6 @@
 from typing import Tuple, Type
 
-from core.models import CreatedModel
+from core.models import CounterFieldsMixin, CreatedModel
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import AbstractBaseUser
 from django.db import models
@@ -9,9 +9,11 @@ from django.urls import reverse
 User: Type[AbstractBaseUser] = get_user_model()
 
 
-class Group(models.Model):
+class Group(CounterFieldsMixin, models.Model):
     """Модель группы, к которой может относиться пост."""
 
+    counter_fields: Tuple[str, ...] = ('posts_count',)
+
     title = models.CharField(
         max_length=200,
         verbose_name='Название',
@@ -23,6 +25,11 @@ class Group(models.Model):
     description = models.TextField(
         verbose_name='Описание',
     )
+    posts_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество постов',
+    )
 
     class Meta:
         """Метаданные."""
@@ -35,9 +42,11 @@ class Group(models.Model):
         return self.title
 
 
-class Post(CreatedModel):
+class Post(CounterFieldsMixin, CreatedModel):
     """Модель поста."""
 
+    counter_fields: Tuple[str, ...] = ('comments_count',)
+
     text: models.TextField = models.TextField(
         verbose_name='Текст поста',
         help_text='Введите текст поста',
@@ -62,11 +71,30 @@ class Post(CreatedModel):
         upload_to='posts/',
         blank=True
     )
+    comments_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество комментариев',
+    )
 
     class Meta:
         """Метаданные."""
 
         ordering: Tuple[str] = ('-created',)
+        indexes = (
+            models.Index(
+                fields=('-created', '-id'),
+                name='posts_post_created_id_idx',
+            ),
+            models.Index(
+                fields=('author', '-created', '-id'),
+                name='posts_post_author_created_idx',
+            ),
+            models.Index(
+                fields=('group', '-created', '-id'),
+                name='posts_post_group_created_idx',
+            ),
+        )
         verbose_name: str = 'Пост'
         verbose_name_plural: str = 'Посты'
 
@@ -74,6 +102,16 @@ class Post(CreatedModel):
         """Возвращает текст поста."""
         return self.text[:15]
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Запоминает ленты загруженного поста для сигналов счетчиков."""
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_feeds = (
+            instance.__dict__.get('author_id'),
+            instance.__dict__.get('group_id'),
+        )
+        return instance
+
     def get_absolute_url(self):
         """Получение URL деталей поста."""
         return reverse(
@@ -82,6 +120,36 @@ class Post(CreatedModel):
         )
 
 
+class UserCounters(models.Model):
+    """Денормализованные счетчики пользователя."""
+
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='counters',
+        verbose_name='Пользователь',
+    )
+    posts_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Количество постов',
+    )
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Количество подписчиков',
+    )
+    following_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Количество подписок',
+    )
+
+    class Meta:
+        """Метаданные."""
+
+        verbose_name: str = 'Счетчики пользователя'
+        verbose_name_plural: str = 'Счетчики пользователей'
+
+
 class Comment(CreatedModel):
     """Модель комментария к посту."""
 
@@ -106,6 +174,12 @@ class Comment(CreatedModel):
     class Meta:
         """Метаданные."""
 
+        indexes = (
+            models.Index(
+                fields=('post', 'created'),
+                name='posts_comment_post_created_idx',
+            ),
+        )
         verbose_name: str = 'Комментарий'
         verbose_name_plural: str = 'Комментарии'
 
@@ -125,3 +199,55 @@ class Follow(models.Model):
         related_name='following',
         verbose_name='Автор',
     )
+    fan_out = models.BooleanField(
+        default=True,
+        verbose_name='Рассылка в ленту',
+        help_text=(
+            'Посты автора раскладываются в ленту подписчика при публикации. '
+            'Для авторов с большим числом подписчиков лента дочитывает '
+            'их посты при просмотре.'
+        ),
+    )
+
+    class Meta:
+        """Метаданные."""
+
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'author'),
+                name='posts_follow_unique_user_author',
+            ),
+        )
+
+
+class TimelineEntry(models.Model):
+    """Запись материализованной ленты подписок пользователя."""
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Пользователь',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Пост',
+    )
+    created = models.DateTimeField(
+        verbose_name='Дата создания поста',
+    )
+
+    class Meta:
+        """Метаданные."""
+
+        unique_together: Tuple[Tuple[str, str]] = (('user', 'post'),)
+        indexes = (
+            models.Index(
+                fields=('user', '-created', '-post'),
+                name='posts_timeline_feed_idx',
+            ),
+        )
+        verbose_name: str = 'Запись ленты'
+        verbose_name_plural: str = 'Записи лент'
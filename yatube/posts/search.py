@@ -0,0 +1,178 @@
+"""Полнотекстовый поиск по постам.
+
+Поисковый индекс хранится в отдельной таблице и обновляется сигналами
+при сохранении и удалении поста (см. signals.py), команда
+reindex_posts перестраивает его целиком.
+
+На SQLite используется виртуальная таблица FTS5 posts_post_fts,
+в которую записываются основы слов (см. stemmer.py), ранжирование -
+bm25. На PostgreSQL - таблица posts_post_search со столбцом tsvector
+(конфигурация russian) и GIN-индексом, ранжирование - ts_rank_cd.
+
+Результаты упорядочены по релевантности и разбиты на страницы
+курсором (score, id) без OFFSET.
+"""
+import base64
+import binascii
+from typing import Iterable, List, Optional, Tuple
+
+from core.utils import batched
+from django.db import connection
+from django.db.models.query import QuerySet
+
+from . import constants
+from .models import Post
+from .stemmer import tokenize
+
+# Курсор: оценка последнего результата (меньше - релевантнее) и id поста.
+Cursor = Tuple[float, int]
+SearchResults = Tuple[List[Post], Optional[str]]
+
+
+class SqliteBackend:
+    """Поиск на SQLite FTS5 с основами слов из stemmer.py."""
+
+    def index(self, cursor, rows: List[Tuple[int, str]]) -> None:
+        self.remove(cursor, [post_id for post_id, _ in rows])
+        cursor.executemany(
+            'INSERT INTO posts_post_fts (rowid, content) VALUES (%s, %s)',
+            [(post_id, ' '.join(tokenize(text))) for post_id, text in rows])
+
+    def remove(self, cursor, post_ids: List[int]) -> None:
+        cursor.executemany(
+            'DELETE FROM posts_post_fts WHERE rowid = %s',
+            [(post_id,) for post_id in post_ids])
+
+    def clear(self, cursor) -> None:
+        cursor.execute('DELETE FROM posts_post_fts')
+
+    def ranked(self, query: str) -> Optional[Tuple[str, List]]:
+        terms: List[str] = tokenize(query)
+        if not terms:
+            return None
+        match: str = ' '.join(
+            '"' + term.replace('"', '""') + '"' for term in terms)
+        return (
+            'SELECT rowid AS post_id, bm25(posts_post_fts) AS score '
+            'FROM posts_post_fts WHERE posts_post_fts MATCH %s',
+            [match],
+        )
+
+
+class PostgresBackend:
+    """Поиск на PostgreSQL: tsvector с конфигурацией russian и GIN."""
+
+    def index(self, cursor, rows: List[Tuple[int, str]]) -> None:
+        cursor.executemany(
+            'INSERT INTO posts_post_search (post_id, document) '
+            "VALUES (%s, to_tsvector('russian', %s)) "
+            'ON CONFLICT (post_id) DO UPDATE SET document = EXCLUDED.document',
+            rows)
+
+    def remove(self, cursor, post_ids: List[int]) -> None:
+        cursor.execute(
+            'DELETE FROM posts_post_search WHERE post_id = ANY(%s)',
+            [post_ids])
+
+    def clear(self, cursor) -> None:
+        cursor.execute('TRUNCATE posts_post_search')
+
+    def ranked(self, query: str) -> Optional[Tuple[str, List]]:
+        if not query.strip():
+            return None
+        return (
+            'SELECT post_id, -ts_rank_cd(document, query) AS score '
+            'FROM posts_post_search, '
+            "plainto_tsquery('russian', %s) AS query "
+            'WHERE document @@ query',
+            [query],
+        )
+
+
+BACKENDS = {
+    'sqlite': SqliteBackend,
+    'postgresql': PostgresBackend,
+}
+
+
+def get_backend():
+    """Поисковый бэкенд для базы данных по умолчанию."""
+    return BACKENDS[connection.vendor]()
+
+
+def index_posts(posts: Iterable[Tuple[int, str]]) -> None:
+    """Добавляет или обновляет посты (id, text) в индексе."""
+    backend = get_backend()
+    with connection.cursor() as cursor:
+        for batch in batched(posts, constants.POSTS_COUNT_BATCH_SIZE):
+            backend.index(cursor, batch)
+
+
+def remove_posts(post_ids: List[int]) -> None:
+    """Удаляет посты из индекса."""
+    with connection.cursor() as cursor:
+        get_backend().remove(cursor, post_ids)
+
+
+def rebuild() -> int:
+    """Перестраивает индекс по всем постам, возвращает их количество."""
+    with connection.cursor() as cursor:
+        get_backend().clear(cursor)
+    posts: QuerySet = Post.objects.order_by().values_list('id', 'text')
+    indexed: int = 0
+    for batch in batched(posts.iterator(), constants.POSTS_COUNT_BATCH_SIZE):
+        index_posts(batch)
+        indexed += len(batch)
+    return indexed
+
+
+def encode_cursor(cursor: Cursor) -> str:
+    score, post_id = cursor
+    raw: str = f'{score!r}|{post_id}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token: Optional[str]) -> Optional[Cursor]:
+    """Декодирует курсор из URL. Для некорректного значения вернет None."""
+    if not token:
+        return None
+    try:
+        padded: str = token + '=' * (-len(token) % 4)
+        raw: str = base64.urlsafe_b64decode(padded.encode()).decode()
+        score, post_id = raw.rsplit('|', 1)
+        return float(score), int(post_id)
+    except (ValueError, binascii.Error, UnicodeDecodeError):
+        return None
+
+
+def search_ids(query: str, after: Optional[Cursor] = None,
+               limit: int = constants.POSTS_PER_PAGE) -> List[Cursor]:
+    """id найденных постов с оценками в порядке релевантности."""
+    ranked: Optional[Tuple[str, List]] = get_backend().ranked(query)
+    if ranked is None:
+        return []
+    sql, params = ranked
+    sql = f'SELECT post_id, score FROM ({sql}) AS ranked'
+    if after is not None:
+        score, post_id = after
+        sql += ' WHERE score > %s OR (score = %s AND post_id < %s)'
+        params += [score, score, post_id]
+    sql += ' ORDER BY score, post_id DESC LIMIT %s'
+    params.append(limit)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [(score, post_id) for post_id, score in cursor.fetchall()]
+
+
+def search_posts(query: str, after: Optional[str] = None) -> SearchResults:
+    """Страница найденных постов и курсор следующей страницы."""
+    found: List[Cursor] = search_ids(
+        query, decode_cursor(after), constants.POSTS_PER_PAGE + 1)
+    next_cursor: Optional[str] = None
+    if len(found) > constants.POSTS_PER_PAGE:
+        found = found[:constants.POSTS_PER_PAGE]
+        next_cursor = encode_cursor(found[-1])
+    posts = Post.objects.select_related('group', 'author').in_bulk(
+        [post_id for _, post_id in found])
+    return [posts[post_id] for _, post_id in found
+            if post_id in posts], next_cursor
@@ -0,0 +1,160 @@
+"""Обработчики сигналов моделей приложения posts."""
+from typing import FrozenSet, Optional, Tuple
+
+from django.db.models.query import QuerySet
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from . import counters, generations, search, timeline
+from .models import Comment, Follow, Group, Post, User, UserCounters
+
+# Поля пользователя, изменение которых не влияет на страницы.
+SERVICE_USER_FIELDS: FrozenSet[str] = frozenset({'last_login', 'password'})
+
+
+def _change_post_counters(author_id: int, group_id: Optional[int],
+                          delta: int) -> None:
+    counters.change_user_counter(author_id, 'posts_count', delta)
+    counters.change_group_counter(group_id, delta)
+
+
+@receiver(post_save, sender=Post)
+def on_post_save(sender, instance: Post, created: bool, **kwargs) -> None:
+    """Обновляет счетчики, поколения кеша, ленты подписчиков
+    и поисковый индекс.
+
+    При смене автора или группы поста счетчики переносятся,
+    а поколения увеличиваются и у старых, и у новых областей.
+    """
+    current: Tuple[int, Optional[int]] = (
+        instance.author_id, instance.group_id)
+    loaded: Tuple[int, Optional[int]] = getattr(
+        instance, '_loaded_feeds', current)
+    if created:
+        counters.change_all_posts_count(1)
+        _change_post_counters(*current, 1)
+        timeline.fan_out_post(instance)
+    elif loaded != current:
+        _change_post_counters(*loaded, -1)
+        _change_post_counters(*current, 1)
+    generations.bump(
+        set(generations.post_keys(*loaded))
+        | set(generations.post_keys(*current))
+        | {generations.post_key(instance.id)})
+    instance._loaded_feeds = current
+    search.index_posts([(instance.id, instance.text)])
+
+
+@receiver(post_delete, sender=Post)
+def on_post_delete(sender, instance: Post, **kwargs) -> None:
+    """Уменьшает счетчики, сбрасывает кеш областей удаленного поста
+    и удаляет его из поискового индекса."""
+    counters.change_all_posts_count(-1)
+    _change_post_counters(instance.author_id, instance.group_id, -1)
+    generations.bump(
+        [*generations.post_keys(instance.author_id, instance.group_id),
+         generations.post_key(instance.id)])
+    search.remove_posts([instance.id])
+
+
+def _bump_group(group: Group) -> None:
+    author_ids: QuerySet = group.posts.order_by().values_list(
+        'author_id', flat=True).distinct()
+    generations.bump(
+        [generations.global_key(), generations.groups_key(),
+         generations.group_key(group.id)]
+        + [generations.author_key(author_id) for author_id in author_ids])
+
+
+@receiver(post_save, sender=Group)
+def on_group_save(sender, instance: Group, created: bool, **kwargs) -> None:
+    """Сбрасывает кеш страниц с названием группы, в т.ч. профилей
+    авторов ее постов."""
+    if created:
+        generations.bump(
+            (generations.groups_key(), generations.group_key(instance.id)))
+        return
+    _bump_group(instance)
+
+
+@receiver(pre_delete, sender=Group)
+def on_group_delete(sender, instance: Group, **kwargs) -> None:
+    """Сбрасывает кеш страниц с постами удаляемой группы.
+
+    Посты отвязываются от группы запросом UPDATE без сигналов,
+    поэтому поколения авторов этих постов увеличиваются здесь.
+    """
+    _bump_group(instance)
+
+
+@receiver(post_save, sender=Comment)
+def update_counts_on_comment_create(sender, instance: Comment,
+                                    created: bool, **kwargs) -> None:
+    """Увеличивает количество комментариев поста и сбрасывает кеш
+    страницы поста."""
+    if created:
+        counters.change_counter(
+            Post.objects.filter(pk=instance.post_id), 'comments_count', 1)
+    generations.bump((generations.post_key(instance.post_id),))
+
+
+@receiver(post_delete, sender=Comment)
+def update_counts_on_comment_delete(sender, instance: Comment,
+                                    **kwargs) -> None:
+    """Уменьшает количество комментариев поста и сбрасывает кеш
+    страницы поста."""
+    counters.change_counter(
+        Post.objects.filter(pk=instance.post_id), 'comments_count', -1)
+    generations.bump((generations.post_key(instance.post_id),))
+
+
+def _bump_follow_profiles(follow: Follow) -> None:
+    # Профили показывают количество подписчиков и подписок.
+    generations.bump((generations.author_key(follow.user_id),
+                      generations.author_key(follow.author_id)))
+
+
+@receiver(post_save, sender=Follow)
+def on_follow(sender, instance: Follow, created: bool, **kwargs) -> None:
+    """Обновляет счетчики подписок и заполняет ленту подписчика."""
+    if created:
+        counters.change_user_counter(instance.user_id, 'following_count', 1)
+        counters.change_user_counter(instance.author_id, 'followers_count', 1)
+        timeline.backfill(instance)
+        _bump_follow_profiles(instance)
+
+
+@receiver(post_delete, sender=Follow)
+def on_unfollow(sender, instance: Follow, **kwargs) -> None:
+    """Обновляет счетчики подписок и убирает посты автора из ленты."""
+    counters.change_user_counter(instance.user_id, 'following_count', -1)
+    counters.change_user_counter(instance.author_id, 'followers_count', -1)
+    timeline.cleanup(instance)
+    _bump_follow_profiles(instance)
+
+
+@receiver(post_save, sender=User)
+def on_user_save(sender, instance: User, created: bool,
+                 update_fields: Optional[FrozenSet[str]] = None,
+                 **kwargs) -> None:
+    """Создает счетчики нового пользователя и сбрасывает кеш страниц
+    с именем измененного пользователя.
+
+    Сохранения служебных полей (например, last_login при входе)
+    кеш не сбрасывают.
+    """
+    if created:
+        UserCounters.objects.get_or_create(user=instance)
+        return
+    if update_fields and set(update_fields) <= SERVICE_USER_FIELDS:
+        return
+    group_ids: QuerySet = (
+        instance.posts.exclude(group=None).order_by()
+        .values_list('group_id', flat=True).distinct())
+    commented_post_ids: QuerySet = (
+        instance.comments.order_by()
+        .values_list('post_id', flat=True).distinct())
+    generations.bump(
+        [generations.global_key(), generations.author_key(instance.id)]
+        + [generations.group_key(group_id) for group_id in group_ids]
+        + [generations.post_key(post_id) for post_id in commented_post_ids])
@@ -0,0 +1,123 @@
+"""Стеммер русского языка (алгоритм Snowball).
+
+Используется полнотекстовым поиском на SQLite, у которого нет
+собственной русской морфологии. Описание алгоритма:
+https://snowballstem.org/algorithms/russian/stemmer.html
+"""
+import re
+from typing import Iterable, List, Optional, Tuple
+
+VOWELS = 'аеиоуыэюя'
+
+PERFECTIVE_GERUND: Tuple[Tuple[str, ...], Tuple[str, ...]] = (
+    ('в', 'вши', 'вшись'),
+    ('ив', 'ивши', 'ившись', 'ыв', 'ывши', 'ывшись'),
+)
+ADJECTIVE: Tuple[str, ...] = (
+    'ее', 'ие', 'ые', 'ое', 'ими', 'ыми', 'ей', 'ий', 'ый', 'ой', 'ем',
+    'им', 'ым', 'ом', 'его', 'ого', 'ему', 'ому', 'их', 'ых', 'ую', 'юю',
+    'ая', 'яя', 'ою', 'ею',
+)
+PARTICIPLE: Tuple[Tuple[str, ...], Tuple[str, ...]] = (
+    ('ем', 'нн', 'вш', 'ющ', 'щ'),
+    ('ивш', 'ывш', 'ующ'),
+)
+REFLEXIVE: Tuple[str, ...] = ('ся', 'сь')
+VERB: Tuple[Tuple[str, ...], Tuple[str, ...]] = (
+    ('ла', 'на', 'ете', 'йте', 'ли', 'й', 'л', 'ем', 'н', 'ло', 'но', 'ет',
+     'ют', 'ны', 'ть', 'ешь', 'нно'),
+    ('ила', 'ыла', 'ена', 'ейте', 'уйте', 'ите', 'или', 'ыли', 'ей', 'уй',
+     'ил', 'ыл', 'им', 'ым', 'ен', 'ило', 'ыло', 'ено', 'ят', 'ует', 'уют',
+     'ит', 'ыт', 'ены', 'ить', 'ыть', 'ишь', 'ую', 'ю'),
+)
+NOUN: Tuple[str, ...] = (
+    'а', 'ев', 'ов', 'ие', 'ье', 'е', 'иями', 'ями', 'ами', 'еи', 'ии', 'и',
+    'ией', 'ей', 'ой', 'ий', 'й', 'иям', 'ям', 'ием', 'ем', 'ам', 'ом', 'о',
+    'у', 'ах', 'иях', 'ях', 'ы', 'ь', 'ию', 'ью', 'ю', 'ия', 'ья', 'я',
+)
+SUPERLATIVE: Tuple[str, ...] = ('ейше', 'ейш')
+DERIVATIONAL: Tuple[str, ...] = ('ость', 'ост')
+
+WORD_RE = re.compile(r'\w+')
+
+
+def _longest(word: str, endings: Iterable[str]) -> Optional[str]:
+    matches: List[str] = [ending for ending in endings
+                          if word.endswith(ending)]
+    return max(matches, key=len, default=None)
+
+
+def _remove(word: str, endings: Iterable[str],
+            after_a: Iterable[str] = ()) -> Optional[str]:
+    """Удаляет самое длинное окончание.
+
+    Окончания after_a удаляются, только если перед ними стоит а или я.
+    Возвращает None, если окончание не найдено или условие не выполнено.
+    """
+    after_a = tuple(after_a)
+    ending: Optional[str] = _longest(word, (*after_a, *endings))
+    if ending is None:
+        return None
+    stem: str = word[:-len(ending)]
+    if ending in after_a and ending not in endings:
+        if not stem or stem[-1] not in 'ая':
+            return None
+    return stem
+
+
+def _region(word: str, start: int) -> int:
+    """Начало области после первого сочетания гласная-согласная."""
+    for index in range(start + 1, len(word)):
+        if word[index - 1] in VOWELS and word[index] not in VOWELS:
+            return index + 1
+    return len(word)
+
+
+def _step_1(rv: str) -> str:
+    stem: Optional[str] = _remove(rv, PERFECTIVE_GERUND[1],
+                                  PERFECTIVE_GERUND[0])
+    if stem is not None:
+        return stem
+    rv = _remove(rv, REFLEXIVE) or rv
+    stem = _remove(rv, ADJECTIVE)
+    if stem is not None:
+        return _remove(stem, PARTICIPLE[1], PARTICIPLE[0]) or stem
+    for endings, after_a in ((VERB[1], VERB[0]), (NOUN, ())):
+        stem = _remove(rv, endings, after_a)
+        if stem is not None:
+            return stem
+    return rv
+
+
+def _step_4(rv: str) -> str:
+    ending: Optional[str] = _longest(rv, (*SUPERLATIVE, 'н', 'ь'))
+    if ending in SUPERLATIVE:
+        rv = rv[:-len(ending)]
+        ending = 'н'
+    if ending == 'н' and rv.endswith('нн'):
+        return rv[:-1]
+    if ending == 'ь':
+        return rv[:-1]
+    return rv
+
+
+def stem(word: str) -> str:
+    """Основа слова. Слова не на кириллице возвращаются без изменений."""
+    word = word.lower().replace('ё', 'е')
+    rv_start: int = next(
+        (index + 1 for index, char in enumerate(word) if char in VOWELS),
+        len(word))
+    r2_start: int = _region(word, _region(word, 0))
+    prefix, rv = word[:rv_start], word[rv_start:]
+    rv = _step_1(rv)
+    if rv.endswith('и'):
+        rv = rv[:-1]
+    ending: Optional[str] = _longest(rv, DERIVATIONAL)
+    if ending and len(prefix) + len(rv) - len(ending) >= r2_start:
+        rv = rv[:-len(ending)]
+    return prefix + _step_4(rv)
+
+
+def tokenize(text: str) -> List[str]:
+    """Основы всех слов текста в нижнем регистре."""
+    return [stem(word) for word in WORD_RE.findall(text.lower())]
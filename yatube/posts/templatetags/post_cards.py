@@ -0,0 +1,51 @@
+"""Кеш отрисованных карточек постов.
+
+Карточка поста (includes/post.html) показывается в нескольких лентах,
+поэтому ее HTML кешируется по id поста и хешу отображаемых полей.
+Карточки страницы читаются из кеша одним запросом get_many,
+отрисовываются только отсутствующие.
+"""
+import hashlib
+from typing import Dict, Iterable, List
+
+from django import template
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import SafeString, mark_safe
+
+from .. import constants
+from ..models import Post
+
+register = template.Library()
+
+CARD_TEMPLATE: str = 'includes/post.html'
+
+
+def card_key(post: Post) -> str:
+    """Ключ карточки, меняется вместе с отображаемыми полями поста."""
+    fields: List[str] = [
+        post.text,
+        post.created.isoformat(),
+        post.image.name or '',
+        post.author.get_username(),
+        post.author.get_full_name(),
+    ]
+    if post.group is not None:
+        fields += [post.group.slug, str(post.group)]
+    digest: str = hashlib.md5('\0'.join(fields).encode()).hexdigest()
+    return f'post_card:{post.id}:{digest}'
+
+
+@register.simple_tag
+def post_cards(posts: Iterable[Post]) -> List[SafeString]:
+    """HTML карточек постов в порядке posts."""
+    keys: Dict[str, Post] = {card_key(post): post for post in posts}
+    cards: Dict[str, str] = cache.get_many(keys)
+    missing: Dict[str, str] = {
+        key: render_to_string(CARD_TEMPLATE, {'post': post})
+        for key, post in keys.items() if key not in cards
+    }
+    if missing:
+        cache.set_many(missing, constants.POST_CARD_CACHE_TIMEOUT)
+        cards.update(missing)
+    return [mark_safe(cards[key]) for key in keys]
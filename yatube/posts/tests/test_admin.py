@@ -0,0 +1,84 @@
+from unittest import mock
+
+from core.admin import ApproximateCountPaginator
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AbstractBaseUser
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..admin import CommentAdmin, PostAdmin
+from ..models import Comment, Group, Post
+
+User = get_user_model()
+
+
+class LargeTableAdminTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin: AbstractBaseUser = User.objects.create_superuser(
+            username='TestAdmin', email='admin@example.com', password='pass')
+        cls.group: Group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        cls.posts = [
+            Post.objects.create(
+                author=cls.admin, text=f'Пост {number}', group=cls.group)
+            for number in range(5)
+        ]
+        cls.changelist_url = reverse('admin:posts_post_changelist')
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.admin)
+
+    def get_changelist(self, url, **params):
+        with mock.patch.object(PostAdmin, 'list_per_page', 2):
+            return self.client.get(url, params)
+
+    def test_comment_admin_registered(self):
+        """Комментарии зарегистрированы в админке классом CommentAdmin."""
+        self.assertIsInstance(admin.site._registry[Comment], CommentAdmin)
+
+    def test_keyset_paging(self):
+        """Список постов листается курсором по pk."""
+        response = self.get_changelist(self.changelist_url)
+        cl = response.context['cl']
+        self.assertEqual(list(cl.result_list), self.posts[:-3:-1])
+        self.assertContains(response, 'Следующая')
+
+        response = self.get_changelist(self.changelist_url + cl.next_url)
+        self.assertEqual(
+            list(response.context['cl'].result_list), self.posts[-3:-5:-1])
+
+    def test_queries_do_not_grow_with_rows(self):
+        """Количество запросов списка не зависит от количества строк."""
+        queries = []
+        for per_page in (1, 5):
+            with mock.patch.object(PostAdmin, 'list_per_page', per_page):
+                with CaptureQueriesContext(connection) as captured:
+                    self.client.get(self.changelist_url)
+            queries.append(len(captured.captured_queries))
+        self.assertEqual(queries[0], queries[1])
+
+    def test_count_is_capped(self):
+        """Количество объектов считается не дальше предела."""
+        with mock.patch.object(
+                ApproximateCountPaginator, 'count_limit', 3):
+            response = self.get_changelist(self.changelist_url, q='пост')
+        self.assertTrue(response.context['cl'].paginator.count_capped)
+        self.assertContains(response, 'более 3')
+
+    def test_autocomplete_widgets(self):
+        """Форма поста не загружает всех пользователей в список."""
+        for number in range(3):
+            User.objects.create_user(username=f'TestUser{number}')
+        response = self.client.get(
+            reverse('admin:posts_post_change', args=(self.posts[0].id,)))
+        self.assertContains(response, 'admin-autocomplete')
+        self.assertNotContains(response, 'TestUser0')
@@ -0,0 +1,41 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AbstractBaseUser
+from django.core.management import call_command
+from django.test import TestCase
+
+from ..models import Follow, Group, Post
+
+User = get_user_model()
+
+
+class ExplainViewsCommandTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author: AbstractBaseUser = User.objects.create_user(
+            username='TestAuthor')
+        cls.follower: AbstractBaseUser = User.objects.create_user(
+            username='TestFollower')
+        cls.group: Group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        Post.objects.create(
+            author=cls.author, text='Тестовый пост', group=cls.group)
+        Follow.objects.create(user=cls.follower, author=cls.author)
+
+    def test_explain_views_reports_every_feed(self):
+        """Команда выводит планы запросов всех страниц лент."""
+        out = StringIO()
+        call_command('explain_views', '--plans', stdout=out)
+        report: str = out.getvalue()
+
+        for name in ('posts:index', 'posts:group_list', 'posts:profile',
+                     'posts:post_detail', 'posts:follow_index'):
+            with self.subTest(name=name):
+                self.assertIn(name, report)
+        self.assertIn('posts_post_author_created_idx', report)
+        self.assertIn('Проблемных запросов: 0', report)
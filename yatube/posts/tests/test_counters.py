@@ -0,0 +1,147 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AbstractBaseUser
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .. import counters
+from ..models import Comment, Follow, Group, Post, UserCounters
+
+User = get_user_model()
+
+
+class PostCountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user: AbstractBaseUser = User.objects.create_user(
+            username='TestUser')
+        cls.follower: AbstractBaseUser = User.objects.create_user(
+            username='TestFollower')
+        cls.group_1: Group = Group.objects.create(
+            title='Тестовая группа 1',
+            slug='test_slug_1',
+            description='Тестовое описание',
+        )
+        cls.group_2: Group = Group.objects.create(
+            title='Тестовая группа 2',
+            slug='test_slug_2',
+            description='Тестовое описание',
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.post: Post = Post.objects.create(
+            author=self.user,
+            text='Тестовый пост',
+            group=self.group_1,
+        )
+
+    def tearDown(self):
+        cache.clear()
+
+    def assert_counts(self, total, author, group_1, group_2):
+        """Проверка счетчиков постов."""
+        self.assertEqual(counters.get_all_posts_count(), total)
+        self.assertEqual(
+            UserCounters.objects.get(user=self.user).posts_count, author)
+        self.assertEqual(
+            Group.objects.get(pk=self.group_1.pk).posts_count, group_1)
+        self.assertEqual(
+            Group.objects.get(pk=self.group_2.pk).posts_count, group_2)
+
+    def test_counts_follow_post_create_and_delete(self):
+        """Счетчики меняются при создании и удалении поста."""
+        counters.get_all_posts_count()
+        new_post: Post = Post.objects.create(
+            author=self.user, text='Новый пост', group=self.group_2)
+        self.assert_counts(total=2, author=2, group_1=1, group_2=1)
+
+        new_post.delete()
+        self.assert_counts(total=1, author=1, group_1=1, group_2=0)
+
+    def test_counts_follow_group_change(self):
+        """Перенос поста в другую группу меняет счетчики групп."""
+        post: Post = Post.objects.get(pk=self.post.pk)
+        post.group = self.group_2
+        post.save()
+
+        self.assert_counts(total=1, author=1, group_1=0, group_2=1)
+
+    def test_comment_and_follow_counters(self):
+        """Комментарии и подписки обновляют счетчики, в т.ч. каскадно."""
+        author: AbstractBaseUser = User.objects.create_user(
+            username='TestDeletedAuthor')
+        post: Post = Post.objects.create(
+            author=author, text='Пост', group=self.group_2)
+        Comment.objects.create(
+            post=post, author=self.follower, text='Комментарий')
+        Follow.objects.create(user=self.follower, author=author)
+        self.assertEqual(Post.objects.get(pk=post.pk).comments_count, 1)
+        self.assertEqual(
+            UserCounters.objects.get(user=author).followers_count, 1)
+        self.assertEqual(
+            UserCounters.objects.get(user=self.follower).following_count, 1)
+
+        author.delete()
+
+        self.assertEqual(
+            UserCounters.objects.get(user=self.follower).following_count, 0)
+        self.assertEqual(
+            Group.objects.get(pk=self.group_2.pk).posts_count, 0)
+
+    def test_stale_instance_save_keeps_counters(self):
+        """Сохранение загруженного ранее объекта не сбрасывает счетчики."""
+        stale_post: Post = Post.objects.get(pk=self.post.pk)
+        stale_group: Group = Group.objects.get(pk=self.group_1.pk)
+        Comment.objects.create(
+            post=self.post, author=self.follower, text='Комментарий')
+        Post.objects.create(
+            author=self.user, text='Второй пост', group=self.group_1)
+
+        stale_post.text = 'Измененный пост'
+        stale_post.save()
+        stale_group.title = 'Новое название'
+        stale_group.save()
+
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.text, 'Измененный пост')
+        self.assertEqual(self.post.comments_count, 1)
+        group: Group = Group.objects.get(pk=self.group_1.pk)
+        self.assertEqual(group.title, 'Новое название')
+        self.assertEqual(group.posts_count, 2)
+
+    def test_repair_command_fixes_drift(self):
+        """Команда пересчета исправляет расхождения счетчиков."""
+        cache.set(counters.all_posts_key(), 100)
+        Group.objects.filter(pk=self.group_2.pk).update(posts_count=7)
+        UserCounters.objects.filter(user=self.user).delete()
+
+        call_command('repair_counters', stdout=StringIO())
+
+        self.assert_counts(total=1, author=1, group_1=1, group_2=0)
+
+    def test_feed_pages_do_not_count_rows(self):
+        """Страницы лент не выполняют COUNT(*) при заполненном кеше."""
+        counters.get_all_posts_count()
+        pages = [
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group_1.slug}),
+            reverse('posts:profile', kwargs={'username': self.user.username}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}),
+        ]
+        client = Client()
+        for address in pages:
+            with self.subTest(address=address):
+                with CaptureQueriesContext(connection) as queries:
+                    response = client.get(address)
+                self.assertContains(response, self.post.text)
+                count_queries = [
+                    query['sql'] for query in queries.captured_queries
+                    if 'COUNT(' in query['sql'].upper()]
+                self.assertEqual(count_queries, [])
@@ -0,0 +1,69 @@
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from .. import counters
+from ..datasets import DatasetGenerator, Generated, Scale
+from ..models import Comment, Follow, Group, Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SCALE = Scale(posts=200, users=20, groups=3, follows_per_user=5,
+              comments_per_post=0.5)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class DatasetGeneratorTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def layout(self, generated: Generated):
+        """Посты набора относительно первых id, не зависящие от базы."""
+        return [
+            (post.author_id - generated.users.start, post.text, post.group_id
+             and post.group_id - generated.groups.start)
+            for post in Post.objects.filter(
+                id__in=generated.posts).order_by('id')]
+
+    def test_same_seed_gives_same_data(self):
+        """Одно зерно дает одинаковые данные, другое - другие."""
+        first = self.layout(DatasetGenerator(SCALE, seed=1).generate())
+        second = self.layout(DatasetGenerator(SCALE, seed=1).generate())
+        other = self.layout(DatasetGenerator(SCALE, seed=2).generate())
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+
+    def test_authors_follow_power_law(self):
+        """Популярный автор пишет больше и собирает больше подписчиков."""
+        generated = DatasetGenerator(SCALE).generate()
+        posts_of_top = Post.objects.filter(
+            author_id=generated.users[0]).count()
+        self.assertGreater(posts_of_top, 3 * SCALE.posts / SCALE.users)
+        self.assertGreater(
+            Follow.objects.filter(author_id=generated.users[0]).count(),
+            Follow.objects.filter(author_id=generated.users[-1]).count())
+
+    def test_command_creates_rows_and_counters(self):
+        """Команда создает строки, изображения и пересчитывает счетчики."""
+        call_command('generate_dataset', '--users=10', '--groups=2',
+                     '--posts=50', '--images=1', stdout=StringIO())
+
+        self.assertEqual(User.objects.count(), 10)
+        self.assertEqual(Group.objects.count(), 2)
+        self.assertEqual(Post.objects.count(), 50)
+        self.assertEqual(Comment.objects.count(), 25)
+        self.assertEqual(counters.get_all_posts_count(), 50)
+        self.assertTrue(Post.objects.exclude(image='').exists())
+        # Последовательности id продолжаются после заданных заранее id.
+        self.assertEqual(
+            Group.objects.create(title='Новая', slug='new').id,
+            Group.objects.order_by('id').values_list('id', flat=True)[1] + 1)
@@ -0,0 +1,73 @@
+from io import BytesIO
+from unittest import mock
+
+import PIL.Image
+import PIL.ImageFile
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase
+
+from .. import constants
+from ..images import ingest_image
+from .utils import get_test_image
+
+
+def get_jpeg(size, orientation=None, filename='photo.jpg'):
+    """JPEG с заданными размерами и, при необходимости, ориентацией."""
+    file = BytesIO()
+    image = PIL.Image.new('RGB', size, 'white')
+    exif = image.getexif()
+    exif[0x010E] = 'Описание'
+    if orientation is not None:
+        exif[0x0112] = orientation
+    image.save(file, 'JPEG', exif=exif.tobytes())
+    return SimpleUploadedFile(
+        name=filename, content=file.getvalue(), content_type='image/jpeg')
+
+
+def open_result(upload):
+    upload.seek(0)
+    return PIL.Image.open(BytesIO(upload.read()))
+
+
+class IngestImageTest(TestCase):
+    def test_large_jpeg_downscaled_without_metadata(self):
+        """Большой JPEG уменьшается, метаданные удаляются."""
+        with mock.patch.object(constants, 'IMAGE_MAX_SIDE', 100):
+            result = ingest_image(get_jpeg((400, 200)))
+        image = open_result(result)
+        self.assertEqual(image.format, 'JPEG')
+        self.assertEqual(image.size, (100, 50))
+        self.assertEqual(dict(image.getexif()), {})
+        self.assertEqual(result.name, 'photo.jpg')
+
+    def test_exif_orientation_applied(self):
+        """Ориентация из EXIF применяется к пикселям."""
+        image = open_result(ingest_image(get_jpeg((40, 20), orientation=6)))
+        self.assertEqual(image.size, (20, 40))
+
+    def test_png_with_alpha_kept(self):
+        """PNG с прозрачностью остается PNG с прежним именем."""
+        result = ingest_image(get_test_image('test-image.png'))
+        image = open_result(result)
+        self.assertEqual(result.name, 'test-image.png')
+        self.assertEqual(image.format, 'PNG')
+        self.assertEqual(image.mode, 'RGBA')
+
+    def test_other_formats_converted(self):
+        """Изображения других форматов сохраняются в JPEG."""
+        file = BytesIO()
+        PIL.Image.new('RGB', (10, 10)).save(file, 'BMP')
+        result = ingest_image(
+            SimpleUploadedFile('picture.bmp', file.getvalue()))
+        self.assertEqual(result.name, 'picture.jpg')
+        self.assertEqual(open_result(result).format, 'JPEG')
+
+    def test_too_large_rejected_before_decoding(self):
+        """Слишком большое изображение отклоняется по заголовку."""
+        upload = get_jpeg((20, 20))
+        with mock.patch.object(constants, 'IMAGE_MAX_PIXELS', 100), \
+                mock.patch.object(PIL.ImageFile.ImageFile, 'load') as load:
+            with self.assertRaises(ValidationError):
+                ingest_image(upload)
+        load.assert_not_called()
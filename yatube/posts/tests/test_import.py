@@ -0,0 +1,157 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AbstractBaseUser
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+
+from .. import counters, search, timeline
+from ..importer import Checkpoint, Importer, read_records
+from ..models import Comment, Follow, Group, Post, TimelineEntry
+
+User = get_user_model()
+
+
+class ImportContentTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author: AbstractBaseUser = User.objects.create_user(
+            username='TestAuthor')
+        cls.reader: AbstractBaseUser = User.objects.create_user(
+            username='TestReader')
+        cls.group: Group = Group.objects.create(
+            title='Тестовая группа', slug='test_slug')
+
+    def setUp(self):
+        cache.clear()
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def write_jsonl(self, records):
+        path = os.path.join(self.tmp_dir, 'data.jsonl')
+        with open(path, 'w', encoding='utf-8') as data:
+            for record in records:
+                data.write(json.dumps(record, ensure_ascii=False) + '\n')
+        return path
+
+    def records(self):
+        return [
+            {'type': 'post', 'id': 1000, 'author': 'TestAuthor',
+             'group': 'test_slug', 'text': 'Импортированные книги',
+             'created': '2020-01-01T10:00:00'},
+            {'type': 'post', 'author': 'TestAuthor', 'text': 'Второй пост'},
+            {'type': 'comment', 'post': 1000, 'author': 'TestReader',
+             'text': 'Комментарий'},
+            {'type': 'follow', 'user': 'TestReader', 'author': 'TestAuthor'},
+            {'type': 'post', 'author': 'Nobody', 'text': 'Без автора'},
+            {'type': 'comment', 'post': 999, 'author': 'TestReader',
+             'text': 'К несуществующему посту'},
+        ]
+
+    def test_import_rebuilds_derived_data(self):
+        """Импорт создает строки и пересчитывает производные данные."""
+        path = self.write_jsonl(self.records())
+        out = StringIO()
+
+        call_command('import_content', path, '--commit-every=2', stdout=out)
+
+        self.assertEqual(Post.objects.count(), 2)
+        self.assertEqual(Post.objects.get(pk=1000).group, self.group)
+        self.assertEqual(Comment.objects.get().post_id, 1000)
+        self.assertTrue(Follow.objects.filter(
+            user=self.reader, author=self.author).exists())
+        self.assertEqual(Post.objects.get(pk=1000).comments_count, 1)
+        self.assertEqual(counters.get_all_posts_count(), 2)
+        self.assertEqual(TimelineEntry.objects.filter(
+            user=self.reader).count(), 2)
+        self.assertEqual(
+            [post_id for _, post_id in search.search_ids('книга')], [1000])
+        self.assertIn('Пропущено (неизвестный автор): 1', out.getvalue())
+        self.assertIn('Пропущено (неизвестный пост): 1', out.getvalue())
+        self.assertFalse(os.path.exists(path + '.checkpoint'))
+        # Последовательность id продолжается после явно заданных id.
+        self.assertGreater(
+            Post.objects.create(author=self.author, text='Новый').id, 1000)
+
+    def test_import_updates_only_touched_rows(self):
+        """Импорт не перестраивает индекс и ленты целиком."""
+        old = Post.objects.create(author=self.reader, text='Старая книга')
+        Post.objects.filter(pk=old.pk).update(comments_count=5)
+        path = self.write_jsonl(self.records())
+
+        with mock.patch.object(search, 'rebuild',
+                               side_effect=AssertionError), \
+                mock.patch.object(timeline, 'rebuild',
+                                  side_effect=AssertionError):
+            call_command('import_content', path, stdout=StringIO())
+
+        self.assertEqual(
+            sorted(post_id for _, post_id in search.search_ids('книга')),
+            [old.pk, 1000])
+        self.assertEqual(
+            [post_id for _, post_id in search.search_ids('второй')],
+            list(Post.objects.filter(
+                text='Второй пост').values_list('id', flat=True)))
+        # Счетчики незатронутых постов не пересчитываются.
+        old.refresh_from_db()
+        self.assertEqual(old.comments_count, 5)
+
+    def test_resume_from_checkpoint(self):
+        """Повторный запуск продолжает импорт с контрольной точки."""
+        records = self.records()[:4]
+        path = self.write_jsonl(records)
+        checkpoint = Checkpoint(path + '.checkpoint')
+        # Первая порция закоммичена, затем импорт прервался.
+        with open(path, encoding='utf-8') as stream:
+            Importer(checkpoint, commit_every=2).run(
+                list(read_records(stream, 'jsonl'))[:2])
+        self.assertEqual(Post.objects.count(), 2)
+
+        call_command('import_content', path, '--commit-every=2',
+                     stdout=StringIO())
+
+        self.assertEqual(Post.objects.count(), 2)
+        self.assertEqual(Comment.objects.count(), 1)
+        self.assertEqual(Follow.objects.count(), 1)
+
+    def test_csv_input(self):
+        """Записи читаются из CSV, пустые ячейки считаются отсутствующими."""
+        path = os.path.join(self.tmp_dir, 'data.csv')
+        with open(path, 'w', encoding='utf-8', newline='') as data:
+            data.write('type,author,group,text,user\n'
+                       'post,TestAuthor,,Пост из CSV,\n'
+                       'follow,TestAuthor,,,TestReader\n')
+
+        call_command('import_content', path, stdout=StringIO())
+
+        self.assertIsNone(Post.objects.get(text='Пост из CSV').group)
+        self.assertEqual(Follow.objects.count(), 1)
+
+    def test_existing_post_id_is_skipped(self):
+        """Пост с уже занятым id пропускается, импорт продолжается."""
+        existing = Post.objects.create(
+            id=1000, author=self.reader, text='Существующий пост')
+        records = self.records()[:2] + [
+            {'type': 'post', 'id': 1001, 'author': 'TestAuthor',
+             'text': 'Первый с id 1001'},
+            {'type': 'post', 'id': 1001, 'author': 'TestAuthor',
+             'text': 'Второй с id 1001'},
+        ]
+        out = StringIO()
+
+        call_command('import_content', self.write_jsonl(records), stdout=out)
+
+        existing.refresh_from_db()
+        self.assertEqual(existing.text, 'Существующий пост')
+        self.assertEqual(Post.objects.get(pk=1001).text, 'Первый с id 1001')
+        self.assertTrue(Post.objects.filter(text='Второй пост').exists())
+        self.assertIn('Пропущено (пост уже существует): 2', out.getvalue())
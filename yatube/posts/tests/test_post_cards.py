@@ -0,0 +1,72 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AbstractBaseUser
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Group, Post
+from ..templatetags import post_cards
+
+User = get_user_model()
+
+
+class PostCardsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user: AbstractBaseUser = User.objects.create_user(
+            username='TestUser')
+        cls.group: Group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.post: Post = Post.objects.create(
+            author=self.user,
+            text='Тестовый пост',
+            group=self.group,
+        )
+
+    def tearDown(self):
+        cache.clear()
+
+    def get_posts(self):
+        """Посты с автором и группой, как в лентах."""
+        return list(Post.objects.select_related('author', 'group'))
+
+    def test_cards_rendered_once(self):
+        """Закешированная карточка не отрисовывается повторно."""
+        with mock.patch.object(
+                post_cards, 'render_to_string',
+                wraps=post_cards.render_to_string) as render:
+            first = post_cards.post_cards(self.get_posts())
+            second = post_cards.post_cards(self.get_posts())
+        self.assertEqual(render.call_count, 1)
+        self.assertEqual(first, second)
+        self.assertIn(self.post.text, second[0])
+
+    def test_card_changes_with_post(self):
+        """Изменение отображаемых полей поста меняет карточку."""
+        post_cards.post_cards(self.get_posts())
+        Post.objects.filter(pk=self.post.pk).update(text='Новый текст')
+        Group.objects.filter(pk=self.group.pk).update(title='Новая группа')
+
+        card = post_cards.post_cards(self.get_posts())[0]
+
+        self.assertIn('Новый текст', card)
+        self.assertIn('Новая группа', card)
+
+    def test_feed_uses_cached_cards(self):
+        """Лента показывает карточки из кеша."""
+        post_cards.post_cards(self.get_posts())
+        with mock.patch.object(
+                post_cards, 'render_to_string') as render:
+            response = Client().get(
+                reverse('posts:group_list', kwargs={'slug': self.group.slug}))
+        render.assert_not_called()
+        self.assertContains(response, self.post.text)
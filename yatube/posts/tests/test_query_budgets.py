@@ -0,0 +1,123 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AbstractBaseUser
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .. import constants, thumbnails, urls
+from ..models import Comment, Follow, Group, Post
+from .utils import describe_queries
+
+User = get_user_model()
+
+# Наибольшее количество SQL-запросов страницы при пустом кеше.
+# В бюджет входят чтение сессии и пользователя.
+QUERY_BUDGETS = {
+    'index': 4,
+    'group_list': 4,
+    'profile': 5,
+    'post_detail': 4,
+    'post_comments': 4,
+    'post_create': 3,
+    'post_edit': 5,
+    'add_comment': 3,
+    'follow_index': 4,
+    'profile_follow': 10,
+    'profile_unfollow': 11,
+    'search': 4,
+}
+# Страницы, количество запросов которых не должно зависеть
+# от количества постов и комментариев на странице.
+PAGE_SIZE_INDEPENDENT = (
+    'index', 'group_list', 'profile', 'post_detail', 'post_comments',
+    'follow_index')
+
+
+class QueryBudgetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author: AbstractBaseUser = User.objects.create_user(
+            username='TestAuthor')
+        cls.reader: AbstractBaseUser = User.objects.create_user(
+            username='TestReader')
+        cls.group: Group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.post: Post = Post.objects.create(
+            author=cls.author, text='Тестовый пост', group=cls.group)
+        Comment.objects.create(
+            post=cls.post, author=cls.reader, text='Комментарий')
+
+    def setUp(self):
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+
+    def get_url(self, name):
+        """Адрес страницы по имени из posts/urls.py."""
+        kwargs = {
+            'group_list': {'slug': self.group.slug},
+            'profile': {'username': self.author.username},
+            'post_detail': {'post_id': self.post.id},
+            'post_comments': {'post_id': self.post.id},
+            'post_edit': {'post_id': self.post.id},
+            'add_comment': {'post_id': self.post.id},
+            'profile_follow': {'username': self.author.username},
+            'profile_unfollow': {'username': self.author.username},
+        }.get(name, {})
+        url = reverse(f'posts:{name}', kwargs=kwargs)
+        if name == 'search':
+            url += '?q=тестовый'
+        return url
+
+    def capture(self, name):
+        """Запросы страницы при пустом кеше."""
+        cache.clear()
+        thumbnails.lru.clear()
+        client = self.author_client if name == 'post_edit' else (
+            self.reader_client)
+        with CaptureQueriesContext(connection) as queries:
+            client.get(self.get_url(name))
+        return queries.captured_queries
+
+    def add_page_of_content(self):
+        """Добавляет полную страницу постов и комментариев."""
+        for number in range(constants.POSTS_PER_PAGE):
+            Post.objects.create(
+                author=self.author, text=f'Пост {number}', group=self.group)
+            Comment.objects.create(
+                post=self.post, author=self.author, text=f'Ответ {number}')
+
+    def test_every_url_has_budget(self):
+        """У каждой страницы posts/urls.py объявлен бюджет запросов."""
+        names = {pattern.name for pattern in urls.urlpatterns}
+        self.assertEqual(names, set(QUERY_BUDGETS))
+
+    def test_views_within_budget(self):
+        """Страницы укладываются в бюджет запросов."""
+        for name, budget in QUERY_BUDGETS.items():
+            with self.subTest(name=name):
+                queries = self.capture(name)
+                self.assertLessEqual(
+                    len(queries), budget,
+                    f'{name}: {len(queries)} запросов при бюджете {budget}\n'
+                    + describe_queries(queries))
+
+    def test_queries_do_not_grow_with_page_size(self):
+        """Количество запросов не растет с количеством объектов."""
+        before = {name: self.capture(name) for name in PAGE_SIZE_INDEPENDENT}
+        self.add_page_of_content()
+        for name in PAGE_SIZE_INDEPENDENT:
+            with self.subTest(name=name):
+                queries = self.capture(name)
+                self.assertEqual(
+                    len(queries), len(before[name]),
+                    f'{name}: {len(before[name])} -> {len(queries)}\n'
+                    + describe_queries(queries))
@@ -0,0 +1,103 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AbstractBaseUser
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from .. import constants, search
+from ..models import Post
+from ..stemmer import stem
+
+User = get_user_model()
+
+
+class StemmerTest(TestCase):
+    def test_word_forms_share_stem(self):
+        """Формы одного слова имеют одну основу."""
+        forms = {
+            'книг': ('книга', 'книги', 'книгами', 'книгу'),
+            'программирован': ('программирование', 'программирования'),
+            'красив': ('красивый', 'красивые', 'красивого'),
+            'елк': ('ёлка', 'елки'),
+        }
+        for expected, words in forms.items():
+            for word in words:
+                with self.subTest(word=word):
+                    self.assertEqual(stem(word), expected)
+
+
+class SearchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user: AbstractBaseUser = User.objects.create_user(
+            username='TestUser')
+        cls.books: Post = Post.objects.create(
+            author=cls.user, text='Читаю книги по программированию')
+        cls.more_books: Post = Post.objects.create(
+            author=cls.user, text='Книга за книгой, книгами полна полка')
+        cls.other: Post = Post.objects.create(
+            author=cls.user, text='Прогулка по осеннему парку')
+
+    def search(self, query):
+        posts, _ = search.search_posts(query)
+        return posts
+
+    def test_search_finds_word_forms_ranked(self):
+        """Поиск находит формы слова, релевантные посты выше."""
+        self.assertEqual(self.search('книга'), [self.more_books, self.books])
+        self.assertEqual(self.search('программирование книг'), [self.books])
+        self.assertEqual(self.search('"'), [])
+
+    def test_index_follows_post_changes(self):
+        """Индекс обновляется при изменении и удалении поста."""
+        post: Post = Post.objects.get(pk=self.other.pk)
+        post.text = 'Прогулка с книгой'
+        post.save()
+        self.assertIn(post, self.search('книги'))
+        self.assertEqual(self.search('парк'), [])
+
+        post.delete()
+        self.assertNotIn(post, self.search('книги'))
+
+    def test_keyset_pages(self):
+        """Результаты разбиваются на страницы курсором без повторов."""
+        for number in range(constants.POSTS_PER_PAGE + 3):
+            Post.objects.create(author=self.user, text=f'Книга номер {number}')
+        first, cursor = search.search_posts('книга')
+        second, last_cursor = search.search_posts('книга', cursor)
+        self.assertEqual(len(first), constants.POSTS_PER_PAGE)
+        self.assertEqual(len(second), 5)
+        self.assertIsNone(last_cursor)
+        self.assertFalse(set(first) & set(second))
+
+    def test_reindex_command(self):
+        """Команда перестраивает индекс по всем постам."""
+        with connection.cursor() as cursor:
+            search.get_backend().clear(cursor)
+        self.assertEqual(self.search('книга'), [])
+
+        call_command('reindex_posts', stdout=StringIO())
+
+        self.assertEqual(len(self.search('книга')), 2)
+
+    def test_search_page(self):
+        """Страница поиска показывает найденные посты."""
+        response = Client().get(reverse('posts:search'), {'q': 'парки'})
+        self.assertEqual(response.context['posts'], [self.other])
+        self.assertContains(response, self.other.text)
+        self.assertNotContains(response, self.books.text)
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке находит посты по формам слова."""
+        admin: AbstractBaseUser = User.objects.create_superuser(
+            username='TestAdmin', email='admin@example.com', password='pass')
+        client = Client()
+        client.force_login(admin)
+        response = client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'программирования'})
+        self.assertEqual(
+            list(response.context['cl'].result_list), [self.books])
@@ -0,0 +1,142 @@
+import shutil
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AbstractBaseUser
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from sorl.thumbnail import default, get_thumbnail
+
+from .. import constants, thumbnails
+from ..models import Post
+from .utils import get_test_image
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailsTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user: AbstractBaseUser = User.objects.create_user(
+            username='TestUser')
+        cls.authorized_client = Client()
+        cls.authorized_client.force_login(cls.user)
+
+    def setUp(self):
+        cache.clear()
+        thumbnails.lru.clear()
+        self.post: Post = Post.objects.create(
+            author=self.user,
+            text='Тестовый пост',
+            image=get_test_image('test-thumbnail.png'),
+        )
+
+    def test_form_schedules_thumbnails(self):
+        """Сохранение формы с изображением ставит миниатюры в очередь."""
+        with mock.patch.object(thumbnails, 'schedule') as schedule, \
+                mock.patch('posts.forms.transaction.on_commit',
+                           side_effect=lambda func: func()):
+            self.authorized_client.post(
+                reverse('posts:post_create'),
+                data={'text': 'Пост', 'image': get_test_image('new.png')},
+            )
+        post: Post = Post.objects.get(text='Пост')
+        self.assertEqual(post.author, self.user)
+        schedule.assert_called_once()
+        self.assertEqual(schedule.call_args[0][0].name, post.image.name)
+
+    def test_schedule_deduplicates(self):
+        """Изображение в очереди не добавляется повторно."""
+        executor = mock.Mock()
+        with mock.patch.object(
+                thumbnails, '_get_executor', return_value=executor):
+            self.assertTrue(thumbnails.schedule(self.post.image))
+            self.assertFalse(thumbnails.schedule(self.post.image))
+            thumbnails.render_thumbnails(self.post.image)
+            self.assertTrue(thumbnails.schedule(self.post.image))
+            thumbnails.render_thumbnails(self.post.image)
+        self.assertEqual(executor.submit.call_count, 2)
+
+    def test_render_creates_all_geometries(self):
+        """Миниатюры всех размеров создаются заранее."""
+        thumbnails.render_thumbnails(self.post.image)
+        with mock.patch.object(
+                thumbnails.DeduplicatingThumbnailBackend,
+                '_create_thumbnail') as create:
+            for geometry in constants.THUMBNAIL_GEOMETRIES:
+                self.assertTrue(
+                    get_thumbnail(self.post.image, geometry).exists())
+        create.assert_not_called()
+
+    def test_render_closes_old_connections(self):
+        """Задача пула закрывает устаревшие подключения до и после работы,
+        в том числе при ошибке."""
+        with mock.patch.object(
+                thumbnails, 'close_old_connections') as close, \
+                mock.patch.object(
+                    thumbnails, 'get_thumbnail', side_effect=OSError):
+            thumbnails.render_thumbnails(self.post.image)
+        self.assertEqual(close.call_count, 2)
+
+    def test_lock_held_by_other_process(self):
+        """Чужая блокировка в кеше не снимается после ожидания."""
+        cache.add('thumbnail_lock:test', 1)
+        with mock.patch.object(constants, 'THUMBNAIL_LOCK_TIMEOUT', 0.1):
+            with thumbnails.generation_lock('thumbnail_lock:test'):
+                pass
+        self.assertEqual(cache.get('thumbnail_lock:test'), 1)
+
+    def test_lru_skips_kvstore(self):
+        """Повторный поиск миниатюры не обращается к хранилищу sorl."""
+        first = get_thumbnail(self.post.image, '960x339')
+        with mock.patch.object(default.kvstore, 'get') as kvstore_get:
+            second = get_thumbnail(self.post.image, '960x339')
+        kvstore_get.assert_not_called()
+        self.assertEqual(second.url, first.url)
+        self.assertEqual(
+            thumbnails.lru.stats(), {'size': 1, 'hits': 1, 'misses': 1})
+
+    def test_stored_thumbnail_skips_lock(self):
+        """Созданная миниатюра берется из хранилища без блокировки."""
+        first = get_thumbnail(self.post.image, '960x339')
+        thumbnails.lru.clear()
+        with mock.patch.object(thumbnails, 'generation_lock') as lock:
+            second = get_thumbnail(self.post.image, '960x339')
+        lock.assert_not_called()
+        self.assertEqual(second.url, first.url)
+        self.assertEqual(thumbnails.lru.stats()['size'], 1)
+
+    def test_lru_is_bounded(self):
+        """Старые миниатюры вытесняются из LRU-кеша."""
+        lru = thumbnails.ThumbnailLRU(max_size=2)
+        for name in ('a', 'b', 'a', 'c'):
+            lru.put((name, '960x339', ()), mock.Mock())
+        self.assertIsNone(lru.get(('b', '960x339', ())))
+        self.assertIsNotNone(lru.get(('a', '960x339', ())))
+        self.assertEqual(lru.stats()['size'], 2)
+
+    def test_edit_image_forgets_thumbnails(self):
+        """Замена изображения при редактировании сбрасывает миниатюры."""
+        old_image: str = self.post.image.name
+        old_thumbnail = get_thumbnail(self.post.image, '960x339')
+        self.authorized_client.post(
+            reverse('posts:post_edit', kwargs={'post_id': self.post.id}),
+            data={'text': 'Новый текст', 'image': get_test_image('new.png')},
+        )
+        self.assertEqual(thumbnails.lru.stats()['size'], 0)
+        self.assertFalse(old_thumbnail.exists())
+        self.assertTrue(default_storage.exists(old_image))
+        post: Post = Post.objects.get(pk=self.post.pk)
+        self.assertNotEqual(post.image.name, old_image)
@@ -0,0 +1,130 @@
+from importlib import import_module
+from unittest import mock
+
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AbstractBaseUser
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from .. import constants, timeline
+from ..models import Follow, Post, TimelineEntry
+
+User = get_user_model()
+
+
+class TimelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.follower: AbstractBaseUser = User.objects.create_user(
+            username='TestFollower')
+        cls.author: AbstractBaseUser = User.objects.create_user(
+            username='TestAuthor')
+        cls.celebrity: AbstractBaseUser = User.objects.create_user(
+            username='TestCelebrity')
+        cls.follower_client = Client()
+        cls.follower_client.force_login(cls.follower)
+
+    def get_feed(self):
+        """Посты первой страницы ленты подписок."""
+        response = self.follower_client.get(reverse('posts:follow_index'))
+        return list(response.context['page_obj'])
+
+    def test_new_post_is_pushed_to_followers(self):
+        """Новый пост раскладывается в ленты подписчиков."""
+        Follow.objects.create(user=self.follower, author=self.author)
+        post: Post = Post.objects.create(author=self.author, text='Пост')
+
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.follower, post=post, created=post.created).exists())
+        self.assertEqual(self.get_feed(), [post])
+
+    def test_follow_backfills_and_unfollow_cleans_timeline(self):
+        """Подписка заполняет ленту, отписка ее очищает."""
+        post: Post = Post.objects.create(author=self.author, text='Пост')
+        follow: Follow = Follow.objects.create(
+            user=self.follower, author=self.author)
+        self.assertEqual(self.get_feed(), [post])
+
+        follow.delete()
+
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=self.follower).exists())
+        self.assertEqual(self.get_feed(), [])
+
+    def test_popular_author_posts_are_pulled(self):
+        """Посты авторов с множеством подписчиков дочитываются при чтении."""
+        Follow.objects.create(user=self.follower, author=self.author)
+        pushed_post: Post = Post.objects.create(
+            author=self.author, text='Рассылаемый пост')
+        with mock.patch.object(
+                constants, 'TIMELINE_FANOUT_MAX_FOLLOWERS', 0):
+            Follow.objects.create(user=self.follower, author=self.celebrity)
+            pulled_post: Post = Post.objects.create(
+                author=self.celebrity, text='Дочитываемый пост')
+
+        self.assertFalse(
+            TimelineEntry.objects.filter(post=pulled_post).exists())
+        self.assertFalse(Follow.objects.get(
+            user=self.follower, author=self.celebrity).fan_out)
+        self.assertEqual(self.get_feed(), [pulled_post, pushed_post])
+
+    def test_pull_author_is_switched_once(self):
+        """Записи pull-автора удаляются только при переходе порога."""
+        Follow.objects.create(user=self.follower, author=self.celebrity)
+        Post.objects.create(author=self.celebrity, text='Рассылаемый пост')
+        with mock.patch.object(
+                constants, 'TIMELINE_FANOUT_MAX_FOLLOWERS', 0), \
+                mock.patch.object(timeline, 'switch_to_pull',
+                                  wraps=timeline.switch_to_pull) as switch:
+            Post.objects.create(author=self.celebrity, text='Первый')
+            Post.objects.create(author=self.celebrity, text='Второй')
+
+        switch.assert_called_once_with(self.celebrity.id)
+        self.assertFalse(TimelineEntry.objects.filter(
+            post__author=self.celebrity).exists())
+
+    def test_migration_skips_pull_authors(self):
+        """Миграция не раскладывает посты авторов выше порога."""
+        Follow.objects.create(user=self.follower, author=self.author)
+        Follow.objects.create(user=self.follower, author=self.celebrity)
+        Follow.objects.create(user=self.author, author=self.celebrity)
+        post: Post = Post.objects.create(author=self.author, text='Пост')
+        pulled: Post = Post.objects.create(
+            author=self.celebrity, text='Дочитываемый пост')
+        TimelineEntry.objects.all().delete()
+        migration = import_module('posts.migrations.0020_timelineentry')
+
+        with mock.patch.object(
+                constants, 'TIMELINE_FANOUT_MAX_FOLLOWERS', 1):
+            migration.fill_timelines(apps, None)
+
+        self.assertEqual(
+            list(TimelineEntry.objects.values_list('user_id', 'post_id')),
+            [(self.follower.id, post.id)])
+        self.assertFalse(Follow.objects.filter(
+            author=self.celebrity, fan_out=True).exists())
+        self.assertEqual(self.get_feed(), [pulled, post])
+
+    def test_rebuild_replaces_each_feed_atomically(self):
+        """Перестройка заменяет ленту подписчика целиком или не трогает."""
+        Follow.objects.create(user=self.follower, author=self.author)
+        post: Post = Post.objects.create(author=self.author, text='Пост')
+        stale: Post = Post.objects.create(author=self.celebrity, text='Лишний')
+        TimelineEntry.objects.create(
+            user=self.follower, post=stale, created=stale.created)
+        TimelineEntry.objects.create(
+            user=self.celebrity, post=post, created=post.created)
+
+        with mock.patch.object(
+                timeline, 'backfill', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                timeline.rebuild()
+        self.assertEqual(TimelineEntry.objects.filter(
+            user=self.follower).count(), 2)
+
+        self.assertEqual(timeline.rebuild(), 1)
+        self.assertEqual(self.get_feed(), [post])
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=self.celebrity).exists())
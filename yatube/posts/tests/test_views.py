@@ -11,7 +11,7 @@ from django.core.paginator import Page
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 
-from .. import constants
+from .. import constants, counters
 from ..forms import PostForm
 from ..models import Comment, Follow, Group, Post
 from .utils import get_test_image
@@ -251,6 +251,7 @@ class PaginatorViewsTest(TestCase):
                 group=cls.group,
                 text='Тестовый пост ' + str(i))
                 for i in range(cls.num_of_test_posts)])
+        counters.repair_counters()
 
         cls.paginator_pages = [
             reverse('posts:index'),
@@ -285,6 +286,132 @@ class PaginatorViewsTest(TestCase):
                     post_12.text, f'Тестовый пост {self.num_of_test_posts-1}')
 
 
+class KeysetPaginatorViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.POSTS_ON_SECOND_PAGE = 3
+
+        cls.follower_client = Client()
+        cls.follower: AbstractBaseUser = User.objects.create_user(
+            username='TestFollower')
+        cls.follower_client.force_login(cls.follower)
+        cls.author: AbstractBaseUser = User.objects.create_user(
+            username='TestAuthor')
+        cls.num_of_test_posts = (
+            constants.POSTS_PER_PAGE + cls.POSTS_ON_SECOND_PAGE)
+        Post.objects.bulk_create(
+            [Post(
+                author=cls.author,
+                text='Тестовый пост ' + str(i))
+                for i in range(cls.num_of_test_posts)])
+        Follow.objects.create(user=cls.follower, author=cls.author)
+        cls.follow_url = reverse('posts:follow_index')
+        cache.clear()
+
+    def test_keyset_pages_contain_correct_number_of_records(self):
+        """Курсорный паджинатор листает страницы вперед и назад."""
+        first_page = self.follower_client.get(
+            self.follow_url).context['page_obj']
+        self.assertEqual(len(first_page), constants.POSTS_PER_PAGE)
+        self.assertTrue(first_page.has_next())
+        self.assertFalse(first_page.has_previous())
+
+        second_page = self.follower_client.get(
+            self.follow_url,
+            {'after': first_page.paginator.next_cursor}).context['page_obj']
+        self.assertEqual(len(second_page), self.POSTS_ON_SECOND_PAGE)
+        self.assertFalse(second_page.has_next())
+        self.assertTrue(second_page.has_previous())
+
+        previous_page = self.follower_client.get(
+            self.follow_url,
+            {'before': second_page.paginator.previous_cursor}
+        ).context['page_obj']
+        self.assertEqual(list(previous_page), list(first_page))
+
+    def test_keyset_pages_are_stable_for_new_posts(self):
+        """Новый пост не сдвигает следующую страницу курсорной ленты."""
+        first_page = self.follower_client.get(
+            self.follow_url).context['page_obj']
+        Post.objects.create(author=self.author, text='Свежий пост')
+        second_page = self.follower_client.get(
+            self.follow_url,
+            {'after': first_page.paginator.next_cursor}).context['page_obj']
+
+        self.assertEqual(len(second_page), self.POSTS_ON_SECOND_PAGE)
+        self.assertFalse(set(first_page) & set(second_page))
+
+    def test_keyset_invalid_cursor_returns_first_page(self):
+        """Некорректный курсор отдает первую страницу."""
+        response = self.follower_client.get(
+            self.follow_url, {'after': 'not-a-cursor'})
+
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(
+            len(response.context['page_obj']), constants.POSTS_PER_PAGE)
+
+
+class CommentsPaginationViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.COMMENTS_ON_SECOND_PAGE = 3
+
+        cls.author: AbstractBaseUser = User.objects.create_user(
+            username='TestAuthor')
+        cls.post: Post = Post.objects.create(
+            author=cls.author, text='Популярный пост')
+        for i in range(
+                constants.COMMENTS_PER_PAGE + cls.COMMENTS_ON_SECOND_PAGE):
+            Comment.objects.create(
+                post=cls.post, author=cls.author, text=f'Комментарий {i}')
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def test_post_detail_renders_first_page_of_comments(self):
+        """Страница поста показывает только первую страницу комментариев."""
+        response = self.guest_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}))
+        comments = response.context['comments']
+
+        self.assertEqual(len(comments), constants.COMMENTS_PER_PAGE)
+        self.assertEqual(comments[0].text, 'Комментарий 0')
+        self.assertIsNotNone(response.context['comments_next'])
+        self.assertContains(response, 'Показать еще')
+
+    def test_load_more_returns_fragment_with_next_comments(self):
+        """«Показать еще» отдает фрагмент со следующими комментариями."""
+        first = self.guest_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}))
+        response = self.guest_client.get(
+            reverse('posts:post_comments', kwargs={'post_id': self.post.id}),
+            {'after': first.context['comments_next']},
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+
+        self.assertTemplateUsed(response, 'includes/comments.html')
+        self.assertTemplateNotUsed(response, 'base.html')
+        self.assertEqual(
+            [comment.text for comment in response.context['comments']],
+            [f'Комментарий {constants.COMMENTS_PER_PAGE + i}'
+             for i in range(self.COMMENTS_ON_SECOND_PAGE)])
+        self.assertIsNone(response.context['comments_next'])
+        self.assertNotContains(response, 'Показать еще')
+
+    def test_load_more_without_script_renders_page(self):
+        """Переход по ссылке без скрипта открывает отдельную страницу."""
+        response = self.guest_client.get(
+            reverse('posts:post_comments', kwargs={'post_id': self.post.id}))
+
+        self.assertTemplateUsed(response, 'posts/comments.html')
+        response = self.guest_client.get(
+            reverse('posts:post_comments', kwargs={'post_id': 0}))
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+
 class PostLocationViewsTest(TestCase):
     @ classmethod
     def setUpClass(cls):
@@ -430,18 +557,45 @@ class CacheTest(TestCase):
         )
         cache.clear()
 
+    def setUp(self):
+        cache.clear()
+
     def test_index_page_cache(self):
-        """Кеширование на главной странице работает."""
+        """Лента на главной кешируется до изменения постов."""
         new_post_text: str = 'Новый пост'
         self.authorized_client.get(reverse('posts:index'))
-        Post.objects.create(
-            author=self.user,
-            text=new_post_text,
-        )
-        updated_response_1 = self.authorized_client.get(reverse('posts:index'))
-        self.assertNotContains(updated_response_1, new_post_text)
+        Post.objects.filter(pk=self.post_1.pk).update(text=new_post_text)
+        cached_response = self.authorized_client.get(reverse('posts:index'))
+        self.assertNotContains(cached_response, new_post_text)
 
         cache.clear()
 
-        updated_response_2 = self.authorized_client.get(reverse('posts:index'))
-        self.assertContains(updated_response_2, new_post_text)
+        updated_response = self.authorized_client.get(reverse('posts:index'))
+        self.assertContains(updated_response, new_post_text)
+
+    def test_feed_cache_invalidated_on_changes(self):
+        """Закешированные ленты сразу обновляются при изменении постов."""
+        group: Group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        pages = [
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user.username}),
+        ]
+        for address in pages:
+            self.authorized_client.get(address)
+
+        post: Post = Post.objects.create(
+            author=self.user, text='Новый пост', group=group)
+        for address in pages:
+            with self.subTest(address=address):
+                response = self.authorized_client.get(address)
+                self.assertContains(response, post.text)
+
+        group.title = 'Переименованная группа'
+        group.save()
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertContains(response, group.title)
@@ -1,6 +1,8 @@
+from collections import Counter
 from io import BytesIO
 
 import PIL.Image
+from core.utils import fingerprint
 from django.core.files.uploadedfile import SimpleUploadedFile
 
 
@@ -17,3 +19,18 @@ def get_test_image(filename='test-image.png',
         content=file.getvalue(),
         content_type='image/png'
     )
+
+
+def describe_queries(queries):
+    """Список запросов и повторяющиеся отпечатки для сообщения теста."""
+    lines = [f'{number}. {query["sql"]}'
+             for number, query in enumerate(queries, start=1)]
+    duplicates = [
+        f'{count} x {sql}'
+        for sql, count in Counter(
+            fingerprint(query['sql']) for query in queries).most_common()
+        if count > 1
+    ]
+    if duplicates:
+        lines += ['Повторяющиеся запросы:'] + duplicates
+    return '\n'.join(lines)
@@ -0,0 +1,240 @@
+"""Создание миниатюр изображений постов.
+
+sorl.thumbnail создает миниатюру при первой отрисовке шаблона,
+и первый читатель нового поста ждет декодирования и масштабирования.
+Поэтому после сохранения поста с изображением все миниатюры из
+constants.THUMBNAIL_GEOMETRIES создаются заранее в ограниченном пуле
+потоков вне обработки запроса.
+
+Создание одной и той же миниатюры не выполняется дважды: бэкенд
+DeduplicatingThumbnailBackend держит на время создания блокировку
+в потоке и в кеше, поэтому параллельные запросы и пул ждут первого
+и получают готовую миниатюру из хранилища sorl. Уже созданные
+миниатюры берутся из хранилища без блокировки. Найденные миниатюры
+хранятся в LRU-кеше процесса; при замене изображения поста
+их сбрасывает forget.
+"""
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from core import metrics
+from django.core.cache import cache
+from django.db import close_old_connections
+from django.db.models.fields.files import FieldFile
+from sorl.thumbnail import default, delete, get_thumbnail
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings
+from sorl.thumbnail.images import DummyImageFile, ImageFile
+
+from . import constants
+
+logger = logging.getLogger(__name__)
+
+LRUKey = Tuple[str, str, Tuple]
+
+_executor: Optional[ThreadPoolExecutor] = None
+_pending: Set[str] = set()
+# Блокировки по хешу ключа: память не растет с числом изображений.
+_locks: List[threading.Lock] = [threading.Lock() for _ in range(64)]
+_state_lock = threading.Lock()
+
+
+def _source_name(file_) -> str:
+    return getattr(file_, 'name', None) or str(file_)
+
+
+def _lock_key(file_, geometry: str, options: Dict) -> str:
+    raw: str = f'{_source_name(file_)}|{geometry}|{sorted(options.items())}'
+    return 'thumbnail_lock:' + hashlib.md5(raw.encode()).hexdigest()
+
+
+@contextmanager
+def generation_lock(key: str) -> Iterator[None]:
+    """Блокировка создания миниатюры в процессе и между процессами.
+
+    Если блокировку в кеше не удалось получить за
+    THUMBNAIL_LOCK_TIMEOUT секунд, миниатюра создается без нее.
+    """
+    local_lock: threading.Lock = _locks[hash(key) % len(_locks)]
+    with local_lock:
+        deadline: float = time.monotonic() + constants.THUMBNAIL_LOCK_TIMEOUT
+        acquired: bool = cache.add(key, 1, constants.THUMBNAIL_LOCK_TIMEOUT)
+        while not acquired and time.monotonic() < deadline:
+            time.sleep(constants.THUMBNAIL_LOCK_POLL)
+            acquired = cache.add(key, 1, constants.THUMBNAIL_LOCK_TIMEOUT)
+        try:
+            yield
+        finally:
+            if acquired:
+                cache.delete(key)
+
+
+class ThumbnailLRU:
+    """Ограниченный по размеру LRU-кеш найденных миниатюр процесса.
+
+    Ключ - имя исходного изображения, размер и параметры миниатюры.
+    Считает попадания и промахи.
+    """
+
+    def __init__(self, max_size: int) -> None:
+        self.max_size: int = max_size
+        self.hits: int = 0
+        self.misses: int = 0
+        self._items: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: LRUKey) -> Optional[ImageFile]:
+        with self._lock:
+            thumbnail: Optional[ImageFile] = self._items.get(key)
+            if thumbnail is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._items.move_to_end(key)
+            return thumbnail
+
+    def put(self, key: LRUKey, thumbnail: ImageFile) -> None:
+        with self._lock:
+            self._items[key] = thumbnail
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def forget(self, source_name: str) -> None:
+        """Удаляет миниатюры исходного изображения."""
+        with self._lock:
+            for key in [key for key in self._items if key[0] == source_name]:
+                del self._items[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self.hits = self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        """Размер кеша, количество попаданий и промахов."""
+        with self._lock:
+            return {
+                'size': len(self._items),
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+
+lru = ThumbnailLRU(constants.THUMBNAIL_LRU_SIZE)
+
+
+class DeduplicatingThumbnailBackend(ThumbnailBackend):
+    """Бэкенд sorl.thumbnail, не создающий миниатюру параллельно.
+
+    Найденные миниатюры запоминаются в LRU-кеше процесса, поэтому
+    повторная отрисовка не обращается ни к кешу, ни к базе данных.
+    """
+
+    def get_thumbnail(self, file_, geometry_string: str,
+                      **options) -> ImageFile:
+        key: LRUKey = (
+            _source_name(file_), geometry_string,
+            tuple(sorted(options.items())))
+        thumbnail: Optional[ImageFile] = lru.get(key)
+        if thumbnail is not None:
+            return thumbnail
+        thumbnail = self._stored(file_, geometry_string, dict(options))
+        if thumbnail is not None:
+            lru.put(key, thumbnail)
+            return thumbnail
+        with generation_lock(_lock_key(file_, geometry_string, options)):
+            thumbnail = super().get_thumbnail(
+                file_, geometry_string, **options)
+        if not isinstance(thumbnail, DummyImageFile):
+            lru.put(key, thumbnail)
+        return thumbnail
+
+    def _stored(self, file_, geometry_string: str,
+                options: Dict) -> Optional[ImageFile]:
+        """Миниатюра из хранилища sorl, если она уже создана.
+
+        Имя миниатюры вычисляется по тем же параметрам,
+        что и в ThumbnailBackend.get_thumbnail.
+        """
+        if not file_:
+            return None
+        source = ImageFile(file_)
+        if settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for option, value in self.default_options.items():
+            options.setdefault(option, value)
+        for option, attr in self.extra_options:
+            value = getattr(settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(option, value)
+        name: str = self._get_thumbnail_filename(
+            source, geometry_string, options)
+        return default.kvstore.get(ImageFile(name, default.storage))
+
+    def _create_thumbnail(self, source_image, geometry_string: str,
+                          options: Dict, thumbnail: ImageFile) -> None:
+        started: float = time.perf_counter()
+        super()._create_thumbnail(
+            source_image, geometry_string, options, thumbnail)
+        metrics.record_thumbnail(time.perf_counter() - started)
+
+
+def forget(source_name: str) -> None:
+    """Удаляет миниатюры замененного изображения из LRU-кеша,
+    хранилища sorl и с диска. Само изображение остается на диске."""
+    lru.forget(source_name)
+    delete(source_name, delete_file=False)
+
+
+def render_thumbnails(image: FieldFile) -> None:
+    """Создает все миниатюры изображения.
+
+    Потоки пула живут долго, поэтому, как и обработка запроса Django,
+    задача закрывает устаревшие и сломанные подключения к базе
+    (хранилище sorl обращается к ней через ORM).
+    """
+    close_old_connections()
+    try:
+        for geometry in constants.THUMBNAIL_GEOMETRIES:
+            get_thumbnail(image, geometry)
+    except Exception:
+        logger.exception('Не удалось создать миниатюры %s', image.name)
+    finally:
+        with _state_lock:
+            _pending.discard(image.name)
+        close_old_connections()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _state_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=constants.THUMBNAIL_WORKERS,
+                thread_name_prefix='thumbnails',
+            )
+        return _executor
+
+
+def schedule(image: FieldFile) -> bool:
+    """Ставит создание миниатюр изображения в очередь пула.
+
+    Изображение, уже стоящее в очереди, повторно не добавляется.
+    При переполненной очереди миниатюры будут созданы при первой
+    отрисовке. Возвращает True, если задача добавлена.
+    """
+    with _state_lock:
+        if (image.name in _pending
+                or len(_pending) >= constants.THUMBNAIL_QUEUE_SIZE):
+            return False
+        _pending.add(image.name)
+    _get_executor().submit(render_thumbnails, image)
+    return True
@@ -0,0 +1,197 @@
+"""Материализованная лента подписок (fan-out on write).
+
+При публикации пост раскладывается в TimelineEntry всех подписчиков
+автора, и follow_index читает готовый отсортированный срез по индексу
+(user, -created, -post). Авторы, у которых подписчиков больше
+TIMELINE_FANOUT_MAX_FOLLOWERS, не рассылаются: их подписки помечаются
+fan_out=False, а посты дочитываются при просмотре ленты (pull)
+и сливаются с материализованной частью.
+"""
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from core.utils import batched
+from django.contrib.auth.models import AbstractBaseUser
+from django.core.paginator import Page
+from django.db import transaction
+from django.db.models import Count, Q
+from django.db.models.query import QuerySet
+from django.http import HttpRequest
+
+from . import constants
+from .models import Follow, Post, TimelineEntry
+from .utils import Cursor, KeysetPaginator, keyset_filter
+
+
+def _insert_entries(entries: Iterable[TimelineEntry]) -> None:
+    for batch in batched(entries, constants.TIMELINE_BATCH_SIZE):
+        TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def _is_pull_author(author_id: int) -> bool:
+    """Проверяет, что посты автора не рассылаются по лентам."""
+    follows: Dict = Follow.objects.filter(author_id=author_id).aggregate(
+        total=Count('id'),
+        pulled=Count('id', filter=Q(fan_out=False)),
+    )
+    return (follows['pulled'] > 0
+            or follows['total'] > constants.TIMELINE_FANOUT_MAX_FOLLOWERS)
+
+
+def _pull_on_threshold(author_id: int) -> bool:
+    """Переводит автора на pull, когда он превысил порог подписчиков.
+
+    Возвращает True, если посты автора не рассылаются. Удаление его
+    записей из лент выполняется один раз: пока рассылаемых подписок
+    не появилось, переключение пропускается.
+    """
+    follows: Dict = Follow.objects.filter(author_id=author_id).aggregate(
+        total=Count('id'),
+        pushed=Count('id', filter=Q(fan_out=True)),
+    )
+    pull: bool = (
+        follows['pushed'] < follows['total']
+        or follows['total'] > constants.TIMELINE_FANOUT_MAX_FOLLOWERS)
+    if pull and follows['pushed']:
+        switch_to_pull(author_id)
+    return pull
+
+
+@transaction.atomic
+def switch_to_pull(author_id: int) -> None:
+    """Переводит автора на дочитывание постов при просмотре ленты."""
+    Follow.objects.filter(author_id=author_id, fan_out=True).update(
+        fan_out=False)
+    TimelineEntry.objects.filter(post__author_id=author_id).delete()
+
+
+def fan_out_post(post: Post) -> None:
+    """Раскладывает новый пост в ленты подписчиков автора."""
+    if _pull_on_threshold(post.author_id):
+        return
+    followers: QuerySet = Follow.objects.filter(
+        author_id=post.author_id).values_list('user_id', flat=True)
+    _insert_entries(
+        TimelineEntry(user_id=user_id, post_id=post.id, created=post.created)
+        for user_id in followers.iterator())
+
+
+def fan_out_posts(post_ids: Iterable[int]) -> None:
+    """Раскладывает существующие посты в ленты подписчиков их авторов.
+
+    Посты группируются по авторам: подписчики автора читаются один раз.
+    """
+    by_author: Dict[int, List[Tuple[int, datetime]]] = defaultdict(list)
+    for batch in batched(sorted(post_ids), constants.TIMELINE_BATCH_SIZE):
+        for post_id, author_id, created in Post.objects.filter(
+                id__in=batch).values_list('id', 'author_id', 'created'):
+            by_author[author_id].append((post_id, created))
+    for author_id, posts in by_author.items():
+        if _pull_on_threshold(author_id):
+            continue
+        followers: List[int] = list(Follow.objects.filter(
+            author_id=author_id).values_list('user_id', flat=True))
+        _insert_entries(
+            TimelineEntry(user_id=user_id, post_id=post_id, created=created)
+            for user_id in followers for post_id, created in posts)
+
+
+def backfill(follow: Follow) -> None:
+    """Заполняет ленту подписчика постами автора после подписки."""
+    if _is_pull_author(follow.author_id):
+        Follow.objects.filter(pk=follow.pk).update(fan_out=False)
+        follow.fan_out = False
+        return
+    posts: QuerySet = Post.objects.filter(
+        author_id=follow.author_id).values_list('id', 'created')
+    _insert_entries(
+        TimelineEntry(user_id=follow.user_id, post_id=post_id,
+                      created=created)
+        for post_id, created in posts.iterator())
+
+
+def cleanup(follow: Follow) -> None:
+    """Убирает посты автора из ленты бывшего подписчика."""
+    TimelineEntry.objects.filter(
+        user_id=follow.user_id, post__author_id=follow.author_id).delete()
+
+
+def rebuild_user(user_id: int) -> int:
+    """Перестраивает ленту одного подписчика в одной транзакции.
+
+    Возвращает количество обработанных подписок.
+    """
+    with transaction.atomic():
+        TimelineEntry.objects.filter(user_id=user_id).delete()
+        follows: List[Follow] = list(
+            Follow.objects.filter(user_id=user_id, fan_out=True))
+        for follow in follows:
+            backfill(follow)
+    return len(follows)
+
+
+def rebuild() -> int:
+    """Полностью перестраивает материализованные ленты.
+
+    Ленты перестраиваются по одному подписчику, поэтому читатели
+    видят либо старую, либо новую ленту целиком. Возвращает
+    количество обработанных подписок.
+    """
+    user_ids: List[int] = list(
+        Follow.objects.filter(fan_out=True).order_by('user_id')
+        .values_list('user_id', flat=True).distinct())
+    rebuilt: int = 0
+    for user_id in user_ids:
+        rebuilt += rebuild_user(user_id)
+    # Записи пользователей, у которых не осталось рассылаемых подписок.
+    TimelineEntry.objects.exclude(user_id__in=Follow.objects.filter(
+        fan_out=True).values('user_id')).delete()
+    return rebuilt
+
+
+class TimelinePaginator(KeysetPaginator):
+    """Курсорный паджинатор ленты подписок.
+
+    Сливает материализованные записи ленты с постами авторов,
+    которые дочитываются при просмотре.
+    """
+
+    def __init__(self, user: AbstractBaseUser, per_page: int) -> None:
+        self.user: AbstractBaseUser = user
+        self.pull_author_ids: List[int] = list(
+            Follow.objects.filter(user=user, fan_out=False).values_list(
+                'author_id', flat=True))
+        super().__init__(
+            Post.objects.select_related('group', 'author').filter(
+                author_id__in=self.pull_author_ids),
+            per_page,
+        )
+
+    def _rows(self, cursor: Optional[Cursor], forward: bool) -> List:
+        entries: QuerySet = TimelineEntry.objects.filter(
+            user=self.user).select_related('post__group', 'post__author')
+        if cursor is not None:
+            entries = entries.filter(
+                keyset_filter(cursor, forward, id_field='post_id'))
+        if forward:
+            entries = entries.order_by('-created', '-post_id')
+        else:
+            entries = entries.order_by('created', 'post_id')
+        rows: List = [entry.post for entry in entries[:self.per_page + 1]]
+        if self.pull_author_ids:
+            rows = sorted(
+                rows + super()._rows(cursor, forward),
+                key=lambda post: (post.created, post.id),
+                reverse=forward,
+            )[:self.per_page + 1]
+        return rows
+
+
+def get_timeline_page(request: HttpRequest, user: AbstractBaseUser) -> Page:
+    """Возвращает страницу ленты подписок по курсору из URL."""
+    paginator = TimelinePaginator(user, constants.POSTS_PER_PAGE)
+    return paginator.get_page(
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+    )
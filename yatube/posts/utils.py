@@ -1,12 +1,169 @@
+import base64
+import binascii
+from datetime import datetime
+from typing import List, Optional, Tuple
+
 from django.core.paginator import Page, Paginator
+from django.db.models import Q
 from django.db.models.query import QuerySet
 from django.http import HttpRequest
+from django.utils.dateparse import parse_datetime
 
 from . import constants
+from .counters import CountedPaginator
+from .models import Comment
+
+Cursor = Tuple[datetime, int]
+
+
+def encode_cursor(created: datetime, pk: int) -> str:
+    """Кодирует пару (created, id) в строку для URL."""
+    raw: str = f'{created.isoformat()}|{pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token: Optional[str]) -> Optional[Cursor]:
+    """Декодирует курсор из URL. Для некорректного значения вернет None."""
+    if not token:
+        return None
+    try:
+        padded: str = token + '=' * (-len(token) % 4)
+        raw: str = base64.urlsafe_b64decode(padded.encode()).decode()
+        created_raw, pk_raw = raw.rsplit('|', 1)
+        created: Optional[datetime] = parse_datetime(created_raw)
+        pk: int = int(pk_raw)
+    except (ValueError, binascii.Error, UnicodeDecodeError):
+        return None
+    if created is None:
+        return None
+    return created, pk
+
+
+def keyset_filter(cursor: Cursor, forward: bool,
+                  created_field: str = 'created',
+                  id_field: str = 'id') -> Q:
+    """Условие выборки строк за курсором по ключу (created, id)."""
+    created, pk = cursor
+    lookup: str = 'lt' if forward else 'gt'
+    return (
+        Q(**{f'{created_field}__{lookup}': created})
+        | Q(**{created_field: created, f'{id_field}__{lookup}': pk})
+    )
+
+
+class KeysetPaginator:
+    """Курсорный паджинатор по ключу (created, id).
+
+    Не выполняет COUNT(*) и OFFSET: каждая страница - это один запрос
+    вида WHERE (created, id) < курсор ORDER BY -created, -id LIMIT n + 1.
+    Новые посты не сдвигают уже открытые страницы.
+
+    Возвращает обычный django.core.paginator.Page: номер страницы и
+    num_pages подбираются так, чтобы has_next/has_previous работали
+    без подсчета строк, а курсоры соседних страниц хранятся здесь.
+    """
+
+    is_keyset: bool = True
+
+    def __init__(self, object_list: QuerySet, per_page: int) -> None:
+        self.object_list: QuerySet = object_list.order_by('-created', '-id')
+        self.per_page: int = per_page
+        self.num_pages: int = 1
+        self.next_cursor: Optional[str] = None
+        self.previous_cursor: Optional[str] = None
+
+    def get_page(self, after: Optional[str] = None,
+                 before: Optional[str] = None) -> Page:
+        """Возвращает страницу после курсора after или перед before.
+
+        Некорректный курсор трактуется как запрос первой страницы.
+        """
+        before_cursor: Optional[Cursor] = decode_cursor(before)
+        if before_cursor is not None:
+            return self._page_before(before_cursor)
+        return self._page_after(decode_cursor(after))
+
+    def _rows(self, cursor: Optional[Cursor], forward: bool) -> List:
+        """Возвращает до per_page + 1 постов за курсором.
+
+        forward=True - более старые посты в порядке -created, -id,
+        forward=False - более новые в порядке created, id.
+        """
+        posts: QuerySet = self.object_list
+        if cursor is not None:
+            posts = posts.filter(keyset_filter(cursor, forward))
+        if not forward:
+            posts = posts.order_by('created', 'id')
+        return list(posts[:self.per_page + 1])
+
+    def _page_after(self, cursor: Optional[Cursor]) -> Page:
+        rows: List = self._rows(cursor, forward=True)
+        has_next: bool = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        return self._make_page(
+            rows,
+            has_next=has_next,
+            has_previous=cursor is not None and bool(rows),
+        )
+
+    def _page_before(self, cursor: Cursor) -> Page:
+        rows: List = self._rows(cursor, forward=False)
+        has_previous: bool = len(rows) > self.per_page
+        rows = rows[:self.per_page][::-1]
+        if not rows:
+            return self._page_after(None)
+        return self._make_page(rows, has_next=True, has_previous=has_previous)
+
+    def _make_page(self, rows: List, has_next: bool,
+                   has_previous: bool) -> Page:
+        if rows and has_next:
+            self.next_cursor = encode_cursor(rows[-1].created, rows[-1].id)
+        if rows and has_previous:
+            self.previous_cursor = encode_cursor(rows[0].created, rows[0].id)
+        number: int = 2 if has_previous else 1
+        self.num_pages = number + 1 if has_next else number
+        return Page(rows, number, self)
+
+
+def get_comments_page(post_id: int, after: Optional[str] = None
+                      ) -> Tuple[List[Comment], Optional[str]]:
+    """Страница комментариев поста после курсора, старые первыми.
+
+    Возвращает не больше COMMENTS_PER_PAGE комментариев и курсор
+    следующей страницы (None, если это последняя страница).
+    Некорректный курсор трактуется как запрос первой страницы.
+    """
+    comments: QuerySet = Comment.objects.filter(
+        post_id=post_id).select_related('author').order_by('created', 'id')
+    cursor: Optional[Cursor] = decode_cursor(after)
+    if cursor is not None:
+        comments = comments.filter(keyset_filter(cursor, forward=False))
+    rows: List[Comment] = list(comments[:constants.COMMENTS_PER_PAGE + 1])
+    if len(rows) <= constants.COMMENTS_PER_PAGE:
+        return rows, None
+    rows = rows[:constants.COMMENTS_PER_PAGE]
+    return rows, encode_cursor(rows[-1].created, rows[-1].id)
+
 
+def get_page_obj(request: HttpRequest, posts: QuerySet,
+                 keyset: bool = False,
+                 count: Optional[int] = None) -> Page:
+    """Возвращает список постов для страницы паджинатора, переданной в URL.
 
-def get_page_obj(request: HttpRequest, posts: QuerySet) -> Page:
-    """Возвращает список постов для страницы паджинатора, переданной в URL."""
-    paginator: Paginator = Paginator(posts, constants.POSTS_PER_PAGE)
+    При keyset=True используется курсорная паджинация по (created, id):
+    страница выбирается параметрами after/before вместо page.
+    Если передан count, он используется вместо COUNT(*) по posts.
+    """
+    if keyset:
+        keyset_paginator = KeysetPaginator(posts, constants.POSTS_PER_PAGE)
+        return keyset_paginator.get_page(
+            after=request.GET.get('after'),
+            before=request.GET.get('before'),
+        )
+    if count is not None:
+        paginator: Paginator = CountedPaginator(
+            posts, constants.POSTS_PER_PAGE, count)
+    else:
+        paginator = Paginator(posts, constants.POSTS_PER_PAGE)
     page_number: int = request.GET.get('page')
     return paginator.get_page(page_number)
@@ -1,16 +1,19 @@
 from typing import Dict, List, Type, Union
 
+from core import db_router
+from core.middleware import cache_for_anonymous
 from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import AbstractBaseUser, AnonymousUser
+from django.core.paginator import Page
 from django.db.models.query import QuerySet
-from django.http import HttpRequest, HttpResponse
+from django.http import Http404, HttpRequest, HttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
-from django.views.decorators.cache import cache_page
 
+from . import counters, generations, search, thumbnails, timeline
 from .forms import CommentForm, PostForm
-from .models import Comment, Follow, Group, Post
-from .utils import get_page_obj
+from .models import Follow, Group, Post, UserCounters
+from .utils import get_comments_page, get_page_obj
 
 User: Type[AbstractBaseUser] = get_user_model()
 
@@ -18,10 +21,16 @@ User: Type[AbstractBaseUser] = get_user_model()
 def index(request: HttpRequest) -> HttpResponse:
     """Обработчик запросов к главной странице сайта."""
     template: str = 'posts/index.html'
+    scope: Dict[str, int] = generations.snapshot(
+        (generations.global_key(),))
     posts: QuerySet = Post.objects.select_related('group', 'author')
+    page_obj: Page = get_page_obj(
+        request, posts, count=counters.get_all_posts_count())
     context: Dict = {
-        'page_obj': get_page_obj(request, posts),
+        'page_obj': page_obj,
+        'feed_generation': scope[generations.global_key()],
     }
+    cache_for_anonymous(request, scope, generations.bumped_at(scope))
 
     return render(request, template, context)
 
@@ -30,11 +39,18 @@ def group_posts(request: HttpRequest, slug: str) -> HttpResponse:
     """Обработчик запросов к страницам групп."""
     template: str = 'posts/group_list.html'
     group: Group = get_object_or_404(Group, slug=slug)
+    scope: Dict[str, int] = generations.snapshot(
+        (generations.group_key(group.id),))
+    if db_router.switched_from_replica():
+        group = get_object_or_404(Group, slug=slug)
     posts: QuerySet = group.posts.select_related('group', 'author')
+    page_obj: Page = get_page_obj(request, posts, count=group.posts_count)
     context: Dict = {
         'group': group,
-        'page_obj': get_page_obj(request, posts),
+        'page_obj': page_obj,
+        'feed_generation': scope[generations.group_key(group.id)],
     }
+    cache_for_anonymous(request, scope, generations.bumped_at(scope))
 
     return render(request, template, context)
 
@@ -43,31 +59,80 @@ def profile(request: HttpRequest, username: str) -> HttpResponse:
     """Обработчик запросов к странице профиля."""
     template: str = 'posts/profile.html'
     author: Union[AbstractBaseUser, AnonymousUser] = get_object_or_404(
-        User, username=username)
+        User.objects.select_related('counters'), username=username)
+    scope: Dict[str, int] = generations.snapshot(
+        (generations.author_key(author.id),))
+    if db_router.switched_from_replica():
+        author = get_object_or_404(
+            User.objects.select_related('counters'), username=username)
+    author_counters: UserCounters = counters.get_user_counters(author)
     posts: QuerySet = author.posts.select_related('group')
     following: bool = request.user.is_authenticated and Follow.objects.filter(
         user=request.user, author=author
     ).exists()
 
+    page_obj: Page = get_page_obj(
+        request, posts, count=author_counters.posts_count)
     context: Dict = {
-        'page_obj': get_page_obj(request, posts),
+        'page_obj': page_obj,
         'author': author,
+        'author_counters': author_counters,
         'following': following,
+        'feed_generation': scope[generations.author_key(author.id)],
     }
+    cache_for_anonymous(request, scope, generations.bumped_at(scope))
     return render(request, template, context)
 
 
+def _post_detail_keys(post: Post) -> List[str]:
+    keys: List[str] = [
+        generations.post_key(post.id), generations.author_key(post.author_id)]
+    if post.group_id is not None:
+        keys.append(generations.group_key(post.group_id))
+    return keys
+
+
 def post_detail(request: HttpRequest, post_id: int) -> HttpResponse:
     """Обработчик запросов к странице деталей поста."""
     template: str = 'posts/post_detail.html'
-    post: Post = get_object_or_404(Post, id=post_id)
+    posts: QuerySet = Post.objects.select_related('group', 'author__counters')
+    post: Post = get_object_or_404(posts, id=post_id)
+    scope: Dict[str, int] = generations.snapshot(_post_detail_keys(post))
+    if db_router.switched_from_replica():
+        post = get_object_or_404(posts, id=post_id)
+        scope = generations.snapshot(_post_detail_keys(post))
     form: CommentForm = CommentForm()
-    comments: List[Comment] = post.comments.all()
+    comments, comments_next = get_comments_page(post.id)
     context: Dict = {
         'post': post,
         'form': form,
         'comments': comments,
+        'comments_next': comments_next,
+        'author_counters': counters.get_user_counters(post.author),
     }
+    cache_for_anonymous(request, scope, generations.bumped_at(scope))
+    return render(request, template, context)
+
+
+def post_comments(request: HttpRequest, post_id: int) -> HttpResponse:
+    """Обработчик запросов следующей страницы комментариев поста.
+
+    Запрос кнопки «Показать еще» получает только фрагмент со списком
+    комментариев, обычный переход по ссылке - отдельную страницу.
+    """
+    if not Post.objects.filter(id=post_id).exists():
+        raise Http404
+    comments, comments_next = get_comments_page(
+        post_id, request.GET.get('after'))
+    context: Dict = {
+        'post_id': post_id,
+        'comments': comments,
+        'comments_next': comments_next,
+    }
+    template: str = (
+        'includes/comments.html'
+        if request.headers.get('x-requested-with') == 'XMLHttpRequest'
+        else 'posts/comments.html')
     return render(request, template, context)
 
 
@@ -79,10 +144,9 @@ def post_create(request: HttpRequest) -> HttpResponse:
     form = PostForm(
         request.POST or None,
         files=request.FILES or None,)
+    form.instance.author = author
     if form.is_valid():
-        instance: Post = form.save(commit=False)
-        instance.author = author
-        instance.save()
+        form.save()
         return redirect('posts:profile', username=author.username)
 
     return render(request, template, {'form': form})
@@ -94,6 +158,7 @@ def post_edit(request: HttpRequest, post_id: int) -> HttpResponse:
     template: str = 'posts/create_post.html'
     post: Post = get_object_or_404(Post, id=post_id)
     author: Union[AbstractBaseUser, AnonymousUser] = request.user
+    old_image: str = post.image.name
     form = PostForm(
         request.POST or None,
         files=request.FILES or None,
@@ -104,6 +169,8 @@ def post_edit(request: HttpRequest, post_id: int) -> HttpResponse:
 
     if form.is_valid():
         form.save()
+        if old_image and 'image' in form.changed_data:
+            thumbnails.forget(old_image)
         return redirect(post)
 
     context: Dict = {
@@ -131,13 +198,21 @@ def add_comment(request, post_id):
 def follow_index(request):
     """Обработчик запросов к странице постов избранных авторов."""
     template: str = 'posts/follow.html'
-    user_subscriptions: QuerySet = request.user.follower.all()
-    subscribed_posts: QuerySet = (
-        Post.objects.select_related('group', 'author').filter(
-            author_id__in=[follow.author.id for follow in user_subscriptions]))
+    context: Dict = {
+        'page_obj': timeline.get_timeline_page(request, request.user),
+    }
+    return render(request, template, context)
+
 
+def post_search(request: HttpRequest) -> HttpResponse:
+    """Обработчик запросов полнотекстового поиска по постам."""
+    template: str = 'posts/search.html'
+    query: str = request.GET.get('q', '').strip()
+    posts, next_cursor = search.search_posts(query, request.GET.get('after'))
     context: Dict = {
-        'page_obj': get_page_obj(request, subscribed_posts),
+        'query': query,
+        'posts': posts,
+        'next_cursor': next_cursor,
     }
     return render(request, template, context)
 
@@ -14,7 +14,10 @@ DEBUG = True if os.getenv('DEBUG') == 'True' else False
 if DEBUG:
     CACHES = {
         'default': {
-            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'BACKEND': 'core.cache.InstrumentedCache',
+            'OPTIONS': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            },
         }
     }
     DATABASES = {
@@ -37,9 +40,10 @@ else:
     )
     CACHES = {
         "default": {
-            "BACKEND": "django_redis.cache.RedisCache",
+            "BACKEND": "core.cache.InstrumentedCache",
             "LOCATION": "redis://127.0.0.1:6379/1",
             "OPTIONS": {
+                "BACKEND": "django_redis.cache.RedisCache",
                 "CLIENT_CLASS": "django_redis.client.DefaultClient",
             }
         }
@@ -54,7 +58,23 @@ else:
             'PORT': os.getenv('DB_PORT')
         }
     }
+    # Реплики только для чтения: адреса через запятую, остальные
+    # параметры подключения как у основной базы.
+    for number, host in enumerate(
+            filter(None, os.getenv('DB_REPLICA_HOSTS', '').split(',')),
+            start=1):
+        DATABASES[f'replica{number}'] = {
+            **DATABASES['default'],
+            'HOST': host.strip(),
+            'TEST': {'MIRROR': 'default'},
+        }
 
+# Чтение с реплик и запись в основную базу (см. core.db_router).
+DATABASE_ROUTERS = ['core.db_router.PrimaryReplicaRouter']
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+REPLICA_STICKY_SECONDS = 10
+REPLICA_HEALTH_INTERVAL = 5
+REPLICA_MAX_LAG = 5
 
 ALLOWED_HOSTS = [
     'valexandro.hopto.org',
@@ -75,25 +95,58 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'core.apps.CoreConfig',
     'about.apps.AboutConfig',
+    'api.apps.ApiConfig',
     'sorl.thumbnail',
     'debug_toolbar',
 ]
 
 MIDDLEWARE = [
+    'core.instrumentation.ServerTimingMiddleware',
+    'core.db_router.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
+    'core.middleware.AnonymousPageCacheMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'debug_toolbar.middleware.DebugToolbarMiddleware',
+    'core.instrumentation.ViewTimingMiddleware',
+    'core.profiling.ProfilingMiddleware',
 ]
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media/')
 ROOT_URLCONF = 'yatube.urls'
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 LOGIN_URL = 'users:login'
+PAGE_CACHE_TIMEOUT = 60 * 60 * 6
+# Замеры фаз запроса (см. core.instrumentation). Заголовок Server-Timing
+# виден всем только при отладке, иначе - сотрудникам.
+SERVER_TIMING_ENABLED = True
+SERVER_TIMING_PUBLIC = DEBUG
+# Выборочное профилирование запросов (см. core.profiling): доля
+# профилируемых запросов и секрет заголовка X-Profile.
+PROFILING_SAMPLE_RATE = float(os.getenv('PROFILING_SAMPLE_RATE', '0'))
+PROFILING_TOKEN = os.getenv('PROFILING_TOKEN', '')
+PROFILING_INTERVAL = 0.005
+PROFILING_DIR = os.getenv('PROFILING_DIR', os.path.join(BASE_DIR, 'profiles'))
+PROFILING_KEEP = 20
+# Метрики рабочих процессов (см. core.metrics) и адреса сборщика.
+# Без каталога METRICS_DIR метрики не сводятся между процессами.
+METRICS_DIR = os.getenv('METRICS_DIR') or None
+METRICS_FLUSH_INTERVAL = 5
+METRICS_ALLOWED_IPS = ['127.0.0.1', '::1']
+# Журнал медленных SQL-запросов (см. core.slow_queries): порог в секундах
+# (None отключает журнал, в переменной окружения - пустое значение
+# или off) и снятие планов запросов.
+SLOW_QUERY_THRESHOLD = os.getenv('SLOW_QUERY_THRESHOLD', '0.1').strip()
+SLOW_QUERY_THRESHOLD = (
+    None if SLOW_QUERY_THRESHOLD.lower() in ('', 'off')
+    else float(SLOW_QUERY_THRESHOLD)
+)
+SLOW_QUERY_EXPLAIN = True
+THUMBNAIL_BACKEND = 'posts.thumbnails.DeduplicatingThumbnailBackend'
 LOGIN_REDIRECT_URL = 'posts:index'
 EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
@@ -102,7 +155,7 @@ TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 # STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.template_backends.TimedDjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -152,3 +205,32 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'static/')
+
+# Структурированные журналы запросов с замерами (см. core.instrumentation)
+# и медленных SQL-запросов (см. core.slow_queries).
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'json': {'()': 'core.instrumentation.JsonFormatter'},
+    },
+    'handlers': {
+        'requests': {
+            'class': 'logging.StreamHandler',
+            'formatter': 'json',
+        },
+    },
+    'loggers': {
+        'core.instrumentation': {
+            'handlers': ['requests'],
+            'level': os.getenv(
+                'REQUEST_LOG_LEVEL', 'WARNING' if DEBUG else 'INFO'),
+            'propagate': False,
+        },
+        'core.slow_queries': {
+            'handlers': ['requests'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
+}
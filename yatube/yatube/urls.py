@@ -1,5 +1,6 @@
 """yatube URL Configuration."""
 
+from core.views import metrics
 from django.conf import settings
 from django.conf.urls.static import static
 from django.contrib import admin
@@ -11,6 +12,8 @@ urlpatterns = [
     path('auth/', include('users.urls')),
     path('auth/', include('django.contrib.auth.urls')),
     path('about/', include('about.urls', namespace='about')),
+    path('api/', include('api.urls', namespace='api')),
+    path('metrics', metrics, name='metrics'),
 
 ]
 handler404 = 'core.views.page_not_found'